@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Analysis
+from .models import Analysis, UserAnalysisStats
 
 
 @admin.register(Analysis)
@@ -34,3 +34,10 @@ class AnalysisAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         """Análises só podem ser criadas via API"""
         return False
+
+
+@admin.register(UserAnalysisStats)
+class UserAnalysisStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'total', 'validated', 'correct', 'updated_at']
+    search_fields = ['user__email']
+    readonly_fields = [field.name for field in UserAnalysisStats._meta.fields]
@@ -0,0 +1,143 @@
+"""
+Management Command para pré-gerar análises das próximas partidas das ligas
+prioritárias (League.priority), dentro do orçamento diário do Gemini
+Executar via cron no horário fora de pico: python manage.py pregenerate_analyses
+"""
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.analysis.services import precomputed, quick_analysis
+from apps.matches.models import League
+from apps.matches.services import fixture_window
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+UPCOMING_STATUSES = ('NS', 'TBD')
+
+
+class Command(BaseCommand):
+    help = 'Pré-gera análises das próximas partidas das ligas prioritárias'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget',
+            type=int,
+            default=None,
+            help='Máximo de gerações nesta execução (padrão: o que resta do orçamento diário)'
+        )
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=None,
+            help='Partidas que começam nas próximas N horas (padrão: PREGENERATE_LOOKAHEAD_HOURS)'
+        )
+        parser.add_argument(
+            '--min-priority',
+            type=int,
+            default=None,
+            help='Prioridade mínima da liga (padrão: PREGENERATE_MIN_PRIORITY)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Executar mesmo fora do horário fora de pico'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas listar as partidas que seriam analisadas'
+        )
+
+    def handle(self, *args, **options):
+        if not options['force'] and not self._is_off_peak():
+            start, end = settings.PREGENERATE_OFF_PEAK_HOURS
+            self.stdout.write(self.style.WARNING(
+                f'Fora do horário de pré-geração ({start}h-{end}h) - use --force para executar'
+            ))
+            return
+
+        budget = precomputed.remaining_budget()
+        if options['budget'] is not None:
+            budget = min(budget, options['budget'])
+        if budget <= 0:
+            self.stdout.write(self.style.WARNING('Orçamento diário de gerações esgotado'))
+            return
+
+        candidates = self._candidates(
+            options['hours'] or settings.PREGENERATE_LOOKAHEAD_HOURS,
+            options['min_priority'] if options['min_priority'] is not None else settings.PREGENERATE_MIN_PRIORITY,
+        )
+        pending = [m for m in candidates if precomputed.get(m['id'], m) is None]
+        self.stdout.write(
+            f'{len(candidates)} partidas elegíveis, {len(pending)} sem análise pré-gerada '
+            f'(orçamento: {budget})'
+        )
+
+        if options['dry_run']:
+            for match in pending[:budget]:
+                self.stdout.write(f"  • {match['date']} {match['home_team']['name']} x {match['away_team']['name']} ({match['league']['name']})")
+            return
+
+        generated = failed = 0
+        started = time.monotonic()
+        for match in pending:
+            if generated + failed >= budget:
+                break
+            result = precomputed.generate(quick_analysis.match_data_from_fixture(match))
+            if result.get('degraded'):
+                self.stdout.write(self.style.ERROR('Circuito do Gemini aberto - interrompendo'))
+                break
+            if not result.get('cached'):
+                precomputed.spend_budget()
+            if result.get('success'):
+                generated += 1
+                self.stdout.write(f"✓ {match['home_team']['name']} x {match['away_team']['name']}")
+            else:
+                failed += 1
+                logger.warning(f"Pré-geração falhou para {match['id']}: {result.get('error')}")
+                if result.get('error_code') == 'QUOTA_EXCEEDED':
+                    self.stdout.write(self.style.ERROR('Quota do Gemini excedida - interrompendo'))
+                    break
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {generated} análises pré-geradas em {time.monotonic() - started:.0f}s ({failed} falhas)'
+        ))
+
+    def _is_off_peak(self):
+        start, end = settings.PREGENERATE_OFF_PEAK_HOURS
+        hour = timezone.localtime().hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end  # Janela que atravessa a meia-noite
+
+    def _candidates(self, hours, min_priority):
+        """Próximas partidas das ligas prioritárias, da maior prioridade para a menor"""
+        snapshot = fixture_window.get_or_build_snapshot()
+        if snapshot is None:
+            return []
+
+        leagues = League.objects.filter(is_active=True, priority__gte=min_priority)
+        by_api_id = {l.api_football_id: l.priority for l in leagues if l.api_football_id}
+        by_name = {(l.name.lower(), l.country.lower()): l.priority for l in leagues}
+
+        now = timezone.now()
+        limit = now + timedelta(hours=hours)
+        selected = []
+        for match in snapshot['matches']:
+            if match['status'] not in UPCOMING_STATUSES:
+                continue
+            league = match['league']
+            priority = by_api_id.get(league.get('id'))
+            if priority is None:
+                priority = by_name.get((league['name'].lower(), (league.get('country') or '').lower()))
+            if priority is None:
+                continue
+            kickoff = datetime.fromisoformat(match['date'].replace('Z', '+00:00'))
+            if now <= kickoff <= limit:
+                selected.append((-priority, kickoff, match))
+
+        selected.sort(key=lambda item: (item[0], item[1]))
+        return [match for _, _, match in selected]
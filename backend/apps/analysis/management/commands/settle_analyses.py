@@ -0,0 +1,34 @@
+"""
+Management Command para liquidar as análises pendentes das partidas encerradas
+(complementa a liquidação disparada ao salvar a partida; seguro para rodar de novo)
+Em produção roda pelo Celery beat (settle-analyses, serviço celery_beat do
+docker-compose); sem o beat, agendar via cron: python manage.py settle_analyses
+"""
+from django.core.management.base import BaseCommand
+from apps.analysis.services import settlement
+
+
+class Command(BaseCommand):
+    help = 'Liquida (valida) as análises pendentes das partidas encerradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--match',
+            type=int,
+            action='append',
+            dest='match_ids',
+            help='Só esta partida (id no banco; pode repetir)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas mostra o que seria liquidado'
+        )
+
+    def handle(self, *args, **options):
+        summary = settlement.settle(options['match_ids'], dry_run=options['dry_run'])
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}✓ {summary['settled']} análises liquidadas em {summary['matches']} partidas "
+            f"({summary['correct']} corretas, {summary['users']} usuários)"
+        ))
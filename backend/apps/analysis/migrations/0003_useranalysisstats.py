@@ -0,0 +1,81 @@
+# Generated manually on 2026-10-18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def backfill_user_stats(apps, schema_editor):
+    """Cria a linha de estatísticas de cada usuário com análises, a partir do histórico"""
+    Analysis = apps.get_model('analysis', 'Analysis')
+    UserAnalysisStats = apps.get_model('analysis', 'UserAnalysisStats')
+
+    aggregates = {
+        'total': Count('id'),
+        'validated': Count('id', filter=Q(is_correct__isnull=False)),
+        'correct': Count('id', filter=Q(is_correct=True)),
+    }
+    for level in range(1, 6):
+        aggregates[f'total_confidence_{level}'] = Count('id', filter=Q(confidence=level))
+        aggregates[f'correct_confidence_{level}'] = Count('id', filter=Q(confidence=level, is_correct=True))
+    for prediction in ('home', 'draw', 'away'):
+        aggregates[f'total_{prediction}'] = Count('id', filter=Q(prediction=prediction))
+        aggregates[f'correct_{prediction}'] = Count('id', filter=Q(prediction=prediction, is_correct=True))
+
+    rows = Analysis.objects.order_by().values('user_id').annotate(**aggregates)
+    UserAnalysisStats.objects.bulk_create(
+        [UserAnalysisStats(**row) for row in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("analysis", "0002_analysis_analysis"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserAnalysisStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="analysis_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Usuário",
+                    ),
+                ),
+                ("total", models.IntegerField(default=0, verbose_name="Análises")),
+                ("validated", models.IntegerField(default=0, verbose_name="Validadas")),
+                ("correct", models.IntegerField(default=0, verbose_name="Corretas")),
+                ("total_confidence_1", models.IntegerField(default=0)),
+                ("total_confidence_2", models.IntegerField(default=0)),
+                ("total_confidence_3", models.IntegerField(default=0)),
+                ("total_confidence_4", models.IntegerField(default=0)),
+                ("total_confidence_5", models.IntegerField(default=0)),
+                ("correct_confidence_1", models.IntegerField(default=0)),
+                ("correct_confidence_2", models.IntegerField(default=0)),
+                ("correct_confidence_3", models.IntegerField(default=0)),
+                ("correct_confidence_4", models.IntegerField(default=0)),
+                ("correct_confidence_5", models.IntegerField(default=0)),
+                ("total_home", models.IntegerField(default=0)),
+                ("total_draw", models.IntegerField(default=0)),
+                ("total_away", models.IntegerField(default=0)),
+                ("correct_home", models.IntegerField(default=0)),
+                ("correct_draw", models.IntegerField(default=0)),
+                ("correct_away", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Atualizado Em")),
+            ],
+            options={
+                "verbose_name": "Estatísticas de Análises",
+                "verbose_name_plural": "Estatísticas de Análises",
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
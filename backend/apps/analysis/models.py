@@ -68,16 +68,65 @@ class Analysis(models.Model):
     def validate_result(self):
         """Valida o resultado após a partida terminar"""
         if self.match.status == 'finished':
+            previous = self.is_correct
             actual = self.match.get_result()
             self.actual_result = actual
             self.is_correct = (self.prediction == actual)
             self.save()
             
-            # Atualizar estatísticas do usuário
-            if self.is_correct:
-                self.user.successful_predictions += 1
-                self.user.save()
+            # Atualizar estatísticas do usuário (revalidar não conta de novo;
+            # um acerto desfeito por correção do placar é descontado)
+            from .services import user_stats
+            user_stats.record_validated(self, previous)
+            delta = (self.is_correct is True) - (previous is True)
+            if delta:
+                type(self.user).objects.filter(pk=self.user_id).update(
+                    successful_predictions=models.F('successful_predictions') + delta
+                )
     
     def get_confidence_stars(self):
         """Retorna estrelas visuais de confiança"""
         return '⭐' * self.confidence
+
+
+class UserAnalysisStats(models.Model):
+    """
+    Estatísticas de acerto do usuário, mantidas incrementalmente
+    (services.user_stats) na criação e na validação das análises
+    """
+    
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='analysis_stats', verbose_name="Usuário")
+    
+    # Totais
+    total = models.IntegerField(default=0, verbose_name="Análises")
+    validated = models.IntegerField(default=0, verbose_name="Validadas")
+    correct = models.IntegerField(default=0, verbose_name="Corretas")
+    
+    # Por nível de confiança
+    total_confidence_1 = models.IntegerField(default=0)
+    total_confidence_2 = models.IntegerField(default=0)
+    total_confidence_3 = models.IntegerField(default=0)
+    total_confidence_4 = models.IntegerField(default=0)
+    total_confidence_5 = models.IntegerField(default=0)
+    correct_confidence_1 = models.IntegerField(default=0)
+    correct_confidence_2 = models.IntegerField(default=0)
+    correct_confidence_3 = models.IntegerField(default=0)
+    correct_confidence_4 = models.IntegerField(default=0)
+    correct_confidence_5 = models.IntegerField(default=0)
+    
+    # Por predição
+    total_home = models.IntegerField(default=0)
+    total_draw = models.IntegerField(default=0)
+    total_away = models.IntegerField(default=0)
+    correct_home = models.IntegerField(default=0)
+    correct_draw = models.IntegerField(default=0)
+    correct_away = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado Em")
+    
+    class Meta:
+        verbose_name = "Estatísticas de Análises"
+        verbose_name_plural = "Estatísticas de Análises"
+    
+    def __str__(self):
+        return f"Estatísticas de {self.user.email} ({self.correct}/{self.total})"
@@ -2,64 +2,65 @@
 Serviço de análise com Google Gemini AI
 Gera análises preditivas e recomendações de apostas
 """
-import google.generativeai as genai
 from google.api_core import exceptions as google_exceptions
 from django.conf import settings
-from typing import Dict
+from django.core.cache import cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 import logging
-import json
+import threading
+
+from apps.matches.services import single_flight
+from . import analysis_cache, circuit_breaker, heuristic, model_registry, model_router, prompt_builder, structured_output
 
 logger = logging.getLogger(__name__)
 
+# Marca as análises geradas em lote no cache (não substituem a análise individual)
+BATCH_CACHE_TAG = 'batch:'
+
+_shared = None
+_shared_guard = threading.Lock()
+
+
+def get_analyzer() -> 'AIAnalyzer':
+    """Analisador compartilhado do processo (sem estado por requisição)"""
+    global _shared
+    if _shared is None:
+        with _shared_guard:
+            if _shared is None:
+                _shared = AIAnalyzer()
+    return _shared
+
 
 class AIAnalyzer:
     """Serviço de análise com IA (Google Gemini)"""
     
-    def __init__(self):
-        api_key = settings.GOOGLE_GEMINI_API_KEY
-        if not api_key:
+    def __init__(self, model_name: str = None):
+        """
+        Args:
+            model_name: Modelo fixo; None usa o preferido do registro de modelos
+        """
+        self._model_name = model_name
+        if not settings.GOOGLE_GEMINI_API_KEY:
             logger.error("Chave da API do Gemini não configurada.")
-            # Inicializa um modelo nulo para evitar crashes; chamadas retornarão erro estruturado
-            self.model = None
-            return
-
-        genai.configure(api_key=api_key)
-        # Selecionar um modelo suportado dinamicamente via list_models
-        model_name = None
-        try:
-            available = list(genai.list_models())
-            supported = [m for m in available if hasattr(m, 'supported_generation_methods') and ('generateContent' in m.supported_generation_methods)]
-            # Ordenar preferência: gemini-2.5 > gemini-1.5 > gemini-1.0 > gemini-pro
-            def score(m):
-                n = getattr(m, 'name', getattr(m, 'model', '')).lower()
-                if 'gemini-2.5' in n:
-                    return 0
-                if 'gemini-1.5' in n:
-                    return 1
-                if 'gemini-1.0' in n:
-                    return 2
-                if 'gemini-pro' in n:
-                    return 3
-                return 4
-            supported.sort(key=score)
-            chosen = supported[0] if supported else None
-            if chosen:
-                chosen_name = getattr(chosen, 'name', getattr(chosen, 'model', None)) or 'gemini-pro'
-                # Aceitar tanto 'models/...' quanto nome simples
-                if isinstance(chosen_name, str) and chosen_name.startswith('models/'):
-                    chosen_name = chosen_name.replace('models/', '')
-                self.model = genai.GenerativeModel(chosen_name)
-                model_name = chosen_name
-            else:
-                logger.error("Nenhum modelo com suporte a generateContent disponível para esta chave/API.")
-                self.model = None
-        except Exception as e:
-            logger.error(f"Falha ao listar modelos do Gemini: {e}")
-            self.model = None
-        
-        logger.info(f"AI Analyzer inicializado com modelo: {model_name}")
     
-    def analyze_match(self, match_data: Dict) -> Dict:
+    @property
+    def model_name(self):
+        """Modelo usado nesta chamada (o registro pode trocá-lo ao ser renovado)"""
+        return self._model_name or model_registry.default_model_name()
+    
+    @property
+    def model(self):
+        """Handle compartilhado do modelo; None sem chave/modelo disponível"""
+        if not settings.GOOGLE_GEMINI_API_KEY:
+            return None
+        name = self.model_name
+        if not name:
+            logger.error("Nenhum modelo com suporte a generateContent disponível para esta chave/API.")
+            return None
+        return model_registry.get_model(name)
+    
+    def analyze_match(self, match_data: Dict, tier: str = None) -> Dict:
         """
         Analisa uma partida e retorna predição
         
@@ -69,597 +70,339 @@ class AIAnalyzer:
         - h2h: list de resultados anteriores
         - league: str
         - date: str
+        
+        tier: nível de modelo ('fast'/'deep', ver model_router); None usa
+        GEMINI_DEFAULT_TIER. Se um modelo da rota esgotar a quota, o próximo é usado.
+        
+        Análises com entradas idênticas são servidas do cache (result['cached']),
+        sem passar pelo disjuntor. Com o circuito do Gemini aberto (circuit_breaker)
+        o Gemini não é chamado: volta a estimativa estatística (result['degraded']).
         """
-        try:
-            if not self.model:
-                return {
-                    'success': False,
-                    'error': 'API key do Gemini não configurada.',
-                    'error_code': 'API_KEY_MISSING',
-                    'http_status': 400
-                }
-            prompt = self._build_analysis_prompt(match_data)
-            logger.info(f"Analisando: {match_data.get('home_team', {}).get('name')} vs {match_data.get('away_team', {}).get('name')}")
-            
-            try:
-                response = self.model.generate_content(prompt)
-            except google_exceptions.ResourceExhausted as e:
-                # Erro 429 - Quota excedida (rate limit)
-                logger.error(f"Quota da API Gemini excedida: {e}")
-                return {
-                    'success': False,
-                    'error': 'Limite diário de análises da API foi atingido. Tente novamente mais tarde.',
-                    'error_code': 'QUOTA_EXCEEDED',
-                    'details': str(e),
-                    'http_status': 429
-                }
-            except google_exceptions.NotFound as e:
-                logger.error(f"Modelo do Gemini não encontrado/sem suporte: {e}")
-                return {
-                    'success': False,
-                    'error': 'Modelo do Gemini não encontrado ou sem suporte para generateContent.',
-                    'error_code': 'MODEL_NOT_FOUND',
-                    'details': str(e),
-                    'http_status': 404
-                }
-            
-            return {
-                'success': True,
-                'analysis': response.text,
-                'confidence': self._extract_confidence(response.text)
-            }
-        except google_exceptions.InvalidArgument as e:
-            # Erros de chave inválida/expirada retornam como InvalidArgument (400)
-            logger.error(f"Erro na análise (API key inválida/expirada): {e}")
-            return {
-                'success': False,
-                'error': 'API key do Gemini inválida ou expirada. Atualize a chave.',
-                'error_code': 'API_KEY_INVALID',
-                'details': str(e),
-                'http_status': 400
-            }
-        except Exception as e:
-            logger.error(f"Erro na análise: {e}")
-            return {
-                'success': False,
-                'error': 'Falha ao gerar a análise. Tente novamente mais tarde.',
-                'details': str(e),
-                'http_status': 500
-            }
-    
-    def _build_analysis_prompt(self, data: Dict) -> str:
-        """Construir prompt para análise com dados enriquecidos"""
-        # LOG DETALHADO: Ver exatamente o que está chegando
-        logger.info("="*80)
-        logger.info("🔍 DADOS RECEBIDOS PARA ANÁLISE:")
-        logger.info(f"📋 Chaves disponíveis: {list(data.keys())}")
-        logger.info(f"📊 Tem statistics? {bool(data.get('statistics'))}")
-        logger.info(f"🎲 Tem predictions? {bool(data.get('predictions'))}")
-        logger.info(f"⚽ Tem fixture_details? {bool(data.get('fixture_details'))}")
-        logger.info(f"📜 Tem H2H? {bool(data.get('h2h'))}")
-        logger.info(f"🔵 Tem Football-Data match? {bool(data.get('football_data_match'))}")
-        logger.info(f"🆔 API ID usado? {data.get('api_id', 'NÃO')}")
+        prepared = self._prepare(match_data, tier)
+        if 'error' in prepared:
+            return prepared
+        # Acerto de cache antes do disjuntor: não ocupa a chamada de teste
+        hit = self._cached(prepared, match_data)
+        if hit is not None:
+            return hit
+        if not circuit_breaker.allow_request():
+            return self._degraded(prepared, match_data)
         
-        if data.get('statistics'):
-            logger.info(f"📈 Estatísticas: {len(data['statistics'])} times")
-        if data.get('predictions'):
-            logger.info(f"🎯 Previsões encontradas: {list(data['predictions'].keys())[:5]}")
-        if data.get('fixture_details'):
-            logger.info(f"⚽ Fixture: {list(data['fixture_details'].keys())[:5]}")
-        logger.info("="*80)
+        result = None
+        for model_name in model_router.usable(prepared['route']):
+            result = self._analyze_with(model_name, prepared['prompt'], match_data)
+            if result.get('error_code') != 'QUOTA_EXCEEDED':
+                break
+            model_router.mark_exhausted(model_name)
+        if result.get('cached'):
+            # Gerada por outro chamador enquanto aguardávamos: nada a registrar
+            circuit_breaker.release_probe()
+        else:
+            circuit_breaker.record(result)
+        return result
+    
+    def _analyze_with(self, model_name: str, prompt: str, match_data: Dict) -> Dict:
+        """Análise num modelo específico, via cache endereçado por conteúdo"""
+        model = model_registry.get_model(model_name)
         
-        home = data.get('home_team', {}).get('name', 'Time A')
-        away = data.get('away_team', {}).get('name', 'Time B')
-        league = data.get('league', 'Liga')
-        date = data.get('date', 'Data não disponível')
-        status = data.get('status', 'scheduled')
-        venue = data.get('venue', 'Estádio não informado')
+        # Entradas idênticas (mesmo modelo e prompt) reaproveitam a análise;
+        # pedidos simultâneos pela mesma análise aguardam uma única geração
+        key = analysis_cache.cache_key(model_name, prompt, match_data)
+        generated = {}
         
-        prompt = f"""
-Você é um especialista em análise de apostas de futebol com 20 anos de experiência. Analise esta partida em detalhes:
-
-═══════════════════════════════════════
-📊 INFORMAÇÕES DA PARTIDA
-═══════════════════════════════════════
-🏟️ **{home}** vs **{away}**
-🏆 Liga: {league}
-📅 Data: {date}
-📍 Local: {venue}
-⚽ Status: {status}
-"""
+        def generate():
+            generated['result'] = self._generate(model, prompt, model_name)
+            return generated['result'] if generated['result']['success'] else None
         
-        # Adicionar placar se disponível (partida em andamento ou finalizada)
-        home_score = data.get('home_score')
-        away_score = data.get('away_score')
-        if home_score is not None and away_score is not None:
-            prompt += f"\n🎯 Placar: {home} {home_score} x {away_score} {away}\n"
+        result = single_flight.get_or_fetch(
+            key,
+            generate,
+            analysis_cache.ttl_for(match_data),
+            lock_timeout=settings.AI_ANALYSIS_LOCK_TIMEOUT,
+            wait_timeout=settings.AI_ANALYSIS_LOCK_TIMEOUT,
+        )
         
-        # 🔥 NOVO: Adicionar dados enriquecidos
-        table_context = data.get('table_context')
-        if table_context:
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "📊 POSIÇÃO NA TABELA\n"
-            prompt += "═══════════════════════════════════════\n"
-            home_table = table_context.get('home', {})
-            away_table = table_context.get('away', {})
-            prompt += f"🏠 {home}: {home_table.get('position')}º lugar, {home_table.get('points')} pts (Saldo: {home_table.get('goal_difference')})\n"
-            prompt += f"   Forma: {home_table.get('form', 'N/A')} | Casa: {home_table.get('home_record', 'N/A')}\n"
-            prompt += f"✈️ {away}: {away_table.get('position')}º lugar, {away_table.get('points')} pts (Saldo: {away_table.get('goal_difference')})\n"
-            prompt += f"   Forma: {away_table.get('form', 'N/A')} | Fora: {away_table.get('away_record', 'N/A')}\n"
+        if 'result' in generated:
+            return {**generated['result'], 'cached': False}
+        if result is not None:
+            logger.info("📦 Análise servida do cache")
+            return {**result, 'cached': True}
+        # A geração de outro chamador falhou: tentar por conta própria
+        return {**self._generate(model, prompt, model_name), 'cached': False}
+    
+    def analyze_match_stream(self, match_data: Dict, tier: str = None):
+        """
+        Gera a análise em partes, repassando cada trecho assim que o Gemini o envia
         
-        # Adicionar lesões
-        injuries = data.get('injuries')
-        if injuries and (injuries.get('home') or injuries.get('away')):
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "🚑 LESÕES E SUSPENSÕES\n"
-            prompt += "═══════════════════════════════════════\n"
-            home_injuries = injuries.get('home', [])
-            away_injuries = injuries.get('away', [])
-            if home_injuries:
-                prompt += f"🏠 {home}: {len(home_injuries)} ausências\n"
-                for injury in home_injuries[:3]:  # Top 3
-                    prompt += f"   • {injury.get('player')} - {injury.get('reason')} ({injury.get('type')})\n"
-            if away_injuries:
-                prompt += f"✈️ {away}: {len(away_injuries)} ausências\n"
-                for injury in away_injuries[:3]:  # Top 3
-                    prompt += f"   • {injury.get('player')} - {injury.get('reason')} ({injury.get('type')})\n"
+        Yields:
+            tuple: ('chunk', str) para cada trecho do texto e, por último,
+                   ('result', dict) no mesmo formato de analyze_match
         
-        # Adicionar odds
-        odds = data.get('odds')
-        if odds:
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "💰 ODDS DAS CASAS DE APOSTAS\n"
-            prompt += "═══════════════════════════════════════\n"
-            prompt += f"🏠 Vitória {home}: {odds.get('home_win', 'N/A')}\n"
-            prompt += f"🤝 Empate: {odds.get('draw', 'N/A')}\n"
-            prompt += f"✈️ Vitória {away}: {odds.get('away_win', 'N/A')}\n"
-            if odds.get('over_25'):
-                prompt += f"📊 Over 2.5: {odds.get('over_25')} | Under 2.5: {odds.get('under_25')}\n"
-            if odds.get('btts_yes'):
-                prompt += f"⚽ Ambos Marcam: Sim {odds.get('btts_yes')} | Não {odds.get('btts_no')}\n"
-            prompt += "\n💡 Use as odds para calibrar probabilidades e identificar onde o mercado está precificando valor.\n"
+        A confiança é extraída do texto completo no final; análises bem-sucedidas
+        entram no mesmo cache de analyze_match (um acerto sai como um único trecho).
+        Quota esgotada antes do primeiro trecho passa para o próximo modelo da rota.
+        Com o circuito aberto, a análise degradada sai como um único trecho.
+        """
+        prepared = self._prepare(match_data, tier)
+        if 'error' in prepared:
+            yield 'result', prepared
+            return
+        hit = self._cached(prepared, match_data)
+        if hit is not None:
+            yield 'chunk', hit['analysis']
+            yield 'result', hit
+            return
+        if not circuit_breaker.allow_request():
+            result = self._degraded(prepared, match_data)
+            yield 'chunk', result['analysis']
+            yield 'result', result
+            return
+        prompt = prepared['prompt']
         
-        # Adicionar estatísticas detalhadas dos times
-        home_stats = data.get('home_stats')
-        away_stats = data.get('away_stats')
-        if home_stats or away_stats:
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "📈 ESTATÍSTICAS DETALHADAS DOS TIMES\n"
-            prompt += "═══════════════════════════════════════\n"
-            if home_stats:
-                prompt += f"🏠 {home} ({home_stats.get('games_played', 0)} jogos):\n"
-                goals_avg = float(home_stats.get('goals_per_game_avg', 0) or 0)
-                conceded_avg = float(home_stats.get('goals_conceded_avg', 0) or 0)
-                prompt += f"   • Média gols marcados: {goals_avg:.2f}/jogo\n"
-                prompt += f"   • Média gols sofridos: {conceded_avg:.2f}/jogo\n"
-                prompt += f"   • Clean sheets: {home_stats.get('clean_sheets', 0)}\n"
-                streak = home_stats.get('biggest_streak', {})
-                prompt += f"   • Maior sequência: {streak.get('wins', 0)}V, {streak.get('draws', 0)}E, {streak.get('loses', 0)}D\n"
-            if away_stats:
-                prompt += f"✈️ {away} ({away_stats.get('games_played', 0)} jogos):\n"
-                goals_avg = float(away_stats.get('goals_per_game_avg', 0) or 0)
-                conceded_avg = float(away_stats.get('goals_conceded_avg', 0) or 0)
-                prompt += f"   • Média gols marcados: {goals_avg:.2f}/jogo\n"
-                prompt += f"   • Média gols sofridos: {conceded_avg:.2f}/jogo\n"
-                prompt += f"   • Clean sheets: {away_stats.get('clean_sheets', 0)}\n"
-                streak = away_stats.get('biggest_streak', {})
-                prompt += f"   • Maior sequência: {streak.get('wins', 0)}V, {streak.get('draws', 0)}E, {streak.get('loses', 0)}D\n"
+        error = None
+        for model_name in model_router.usable(prepared['route']):
+            key = analysis_cache.cache_key(model_name, prompt, match_data)
+            # O bloco JSON final não é repassado: só o texto antes do marcador,
+            # segurando o fim de cada trecho que pode ser o início do marcador
+            parts = []
+            sent = 0
+            marker = structured_output.MARKER
+            try:
+                for chunk in model_registry.get_model(model_name).generate_content(prompt, stream=True):
+                    if not chunk.text:
+                        continue
+                    parts.append(chunk.text)
+                    text = ''.join(parts)
+                    cut = text.find(marker)
+                    end = cut if cut != -1 else max(sent, len(text) - len(marker) + 1)
+                    if end > sent:
+                        yield 'chunk', text[sent:end]
+                        sent = end
+            except Exception as e:
+                error = self._error_result(e)
+                if error.get('error_code') == 'QUOTA_EXCEEDED' and not parts:
+                    model_router.mark_exhausted(model_name)
+                    continue
+                circuit_breaker.record(error)
+                yield 'result', {**error, 'cached': False}
+                return
+            
+            text = ''.join(parts)
+            if marker not in text and len(text) > sent:
+                yield 'chunk', text[sent:]
+            result = self._success(text, model_name)
+            circuit_breaker.record(result)
+            cache.set(key, result, analysis_cache.ttl_for(match_data))
+            yield 'result', {**result, 'cached': False}
+            return
         
-        # Adicionar contexto da temporada
-        season_context = data.get('season_context')
-        if season_context:
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "📅 CONTEXTO DA TEMPORADA\n"
-            prompt += "═══════════════════════════════════════\n"
-            prompt += f"🏆 Temporada: {season_context.get('season')} | Rodada: {season_context.get('round')}\n"
-            prompt += f"📍 Fase: {season_context.get('stage', 'mid').title()} (início, meio ou final)\n"
+        circuit_breaker.record(error)
+        yield 'result', {**error, 'cached': False}
+    
+    def analyze_batch(self, matches: List[Dict], tier: str = None) -> List[Dict]:
+        """
+        Analisa várias partidas agrupando-as em menos chamadas ao Gemini
         
-        # 🔥 NOVO: Adicionar tendências Over/Under e BTTS
-        trends = data.get('trends')
-        if trends and trends.get('home', {}).get('games_analyzed', 0) > 0:
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "📊 TENDÊNCIAS DE MERCADO (Últimos 10 jogos)\n"
-            prompt += "═══════════════════════════════════════\n"
-            home_trends = trends.get('home', {})
-            away_trends = trends.get('away', {})
-            prompt += f"🏠 {home} ({home_trends.get('games_analyzed', 0)} jogos):\n"
-            prompt += f"   • Over 2.5 gols: {home_trends.get('over_25_pct', 0):.0f}% dos jogos\n"
-            prompt += f"   • Ambos Marcam (BTTS): {home_trends.get('btts_pct', 0):.0f}% dos jogos\n"
-            prompt += f"✈️ {away} ({away_trends.get('games_analyzed', 0)} jogos):\n"
-            prompt += f"   • Over 2.5 gols: {away_trends.get('over_25_pct', 0):.0f}% dos jogos\n"
-            prompt += f"   • Ambos Marcam (BTTS): {away_trends.get('btts_pct', 0):.0f}% dos jogos\n"
-            if 'combined_over_25_pct' in trends:
-                prompt += f"\n💡 Probabilidade combinada Over 2.5: {trends['combined_over_25_pct']:.0f}%\n"
-                prompt += f"💡 Probabilidade combinada BTTS: {trends['combined_btts_pct']:.0f}%\n"
+        Partidas com análise no cache (individual ou de um lote anterior) não são
+        geradas de novo; as demais vão em prompts de até
+        BATCH_ANALYSIS_MATCHES_PER_PROMPT partidas. Se a resposta de um grupo não
+        trouxer a seção de alguma partida, ela é analisada individualmente.
         
-        # 🔥 NOVO: Adicionar contexto de descanso
-        rest_context = data.get('rest_context')
-        if rest_context and rest_context.get('home_days_rest') is not None:
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "⏱️ DESCANSO ENTRE JOGOS\n"
-            prompt += "═══════════════════════════════════════\n"
-            home_rest = rest_context.get('home_days_rest')
-            away_rest = rest_context.get('away_days_rest')
-            advantage = rest_context.get('advantage', 'equal')
-            prompt += f"🏠 {home}: {home_rest} dias de descanso\n"
-            prompt += f"✈️ {away}: {away_rest} dias de descanso\n"
-            if advantage == 'home':
-                prompt += f"📊 Vantagem física: {home} (mais descansado)\n"
-            elif advantage == 'away':
-                prompt += f"📊 Vantagem física: {away} (mais descansado)\n"
-            else:
-                prompt += "📊 Condições físicas equilibradas\n"
+        Returns:
+            list: Resultados no formato de analyze_match, na ordem de `matches`
+                  ('batched' indica análise gerada num prompt com várias partidas)
+        """
+        results = [None] * len(matches)
+        pending = []
+        contexts = {}
+        route = []
         
-        # 🔥 NOVO: Adicionar análise de motivação
-        motivation = data.get('motivation')
-        if motivation and motivation.get('context') != 'Unknown':
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "🎖️ MOTIVAÇÃO E CONTEXTO\n"
-            prompt += "═══════════════════════════════════════\n"
-            prompt += f"🔥 {motivation.get('context', 'Normal league match')}\n\n"
-            home_level = motivation.get('home', 'medium')
-            home_reason = motivation.get('home_reason', '')
-            away_level = motivation.get('away', 'medium')
-            away_reason = motivation.get('away_reason', '')
-            
-            stars = {'very_high': '⭐⭐⭐⭐⭐', 'high': '⭐⭐⭐⭐', 'medium': '⭐⭐⭐', 'low': '⭐⭐'}
-            prompt += f"🏠 {home}: {stars.get(home_level, '⭐⭐⭐')} {home_level.upper()}\n"
-            prompt += f"   Razão: {home_reason}\n"
-            prompt += f"✈️ {away}: {stars.get(away_level, '⭐⭐⭐')} {away_level.upper()}\n"
-            prompt += f"   Razão: {away_reason}\n"
+        for index, match_data in enumerate(matches):
+            prepared = self._prepare(match_data, tier)
+            if 'error' in prepared:
+                results[index] = prepared
+                continue
+            route = prepared['route']
+            model_name = model_router.usable(route)[0]
+            key = analysis_cache.cache_key(model_name, prepared['prompt'], match_data)
+            hit = cache.get(key) or cache.get(self._batch_key(model_name, prepared['prompt'], match_data))
+            if hit is not None:
+                results[index] = {**hit, 'cached': True}
+                continue
+            contexts[index] = prepared['context']
+            pending.append((index, prepared['prompt']))
         
-        # Adicionar estatísticas da partida (ao vivo/finalizadas)
-        statistics = data.get('statistics')
-        if statistics and len(statistics) >= 2:
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "📈 ESTATÍSTICAS DA PARTIDA (AO VIVO)\n"
-            prompt += "═══════════════════════════════════════\n"
-            
-            home_stats = statistics[0].get('statistics', [])
-            away_stats = statistics[1].get('statistics', [])
-            
-            prompt += f"📊 Comparativo {home} vs {away}:\n\n"
-            for idx, stat in enumerate(home_stats):
-                stat_type = stat.get('type')
-                home_val = stat.get('value', 0) or 0
-                away_val = away_stats[idx].get('value', 0) if idx < len(away_stats) else 0
-                away_val = away_val or 0
-                prompt += f"  • {stat_type}: {home_val} vs {away_val}\n"
+        size = max(1, settings.BATCH_ANALYSIS_MATCHES_PER_PROMPT)
+        groups = [pending[i:i + size] for i in range(0, len(pending), size)]
+        if groups:
+            with ThreadPoolExecutor(max_workers=min(len(groups), settings.BATCH_ANALYSIS_CONCURRENCY)) as executor:
+                outcomes = executor.map(
+                    lambda group: self._analyze_group(route, tier, group, matches, contexts), groups
+                )
+                for outcome in outcomes:
+                    for index, result in outcome.items():
+                        results[index] = result
         
-        # Adicionar dados da fixture (detalhes gerais)
-        fixture_details = data.get('fixture_details')
-        # Adicionar dados da fixture (detalhes gerais)
-        fixture_details = data.get('fixture_details')
-        if fixture_details:
-            # Informações extras do fixture (árbitro, eventos, etc.)
-            fixture_info = fixture_details.get('fixture', {})
-            referee = fixture_info.get('referee')
-            if referee:
-                prompt += f"\n👨‍⚖️ Árbitro: {referee}\n"
-            
-            # Eventos da partida (gols, cartões)
-            events = fixture_details.get('events', [])
-            if events:
-                prompt += "\n⚽ Principais Eventos:\n"
-                for event in events[:5]:  # Limitar a 5 eventos
-                    time_elapsed = event.get('time', {}).get('elapsed', '?')
-                    team = event.get('team', {}).get('name', 'N/A')
-                    player = event.get('player', {}).get('name', 'N/A')
-                    event_type = event.get('type', 'N/A')
-                    prompt += f"  • {time_elapsed}' - {team}: {player} ({event_type})\n"
+        logger.info(
+            f"📦 Lote: {len(matches)} partidas, {len(matches) - len(pending)} sem geração "
+            f"(cache/erro), {len(pending)} em {len(groups)} prompts"
+        )
+        return results
+    
+    def _batch_key(self, model_name: str, prompt: str, match_data: Dict) -> str:
+        return analysis_cache.cache_key(BATCH_CACHE_TAG + model_name, prompt, match_data)
+    
+    def _analyze_group(self, route: List[str], tier: str, group, matches: List[Dict], contexts: Dict) -> Dict:
+        """Gera as análises de um grupo num único prompt; {índice: resultado}"""
+        if len(group) == 1:
+            index = group[0][0]
+            return {index: self.analyze_match(matches[index], tier)}
         
-        # Adicionar H2H (histórico direto) da Football-Data.org
-        h2h = data.get('h2h')
-        if h2h and len(h2h) > 0:
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "📜 HISTÓRICO DIRETO (H2H)\n"
-            prompt += "═══════════════════════════════════════\n"
-            prompt += f"Últimos {len(h2h)} confrontos entre {home} e {away}:\n\n"
-            
-            home_wins = 0
-            away_wins = 0
-            draws = 0
-            
-            for idx, match in enumerate(h2h[:5], 1):  # Limitar a 5 jogos mais recentes
-                score = match.get('score', {})
-                full_time = score.get('fullTime', {})
-                home_score = full_time.get('home')
-                away_score = full_time.get('away')
-                
-                if home_score is not None and away_score is not None:
-                    # Determinar vencedor
-                    if home_score > away_score:
-                        home_wins += 1
-                        result = "✅ Vitória Casa"
-                    elif away_score > home_score:
-                        away_wins += 1
-                        result = "✅ Vitória Fora"
-                    else:
-                        draws += 1
-                        result = "⚖️ Empate"
-                    
-                    match_date = match.get('utcDate', 'Data desconhecida')[:10]
-                    home_team = match.get('homeTeam', {}).get('name', 'Casa')
-                    away_team = match.get('awayTeam', {}).get('name', 'Fora')
-                    prompt += f"  {idx}. {match_date}: {home_team} {home_score} x {away_score} {away_team} - {result}\n"
-            
-            # Resumo do H2H
-            total = home_wins + away_wins + draws
-            if total > 0:
-                prompt += f"\n📊 Resumo H2H:\n"
-                prompt += f"  • Vitórias Casa: {home_wins} ({(home_wins/total)*100:.1f}%)\n"
-                prompt += f"  • Empates: {draws} ({(draws/total)*100:.1f}%)\n"
-                prompt += f"  • Vitórias Fora: {away_wins} ({(away_wins/total)*100:.1f}%)\n"
+        if not circuit_breaker.allow_request():
+            return {index: heuristic.estimate(matches[index]) for index, _ in group}
         
-        # Adicionar previsões/forma dos times
-        predictions = data.get('predictions')
-        if predictions:
-            prompt += "\n═══════════════════════════════════════\n"
-            prompt += "🎲 DADOS ESTATÍSTICOS E PREVISÕES\n"
-            prompt += "═══════════════════════════════════════\n"
-            
-            # Forma dos times
-            teams_data = predictions.get('teams', {})
-            home_data = teams_data.get('home', {})
-            away_data = teams_data.get('away', {})
-            
-            if home_data:
-                prompt += f"\n🏠 {home}:\n"
-                prompt += f"  • Forma: {home_data.get('last_5', {}).get('form', 'N/A')}\n"
-                prompt += f"  • Ataque: {home_data.get('league', {}).get('goals', {}).get('for', {}).get('average', {}).get('total', 'N/A')} gols/jogo\n"
-                prompt += f"  • Defesa: {home_data.get('league', {}).get('goals', {}).get('against', {}).get('average', {}).get('total', 'N/A')} gols sofridos/jogo\n"
-            
-            if away_data:
-                prompt += f"\n✈️ {away}:\n"
-                prompt += f"  • Forma: {away_data.get('last_5', {}).get('form', 'N/A')}\n"
-                prompt += f"  • Ataque: {away_data.get('league', {}).get('goals', {}).get('for', {}).get('average', {}).get('total', 'N/A')} gols/jogo\n"
-                prompt += f"  • Defesa: {away_data.get('league', {}).get('goals', {}).get('against', {}).get('average', {}).get('total', 'N/A')} gols sofridos/jogo\n"
-            
-            # Comparação de força
-            comparison = predictions.get('comparison', {})
-            if comparison:
-                prompt += "\n⚖️ Comparação de Força:\n"
-                for key, value in comparison.items():
-                    prompt += f"  • {key.replace('_', ' ').title()}: {value.get('home', 'N/A')} vs {value.get('away', 'N/A')}\n"
+        prompt = prompt_builder.build_batch([contexts[index] for index, _ in group])
         
-        prompt += """
-
-═══════════════════════════════════════
-🎯 FORMATO DE RESPOSTA OBRIGATÓRIO
-═══════════════════════════════════════
-
-🚨 ATENÇÃO: Você é um motor de decisão profissional, não um chatbot.
-👉 O usuário deve tomar a DECISÃO em até 3 SEGUNDOS com confiança total.
-
-PRINCÍPIOS DE DESIGN:
-✓ Hierarquia visual clara
-✓ Escaneabilidade máxima
-✓ Linguagem profissional e objetiva
-✓ Sem exageros ou promessas irreais
-✓ Foco em orientação baseada em dados
-
-═══════════════════════════════════════
-🔥 BLOCO 1 — DECISÃO IMEDIATA (HERO)
-═══════════════════════════════════════
-Este é o DESTAQUE PRINCIPAL. Leitura em menos de 5 segundos.
-
-🎯 PREVISÃO DA IA
-
-**[RESULTADO MAIS PROVÁVEL]**
-
-📊 Probabilidade: [XX]%
-⚽ Placar esperado: [X:X]
-
-⭐ Confiança: [X] estrelas ([Alta | Média | Baixa])
-⚠️ Risco: [Baixo | Médio | Alto]
-
-Regras para este bloco:
-- ZERO introduções ou enrolação
-- Uma única previsão clara e direta
-- Probabilidade em destaque (número grande)
-- Estrelas de confiança sempre explicadas
-- Micro-alerta de risco discreto mas visível
-- Otimizado para leitura rápida em mobile
-
-═══════════════════════════════════════
-⚡ BLOCO 2 — FATORES-CHAVE DA DECISÃO
-═══════════════════════════════════════
-Máximo 3-4 bullets. Cada um deve ser persuasivo e escaneável.
-
-⚡ POR QUE ESSA PREVISÃO?
-
-✓ **Forma recente:** [Insight objetivo com dado numérico]
-✓ **Confronto direto:** [Padrão histórico relevante]
-✓ **Análise tática:** [Vantagem competitiva clara]
-✓ **Modelo estatístico:** [Resultado da análise Poisson/xG se disponível]
-
-Regras para este bloco:
-- Cada bullet: 1 linha máxima
-- Formato: **Fator:** Explicação objetiva
-- Dados concretos sempre que possível
-- Evite números excessivos em uma frase
-- Destaque o fator antes da explicação
-- Linguagem persuasiva mas profissional
-
-═══════════════════════════════════════
-📊 BLOCO 3 — PROBABILIDADES VISUAIS
-═══════════════════════════════════════
-Priorize entendimento instantâneo. Números grandes e comparáveis.
-
-📊 PROBABILIDADES
-
-🏠 **[TIME_CASA]:** [XX]%
-🤝 **Empate:** [XX]%
-✈️ **[TIME_FORA]:** [XX]%
-
----
-💡 **Interpretação rápida:** [Uma frase explicando o cenário mais provável]
-
-Regras para este bloco:
-- Percentuais grandes e destacados
-- Soma DEVE ser 100%
-- Cores neutras e profissionais
-- Adicione uma linha de interpretação rápida
-- Facilite comparação visual entre cenários
-- Mobile: empilhar verticalmente
-
-═══════════════════════════════════════
-📚 BLOCO 4 — ANÁLISE DETALHADA
-═══════════════════════════════════════
-Profundidade analítica para quem quer aprofundar. Estrutura colapsável.
-
-**📋 RESUMO EXECUTIVO**
-[2-3 frases com contexto essencial do jogo. Sempre visível, não colapsa.]
-
----
-
-**1️⃣ ANÁLISE DE FORMA**
-
-🏠 **Casa – [TIME_CASA]**
-• Últimos 5 jogos: [Resumo com W-D-L]
-• Desempenho em casa: [Estatística relevante]
-• Momento atual: [Tendência clara]
-
-✈️ **Fora – [TIME_FORA]**
-• Últimos 5 jogos: [Resumo com W-D-L]
-• Desempenho fora: [Estatística relevante]
-• Momento atual: [Tendência clara]
-
----
-
-**2️⃣ CONFRONTOS DIRETOS (H2H)**
-• Histórico: [X vitórias casa, Y empates, Z vitórias fora nos últimos N jogos]
-• Padrão identificado: [Tendência relevante]
-• Contexto: [Informação que muda a leitura dos números]
-
----
-
-**3️⃣ ANÁLISE TÁTICA E ESTATÍSTICA**
-• **Ataque vs Defesa:** [Comparação de médias de gols]
-• **Estilo de jogo:** [Como os estilos se complementam/conflitam]
-• **Fator decisivo:** [O que pode definir o jogo]
-• **xG e Poisson:** [Resultado de modelos estatísticos, se disponíveis]
-
-Regras para este bloco:
-- Resumo executivo sempre visível
-- Restante pode ser colapsável no frontend
-- Evite redundância entre seções
-- Fluxo de leitura otimizado para mobile
-- Mantenha profundidade sem perder clareza
-
-═══════════════════════════════════════
-💰 BLOCO 5 — RECOMENDAÇÃO FINAL
-═══════════════════════════════════════
-Acionável, coerente com os dados, sem imposição.
-
-💰 RECOMENDAÇÃO
-
-**Aposta sugerida:** [Mercado específico + seleção]
-**Tipo:** [Conservadora | Equilibrada | Agressiva]
-
-✅ **Justificativa:** [Por que esta aposta faz sentido com base nos dados apresentados]
-⚠️ **Gestão de risco:** [Como minimizar perdas ou maximizar value]
-
-💡 **Alternativa:** [Segunda melhor opção, se houver]
-
-Regras para este bloco:
-- Recomendação clara e específica
-- Indicar perfil da aposta (conservadora/agressiva)
-- Justificativa alinhada com análise
-- Gestão de risco sem quebrar confiança
-- Alternativa opcional para usuários avançados
-- Linguagem orientadora, não impositiva
-
-═══════════════════════════════════════
-✍️ REGRAS DE FORMATAÇÃO (OBRIGATÓRIO)
-═══════════════════════════════════════
-
-✔ **Negrito (**texto**):**
-- Nomes dos times
-- Fatores-chave (Forma recente:, Ataque vs Defesa:)
-- Resultados e recomendações
-- Subtítulos importantes
-
-✔ **Números e Percentuais:**
-- Sempre que possível: 65%, 8 vitórias, 2.4 gols, 3:1
-- Serão renderizados como badges visuais
-- Priorize clareza sobre volume
-
-✔ **Bullets (•):**
-- Use para listas escaneáveis
-- NUNCA parágrafo corrido para múltiplos pontos
-- Máximo 4-5 bullets por seção
-
-✔ **Emojis:**
-- Apenas estruturais: 🎯 📊 ⚡ 💰 ⚠️ 🏠 ✈️
-- NÃO use emojis decorativos
-- Ajudam na hierarquia visual
-
-✔ **Logos dos Times:**
-- Sistema detecta automaticamente nomes dos times
-- Renderiza logos inline
-- Não precisa formatar
-
-═══════════════════════════════════════
-🚫 O QUE NÃO FAZER (PROIBIDO)
-═══════════════════════════════════════
-
-❌ NÃO comece com "Olá" ou introduções genéricas
-❌ NÃO use linguagem promocional ou exagerada
-❌ NÃO prometa resultados garantidos
-❌ NÃO invente estatísticas ou dados
-❌ NÃO escreva parágrafos longos no Bloco 1 ou 2
-❌ NÃO pule blocos ou mude a ordem
-❌ NÃO use "*" sozinho (sempre **)
-❌ NÃO escreva como especialista explicando, escreva como motor de decisão
-
-═══════════════════════════════════════
-⭐ ESCALA DE CONFIANÇA (PADRONIZADA)
-═══════════════════════════════════════
-
-**5 estrelas** = Alta (70%+) - Dados completos, favorito claro
-**4 estrelas** = Alta (60-69%) - Bons dados, leve favorito
-**3 estrelas** = Média (50-59%) - Dados moderados, jogo equilibrado
-**2 estrelas** = Baixa (40-49%) - Dados limitados, muita incerteza
-**1 estrela** = Baixa (<40%) - Dados insuficientes, evitar aposta
-
-⚠️ **ESCALA DE RISCO:**
-- **Baixo:** Favorito óbvio, odds conservadoras
-- **Médio:** Jogo competitivo, odds razoáveis
-- **Alto:** Jogo imprevisível, odds arriscadas
-
-═══════════════════════════════════════
-🎯 CHECKLIST DE QUALIDADE FINAL
-═══════════════════════════════════════
-
-Antes de enviar, confirme:
-✓ Bloco 1 pode ser lido em menos de 5 segundos
-✓ Bloco 2 tem máximo 4 bullets, cada um com 1 linha
-✓ Bloco 3 tem percentuais somando 100%
-✓ Bloco 4 tem resumo executivo separado do restante
-✓ Bloco 5 tem recomendação específica e acionável
-✓ Nenhuma promessa irreal ou linguagem promocional
-✓ Números em destaque (serão badges visuais)
-✓ Linguagem profissional e clara
-✓ Otimizado para mobile (leitura vertical)
-✓ Hierarquia visual forte (títulos, bullets, destaques)
-
-═══════════════════════════════════════
-🏁 RESULTADO ESPERADO
-═══════════════════════════════════════
-
-✓ Motor de decisão profissional
-✓ Decisão em 3 segundos
-✓ Profundidade para quem quer aprofundar
-✓ Confiança baseada em dados
-✓ Experiência premium
-✓ Funciona perfeitamente em mobile e desktop
-
-👉 Priorize sempre: CLAREZA > CRIATIVIDADE
-═══════════════════════════════════════
-"""
+        sections = model_name = error = None
+        for candidate in model_router.usable(route):
+            try:
+                text = model_registry.get_model(candidate).generate_content(prompt).text
+            except Exception as e:
+                error = self._error_result(e)
+                if error.get('error_code') == 'QUOTA_EXCEEDED':
+                    model_router.mark_exhausted(candidate)
+                    continue
+                break
+            model_name = candidate
+            sections = self._split_batch_response(text, len(group))
+            break
+        circuit_breaker.record({'success': sections is not None})
+        if sections is None:
+            return {index: {**error, 'cached': False} for index, _ in group}
         
-        return prompt
+        outcome = {}
+        for number, (index, match_prompt) in enumerate(group, start=1):
+            text = sections.get(number)
+            if not text:
+                # Seção ausente na resposta: análise individual só desta partida
+                logger.warning(f"⚠️ Lote sem a seção da partida {number} - analisando individualmente")
+                outcome[index] = self.analyze_match(matches[index], tier)
+                continue
+            result = self._success(text, model_name)
+            cache.set(self._batch_key(model_name, match_prompt, matches[index]), result, analysis_cache.ttl_for(matches[index]))
+            outcome[index] = {**result, 'cached': False, 'batched': True}
+        return outcome
+    
+    def _split_batch_response(self, text: str, count: int) -> Dict[int, str]:
+        """Separa a resposta de um lote pelos marcadores '=== PARTIDA N ==='"""
+        parts = prompt_builder.BATCH_MARKER_RE.split(text)
+        sections = {}
+        # parts = [texto antes do 1º marcador, número, seção, número, seção, ...]
+        for number, section in zip(parts[1::2], parts[2::2]):
+            number = int(number)
+            if 1 <= number <= count and section.strip() and number not in sections:
+                sections[number] = section.strip()
+        return sections
+    
+    def _prepare(self, match_data: Dict, tier: str = None) -> Dict:
+        """Rota de modelos, prompt e dados da partida (context) para a análise, ou um dict de erro ('error' presente)"""
+        try:
+            route = []
+            if settings.GOOGLE_GEMINI_API_KEY:
+                route = [self._model_name] if self._model_name else model_router.route(tier)
+            if not route:
+                return {
+                    'success': False,
+                    'error': 'API key do Gemini não configurada.',
+                    'error_code': 'API_KEY_MISSING',
+                    'http_status': 400
+                }
+            logger.info(f"Analisando: {match_data.get('home_team', {}).get('name')} vs {match_data.get('away_team', {}).get('name')} (modelos: {route})")
+            built = prompt_builder.build(match_data)
+            return {'route': route, 'prompt': built['prompt'], 'context': built['context']}
+        except Exception as e:
+            logger.error(f"Erro na análise: {e}")
+            return {
+                'success': False,
+                'error': 'Falha ao gerar a análise. Tente novamente mais tarde.',
+                'details': str(e),
+                'http_status': 500
+            }
+    
+    def _cached(self, prepared: Dict, match_data: Dict) -> Optional[Dict]:
+        """Análise já em cache num dos modelos da rota (na ordem da rota), ou None"""
+        keys = [analysis_cache.cache_key(name, prepared['prompt'], match_data) for name in prepared['route']]
+        hits = cache.get_many(keys)
+        for key in keys:
+            if key in hits:
+                logger.info("📦 Análise servida do cache")
+                return {**hits[key], 'cached': True}
+        return None
+    
+    def _degraded(self, prepared: Dict, match_data: Dict) -> Dict:
+        """Circuito aberto: estimativa estatística no lugar da IA"""
+        logger.info("🔌 Circuito aberto - estimativa estatística no lugar da IA")
+        return heuristic.estimate(match_data)
+    
+    def _generate(self, model, prompt: str, model_name: str = None) -> Dict:
+        """Chamada ao Gemini (sem cache), com erros estruturados"""
+        try:
+            response = model.generate_content(prompt)
+            return self._success(response.text, model_name)
+        except Exception as e:
+            return self._error_result(e)
+    
+    def _success(self, text: str, model_name: str = None) -> Dict:
+        """Resultado de uma geração: texto para exibição + dados do bloco JSON"""
+        analysis, structured = structured_output.parse(text)
+        confidence = structured.get('confidence') if structured else None
+        return {
+            'success': True,
+            'analysis': analysis,
+            # Sem bloco estruturado (resposta fora do formato): estimar pelo texto
+            'confidence': confidence or self._extract_confidence(analysis),
+            'structured': structured,
+            'model': model_name,
+        }
+    
+    def _error_result(self, e: Exception) -> Dict:
+        """Erro estruturado para uma exceção do Gemini"""
+        if isinstance(e, google_exceptions.ResourceExhausted):
+            # Erro 429 - Quota excedida (rate limit)
+            logger.error(f"Quota da API Gemini excedida: {e}")
+            return {
+                'success': False,
+                'error': 'Limite diário de análises da API foi atingido. Tente novamente mais tarde.',
+                'error_code': 'QUOTA_EXCEEDED',
+                'details': str(e),
+                'http_status': 429
+            }
+        if isinstance(e, google_exceptions.NotFound):
+            logger.error(f"Modelo do Gemini não encontrado/sem suporte: {e}")
+            return {
+                'success': False,
+                'error': 'Modelo do Gemini não encontrado ou sem suporte para generateContent.',
+                'error_code': 'MODEL_NOT_FOUND',
+                'details': str(e),
+                'http_status': 404
+            }
+        if isinstance(e, google_exceptions.InvalidArgument):
+            # Erros de chave inválida/expirada retornam como InvalidArgument (400)
+            logger.error(f"Erro na análise (API key inválida/expirada): {e}")
+            return {
+                'success': False,
+                'error': 'API key do Gemini inválida ou expirada. Atualize a chave.',
+                'error_code': 'API_KEY_INVALID',
+                'details': str(e),
+                'http_status': 400
+            }
+        logger.error(f"Erro na análise: {e}")
+        return {
+            'success': False,
+            'error': 'Falha ao gerar a análise. Tente novamente mais tarde.',
+            'details': str(e),
+            'http_status': 500
+        }
     
     def _extract_confidence(self, text: str) -> int:
         """Extrair nível de confiança da análise de forma robusta"""
@@ -0,0 +1,83 @@
+"""
+Cache de análises da IA endereçado por conteúdo
+A chave é o hash do modelo + prompt (mais odds, lesões e status completos):
+entradas iguais reaproveitam a mesma análise, e qualquer mudança nesses dados
+gera uma chave nova, invalidando a anterior naturalmente
+"""
+from django.conf import settings
+from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Optional
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ai_analysis:'
+
+LIVE_STATUSES = ('1H', 'HT', '2H', 'ET', 'BT', 'P', 'LIVE', 'INT', 'SUSP', 'IN_PLAY', 'PAUSED')
+FINISHED_STATUSES = ('FT', 'AET', 'PEN', 'FINISHED', 'finished')
+
+
+def _status(match_data: Dict) -> str:
+    fixture_details = match_data.get('fixture_details') or {}
+    return fixture_details.get('status') or match_data.get('status') or ''
+
+
+def cache_key(model_name: str, prompt: str, match_data: Dict) -> str:
+    """Hash estável das entradas que definem a análise"""
+    volatile = {
+        'status': _status(match_data),
+        'odds': match_data.get('odds'),
+        'injuries': match_data.get('injuries'),
+    }
+    digest = hashlib.sha256()
+    digest.update((model_name or '').encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(prompt.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(json.dumps(volatile, sort_keys=True, default=str).encode('utf-8'))
+    return f'{KEY_PREFIX}{digest.hexdigest()}'
+
+
+def kickoff(match_data: Dict) -> Optional[datetime]:
+    """Início da partida (aware), se a data for conhecida"""
+    fixture_details = match_data.get('fixture_details') or {}
+    value = fixture_details.get('date') or match_data.get('date')
+    if not value:
+        return None
+    try:
+        starts_at = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if timezone.is_naive(starts_at):
+        starts_at = timezone.make_aware(starts_at, dt_timezone.utc)
+    return starts_at
+
+
+def ttl_for(match_data: Dict) -> int:
+    """
+    Validade da análise (segundos), menor conforme o início se aproxima
+
+    Perto do jogo odds e escalações mudam rápido; ao vivo a análise envelhece
+    em minutos; depois do apito final ela não muda mais.
+    """
+    ttls = settings.AI_ANALYSIS_CACHE_TTL
+    status = _status(match_data)
+    if status in LIVE_STATUSES:
+        return ttls['live']
+    if status in FINISHED_STATUSES:
+        return ttls['finished']
+
+    starts_at = kickoff(match_data)
+    if starts_at is None:
+        return ttls['near']
+    hours_to_kickoff = (starts_at - timezone.now()).total_seconds() / 3600
+    if hours_to_kickoff <= 0:
+        return ttls['live']
+    if hours_to_kickoff <= settings.AI_ANALYSIS_NEAR_HOURS:
+        return ttls['near']
+    if hours_to_kickoff <= 24:
+        return ttls['day']
+    return ttls['far']
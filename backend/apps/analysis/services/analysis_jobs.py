@@ -0,0 +1,54 @@
+"""
+Estado dos jobs assíncronos de análise (guardado no cache)
+A view cria o job e o enfileira no Celery; a task atualiza as etapas
+(queued -> enriching -> generating -> done/failed) e a view de status lê daqui
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from typing import Dict, Optional
+import uuid
+
+KEY_PREFIX = 'analysis_job:'
+
+QUEUED = 'queued'
+ENRICHING = 'enriching'
+GENERATING = 'generating'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _key(job_id: str) -> str:
+    return f'{KEY_PREFIX}{job_id}'
+
+
+def create(user_id: Optional[int]) -> Dict:
+    """Novo job na etapa 'queued'"""
+    job = {
+        'id': uuid.uuid4().hex,
+        'user_id': user_id,
+        'status': QUEUED,
+        'created_at': timezone.now().isoformat(),
+        'updated_at': timezone.now().isoformat(),
+    }
+    cache.set(_key(job['id']), job, settings.ANALYSIS_JOB_TTL)
+    return job
+
+
+def get(job_id: str) -> Optional[Dict]:
+    return cache.get(_key(job_id))
+
+
+def update(job_id: str, status: str, **fields) -> Optional[Dict]:
+    """Avança o job para `status` (a task é a única escritora de cada job)"""
+    job = get(job_id)
+    if job is None:
+        return None
+    job.update(fields, status=status, updated_at=timezone.now().isoformat())
+    cache.set(_key(job_id), job, settings.ANALYSIS_JOB_TTL)
+    return job
+
+
+def public(job: Dict) -> Dict:
+    """Representação devolvida pela view de status"""
+    return {k: v for k, v in job.items() if k != 'user_id'}
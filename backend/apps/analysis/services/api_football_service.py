@@ -2,10 +2,10 @@
 Serviço para buscar dados adicionais da API-Football (RapidAPI)
 Usado para enriquecer análises com contexto completo
 """
-import requests
 import logging
 from django.conf import settings
 from django.core.cache import cache
+from apps.matches.services import http_client, single_flight, team_history
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +26,7 @@ class APIFootballService:
         return f"api_football:{endpoint}:{params_str}"
     
     def _make_request(self, endpoint, params=None, cache_type=None):
-        """Faz requisição para a API-Football com cache"""
+        """Faz requisição para a API-Football com cache e coalescência de misses"""
         # Gerar chave de cache
         cache_key = self._get_cache_key(endpoint, params)
         
@@ -36,21 +36,25 @@ class APIFootballService:
             logger.info(f"📦 Cache HIT: {endpoint} (params: {params})")
             return cached_data
         
-        # Se não estiver no cache, fazer requisição
+        # Se não estiver no cache, apenas um chamador busca na API;
+        # requisições simultâneas pela mesma chave aguardam o resultado dele
         logger.info(f"🌐 Cache MISS: {endpoint} - Buscando da API...")
+        ttl = self.cache_ttl.get(cache_type, 3600) if cache_type else 3600
+        return single_flight.get_or_fetch(
+            cache_key,
+            lambda: self._fetch(endpoint, params, ttl),
+            ttl
+        )
+    
+    def _fetch(self, endpoint, params, ttl):
+        """Requisição à API-Football (sem cache); None em caso de erro"""
         try:
             url = f"{self.base_url}/{endpoint}"
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = http_client.get(url, headers=self.headers, params=params)
             response.raise_for_status()
             data = response.json()
-            result = data.get('response', [])
-            
-            # Armazenar no cache com TTL apropriado
-            ttl = self.cache_ttl.get(cache_type, 3600) if cache_type else 3600
-            cache.set(cache_key, result, ttl)
             logger.info(f"✅ Armazenado no cache por {ttl}s")
-            
-            return result
+            return data.get('response', [])
         except Exception as e:
             logger.error(f"Erro ao buscar {endpoint}: {str(e)}")
             return None
@@ -272,12 +276,33 @@ class APIFootballService:
                 'season': fixture['league']['season'],
                 'round': fixture['league']['round']
             },
-            'status': fixture['fixture']['status']['short']
+            'status': fixture['fixture']['status']['short'],
+            # A mesma resposta já traz eventos e estatísticas (jogos ao vivo/finalizados)
+            'events': fixture.get('events') or [],
+            'statistics': fixture.get('statistics') or []
         }
         
         logger.info(f"✅ Detalhes obtidos para fixture {fixture_id}")
         return details
     
+    def fetch_predictions(self, fixture_id):
+        """
+        Busca previsões e comparativo dos times para a partida
+        
+        Returns:
+            dict: Resposta de /predictions (teams, comparison, predictions) ou None
+        """
+        logger.info(f"🎲 Buscando previsões - Fixture: {fixture_id}")
+        
+        data = self._make_request('predictions', {'fixture': fixture_id}, cache_type='predictions')
+        
+        if not data:
+            logger.warning(f"⚠️ Previsões não encontradas para fixture {fixture_id}")
+            return None
+        
+        logger.info(f"✅ Previsões obtidas para fixture {fixture_id}")
+        return data[0]
+    
     def fetch_team_fixtures(self, team_id, league_id=None, season=None, last=10):
         """
         Busca últimas fixtures de um time
@@ -289,7 +314,7 @@ class APIFootballService:
             last: Número de fixtures (padrão: 10)
         
         Returns:
-            list: Lista de fixtures com placares e resultados
+            list: Lista de fixtures com placares e resultados (None se a busca falhar)
         """
         logger.info(f"📅 Buscando últimas {last} fixtures do time {team_id}")
         
@@ -306,49 +331,14 @@ class APIFootballService:
         
         data = self._make_request('fixtures', params, cache_type='fixtures')
         
+        if data is None:
+            logger.warning(f"⚠️ Falha ao buscar fixtures do team {team_id}")
+            return None
         if not data:
             logger.warning(f"⚠️ Nenhuma fixture encontrada para team {team_id}")
             return []
         
-        fixtures = []
-        for fixture in data:
-            fixture_info = {
-                'fixture_id': fixture['fixture']['id'],
-                'date': fixture['fixture']['date'],
-                'home_team_id': fixture['teams']['home']['id'],
-                'away_team_id': fixture['teams']['away']['id'],
-                'home_team': fixture['teams']['home']['name'],
-                'away_team': fixture['teams']['away']['name'],
-                'goals_home': fixture['goals']['home'],
-                'goals_away': fixture['goals']['away'],
-                'total_goals': fixture['goals']['home'] + fixture['goals']['away'],
-                'is_home': fixture['teams']['home']['id'] == team_id,
-                'result': None  # Será calculado abaixo
-            }
-            
-            # Determinar resultado (do ponto de vista do time)
-            if fixture_info['is_home']:
-                if fixture_info['goals_home'] > fixture_info['goals_away']:
-                    fixture_info['result'] = 'W'
-                elif fixture_info['goals_home'] < fixture_info['goals_away']:
-                    fixture_info['result'] = 'L'
-                else:
-                    fixture_info['result'] = 'D'
-            else:
-                if fixture_info['goals_away'] > fixture_info['goals_home']:
-                    fixture_info['result'] = 'W'
-                elif fixture_info['goals_away'] < fixture_info['goals_home']:
-                    fixture_info['result'] = 'L'
-                else:
-                    fixture_info['result'] = 'D'
-            
-            # BTTS (Ambos marcaram)
-            fixture_info['btts'] = fixture_info['goals_home'] > 0 and fixture_info['goals_away'] > 0
-            
-            # Over 2.5
-            fixture_info['over_25'] = fixture_info['total_goals'] > 2.5
-            
-            fixtures.append(fixture_info)
+        fixtures = [team_history.summarize_fixture(fixture, team_id) for fixture in data]
         
         logger.info(f"✅ {len(fixtures)} fixtures obtidas")
         return fixtures
@@ -0,0 +1,128 @@
+"""
+Análise em lote de partidas (cupom de uma rodada)
+As partidas vêm do snapshot de fixtures; os enriquecimentos rodam em paralelo e
+compartilham a camada cacheada (mesma tabela da liga, mesmos times, mesma
+listagem da Football-Data), e as análises são agrupadas em menos chamadas ao
+Gemini (AIAnalyzer.analyze_batch). Falhas são reportadas por partida. Cada
+análise entregue consome uma unidade da cota diária do usuário (quota).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from typing import Dict, List
+import logging
+import time
+
+from apps.matches.services import fixture_window
+from apps.users.services import quota
+from . import precomputed, quick_analysis
+from .ai_analyzer import get_analyzer
+from .match_enricher import MatchDataEnricher
+
+logger = logging.getLogger(__name__)
+
+
+def _prepare(fixture: Dict) -> Dict:
+    """Mapeamento de IDs + enriquecimento de uma partida (falha de enriquecimento não é fatal)"""
+    match_data = quick_analysis.match_data_from_fixture(fixture)
+    try:
+        return MatchDataEnricher().enrich(match_data)
+    except Exception as e:
+        logger.error(f"❌ Erro ao enriquecer {fixture['id']} no lote: {e}", exc_info=True)
+        return match_data
+
+
+def _error(fixture_id, result: Dict) -> Dict:
+    return {
+        'fixture_id': fixture_id,
+        'success': False,
+        'error': result.get('error'),
+        'details': result.get('details'),
+        'code': result.get('error_code'),
+    }
+
+
+LIMIT_REACHED = {
+    'error': 'Limite diário de análises atingido. Faça upgrade para Premium!',
+    'error_code': 'DAILY_LIMIT_REACHED',
+}
+
+
+def _charge(results: Dict, fixture_ids: List[int], user):
+    """Uma unidade da cota por análise entregue; sem cota, a partida vira erro"""
+    for fixture_id in fixture_ids:
+        if results[fixture_id]['success'] and not quota.consume(user):
+            results[fixture_id] = _error(fixture_id, LIMIT_REACHED)
+
+
+def analyze(fixture_ids: List[int], tier: str = None, user=None) -> Dict:
+    """
+    Analisa as partidas pedidas (ids da API-Football) no nível de modelo `tier`
+
+    Com `user`, só gera até o restante da cota do dia (as demais partidas voltam
+    com DAILY_LIMIT_REACHED) e cobra uma unidade por análise entregue.
+
+    Returns:
+        dict: {'results': [{'fixture_id', 'success', ...payload do quick_analyze
+               ou error/details/code}] na ordem pedida (sem repetidos),
+               'summary': {'requested', 'succeeded', 'failed', 'elapsed_ms'}}
+    """
+    started = time.monotonic()
+    fixture_ids = list(dict.fromkeys(fixture_ids))
+
+    snapshot = fixture_window.get_or_build_snapshot()
+    fixtures = {m['id']: m for m in snapshot['matches']} if snapshot else {}
+
+    results = {}
+    to_enrich = []
+    allowance = quota.remaining(user) if user is not None else len(fixture_ids)
+    for fixture_id in fixture_ids:
+        fixture = fixtures.get(fixture_id)
+        if fixture is None:
+            results[fixture_id] = _error(fixture_id, {
+                'error': 'Partida não encontrada na janela de jogos.',
+                'error_code': 'FIXTURE_NOT_FOUND',
+            })
+            continue
+        if allowance <= 0:
+            results[fixture_id] = _error(fixture_id, LIMIT_REACHED)
+            continue
+        entry = precomputed.get(fixture_id, fixture)
+        if entry:
+            result = {**entry['result'], 'cached': True, 'precomputed': True}
+            match_data = entry['match_data']
+            results[fixture_id] = {
+                'fixture_id': fixture_id,
+                'success': True,
+                **quick_analysis.build_payload(match_data, result, match_data.get('football_data_id')),
+            }
+            allowance -= 1
+            continue
+        to_enrich.append(fixture)
+        allowance -= 1
+
+    if to_enrich:
+        with ThreadPoolExecutor(max_workers=min(len(to_enrich), settings.BATCH_ANALYSIS_CONCURRENCY)) as executor:
+            enriched = list(executor.map(_prepare, to_enrich))
+
+        analyses = get_analyzer().analyze_batch(enriched, tier)
+        for fixture, match_data, result in zip(to_enrich, enriched, analyses):
+            if not result.get('success'):
+                results[fixture['id']] = _error(fixture['id'], result)
+                continue
+            payload = quick_analysis.build_payload(match_data, result, match_data.get('football_data_id'))
+            payload['metadata']['batched'] = result.get('batched', False)
+            results[fixture['id']] = {'fixture_id': fixture['id'], 'success': True, **payload}
+
+    if user is not None:
+        _charge(results, fixture_ids, user)
+
+    ordered = [results[fixture_id] for fixture_id in fixture_ids]
+    succeeded = sum(1 for item in ordered if item['success'])
+    summary = {
+        'requested': len(ordered),
+        'succeeded': succeeded,
+        'failed': len(ordered) - succeeded,
+        'elapsed_ms': round((time.monotonic() - started) * 1000),
+    }
+    logger.info(f"📦 Análise em lote: {summary}")
+    return {'results': ordered, 'summary': summary}
@@ -0,0 +1,143 @@
+"""
+Disjuntor (circuit breaker) das chamadas ao Gemini
+Cada geração registra sucesso ou falha em baldes de GEMINI_BREAKER_BUCKET_SECONDS
+no cache (vale para todos os processos). Com pelo menos GEMINI_BREAKER_MIN_CALLS
+chamadas na janela e taxa de falha >= GEMINI_BREAKER_FAILURE_RATE, o circuito
+abre: por GEMINI_BREAKER_OPEN_SECONDS as análises nem chamam o Gemini (o
+AIAnalyzer serve a estimativa estatística). Depois disso fica meio-aberto: uma
+única chamada de teste passa; sucesso fecha o circuito, falha o reabre
+"""
+from django.conf import settings
+from django.core.cache import cache
+from typing import Dict
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+OPEN_KEY = 'gemini_breaker:open_until'
+PROBE_KEY = 'gemini_breaker:probe'
+CALLS_KEY_PREFIX = 'gemini_breaker:calls:'
+FAILURES_KEY_PREFIX = 'gemini_breaker:failures:'
+
+
+def _buckets() -> list:
+    """Baldes da janela atual (o mais recente por último)"""
+    size = settings.GEMINI_BREAKER_BUCKET_SECONDS
+    current = int(time.time()) // size
+    count = max(1, settings.GEMINI_BREAKER_WINDOW_SECONDS // size)
+    return list(range(current - count + 1, current + 1))
+
+
+def _incr(key: str):
+    ttl = settings.GEMINI_BREAKER_WINDOW_SECONDS + settings.GEMINI_BREAKER_BUCKET_SECONDS
+    cache.add(key, 0, ttl)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, ttl)
+
+
+def _window() -> Dict:
+    buckets = _buckets()
+    keys = [CALLS_KEY_PREFIX + str(b) for b in buckets] + [FAILURES_KEY_PREFIX + str(b) for b in buckets]
+    values = cache.get_many(keys)
+    calls = sum(values.get(CALLS_KEY_PREFIX + str(b), 0) for b in buckets)
+    failures = sum(values.get(FAILURES_KEY_PREFIX + str(b), 0) for b in buckets)
+    return {'calls': calls, 'failures': failures}
+
+
+def _open(reason: str):
+    until = time.time() + settings.GEMINI_BREAKER_OPEN_SECONDS
+    # Sem expiração: só uma chamada de teste bem-sucedida fecha o circuito
+    cache.set(OPEN_KEY, until, None)
+    cache.delete(PROBE_KEY)
+    logger.warning(f"🔌 Circuito do Gemini ABERTO por {settings.GEMINI_BREAKER_OPEN_SECONDS}s ({reason})")
+
+
+def allow_request() -> bool:
+    """
+    Se esta análise pode chamar o Gemini
+
+    Fechado: sim. Aberto: não. Meio-aberto: só o primeiro chamador (chamada de
+    teste); os demais seguem no modo degradado até o resultado do teste.
+    """
+    open_until = cache.get(OPEN_KEY)
+    if open_until is None:
+        return True
+    if time.time() < open_until:
+        return False
+    acquired = cache.add(PROBE_KEY, True, settings.GEMINI_BREAKER_PROBE_TIMEOUT)
+    if acquired:
+        logger.info("🔌 Circuito do Gemini meio-aberto - chamada de teste")
+    return acquired
+
+
+def release_probe():
+    """
+    Libera a chamada de teste sem resultado (a análise veio do cache)
+
+    Com o circuito fechado não faz nada; meio-aberto, o próximo pedido testa.
+    """
+    if cache.get(OPEN_KEY) is not None:
+        cache.delete(PROBE_KEY)
+
+
+def record_success():
+    _incr(CALLS_KEY_PREFIX + str(_buckets()[-1]))
+    if cache.get(OPEN_KEY) is not None:
+        # Recomeça a janela: as falhas de antes da abertura não contam mais
+        buckets = _buckets()
+        cache.delete_many(
+            [OPEN_KEY, PROBE_KEY]
+            + [CALLS_KEY_PREFIX + str(b) for b in buckets]
+            + [FAILURES_KEY_PREFIX + str(b) for b in buckets]
+        )
+        logger.info("✅ Circuito do Gemini FECHADO - chamada de teste bem-sucedida")
+
+
+def record_failure():
+    bucket = str(_buckets()[-1])
+    _incr(CALLS_KEY_PREFIX + bucket)
+    _incr(FAILURES_KEY_PREFIX + bucket)
+    if cache.get(OPEN_KEY) is not None:
+        _open('chamada de teste falhou')
+        return
+    window = _window()
+    if window['calls'] < settings.GEMINI_BREAKER_MIN_CALLS:
+        return
+    rate = window['failures'] / window['calls']
+    if rate >= settings.GEMINI_BREAKER_FAILURE_RATE:
+        _open(f"{window['failures']}/{window['calls']} falhas em {settings.GEMINI_BREAKER_WINDOW_SECONDS}s")
+
+
+def record(result: Dict):
+    """Registra o resultado de uma geração (acertos de cache não contam)"""
+    if result.get('success'):
+        record_success()
+    else:
+        record_failure()
+
+
+def state() -> Dict:
+    """Estado do circuito e contadores da janela atual"""
+    open_until = cache.get(OPEN_KEY)
+    if open_until is None:
+        current = CLOSED
+    elif time.time() < open_until:
+        current = OPEN
+    else:
+        current = HALF_OPEN
+    window = _window()
+    return {
+        'state': current,
+        'open_until': open_until,
+        'window_seconds': settings.GEMINI_BREAKER_WINDOW_SECONDS,
+        'calls': window['calls'],
+        'failures': window['failures'],
+        'failure_rate': round(window['failures'] / window['calls'], 3) if window['calls'] else 0,
+    }
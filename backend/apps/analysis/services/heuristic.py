@@ -0,0 +1,151 @@
+"""
+Estimativa estatística da partida (modo degradado)
+Usada quando o Gemini está indisponível (circuito aberto ou falha da geração):
+probabilidades a partir das odds do mercado (sem a margem da casa), combinadas
+com um modelo simples de força dos times (forma recente, posição e saldo de
+gols na tabela, mando de campo). Devolve um resultado no formato do AIAnalyzer,
+com 'degraded' = True
+"""
+from typing import Dict, List, Optional
+import math
+
+# Vantagem do mandante na escala logística (~56% das vitórias decididas)
+HOME_ADVANTAGE = 0.25
+BASE_DRAW = 0.27
+# Peso das odds na combinação com o modelo de força (o mercado é o melhor sinal)
+ODDS_WEIGHT = 0.7
+# Gols esperados médios por jogo (mandante, visitante)
+BASE_XG = (1.45, 1.15)
+
+FORM_POINTS = {'W': 3, 'D': 1, 'L': 0}
+AVERAGE_PPG = 1.35
+
+PREDICTION_LABELS = {'home': 'vitória do mandante', 'draw': 'empate', 'away': 'vitória do visitante'}
+
+
+def _form_ppg(form: str) -> Optional[float]:
+    """Pontos por jogo nos últimos 5 resultados ('WDLWW', mais recente primeiro)"""
+    results = [FORM_POINTS[r] for r in (form or '').upper() if r in FORM_POINTS][:5]
+    return sum(results) / len(results) if results else None
+
+
+def _form(match_data: Dict, side: str) -> str:
+    table = (match_data.get('table_context') or {}).get(side) or {}
+    trends = (match_data.get('trends') or {}).get(side) or {}
+    return table.get('form') or trends.get('form') or ''
+
+
+def _market(match_data: Dict) -> Optional[tuple]:
+    """Probabilidades implícitas 1X2 das odds, normalizadas (remove a margem)"""
+    odds = match_data.get('odds') or {}
+    prices = [odds.get('home_win'), odds.get('draw'), odds.get('away_win')]
+    try:
+        prices = [float(p) for p in prices]
+    except (TypeError, ValueError):
+        return None
+    if any(p <= 1 for p in prices):
+        return None
+    implied = [1 / p for p in prices]
+    total = sum(implied)
+    return tuple(p / total for p in implied)
+
+
+def _strength(match_data: Dict, factors: List[str], home: str, away: str) -> float:
+    """Diferença de força mandante - visitante (0 = equilíbrio)"""
+    diff = 0.0
+    home_form, away_form = _form(match_data, 'home'), _form(match_data, 'away')
+    home_ppg, away_ppg = _form_ppg(home_form), _form_ppg(away_form)
+    if home_ppg is not None or away_ppg is not None:
+        home_ppg = AVERAGE_PPG if home_ppg is None else home_ppg
+        away_ppg = AVERAGE_PPG if away_ppg is None else away_ppg
+        diff += 0.35 * (home_ppg - away_ppg)
+        factors.append(f"Forma recente: {home} {home_form or 'N/A'} x {away} {away_form or 'N/A'}")
+
+    table = match_data.get('table_context') or {}
+    home_table, away_table = table.get('home') or {}, table.get('away') or {}
+    if home_table.get('position') and away_table.get('position'):
+        diff += 0.03 * (away_table['position'] - home_table['position'])
+        diff += 0.01 * ((home_table.get('goal_difference') or 0) - (away_table.get('goal_difference') or 0))
+        factors.append(
+            f"Tabela: {home} {home_table['position']}º ({home_table.get('points')} pts) x "
+            f"{away} {away_table['position']}º ({away_table.get('points')} pts)"
+        )
+    return max(-2.0, min(2.0, diff))
+
+
+def _xg(match_data: Dict, diff: float) -> tuple:
+    """Gols esperados: médias da temporada (ataque x defesa adversária) ou base ajustada pela força"""
+    home_stats, away_stats = match_data.get('home_stats') or {}, match_data.get('away_stats') or {}
+
+    def average(*values):
+        values = [float(v) for v in values if v not in (None, '')]
+        return sum(values) / len(values) if values else None
+
+    home_xg = average(home_stats.get('goals_per_game_avg'), away_stats.get('goals_conceded_avg'))
+    away_xg = average(away_stats.get('goals_per_game_avg'), home_stats.get('goals_conceded_avg'))
+    home_xg = home_xg if home_xg is not None else BASE_XG[0] + 0.4 * diff
+    away_xg = away_xg if away_xg is not None else BASE_XG[1] - 0.4 * diff
+    return round(max(0.3, home_xg), 2), round(max(0.3, away_xg), 2)
+
+
+def estimate(match_data: Dict) -> Dict:
+    """
+    Análise degradada da partida a partir dos dados enriquecidos disponíveis
+
+    Returns:
+        dict: Resultado no formato de AIAnalyzer.analyze_match (success, analysis,
+              confidence, structured), com 'degraded' = True e 'model' = None
+    """
+    home = match_data.get('home_team', {}).get('name') or 'Mandante'
+    away = match_data.get('away_team', {}).get('name') or 'Visitante'
+    factors = []
+
+    diff = _strength(match_data, factors, home, away)
+    share = 1 / (1 + math.exp(-(diff + HOME_ADVANTAGE)))
+    # Confrontos desequilibrados terminam menos empatados
+    draw = max(0.18, min(0.30, BASE_DRAW - 0.1 * min(abs(diff), 1.0)))
+    probabilities = ((1 - draw) * share, draw, (1 - draw) * (1 - share))
+
+    market = _market(match_data)
+    if market:
+        probabilities = tuple(ODDS_WEIGHT * m + (1 - ODDS_WEIGHT) * p for m, p in zip(market, probabilities))
+        odds = match_data['odds']
+        factors.insert(0, f"Odds do mercado (1 | X | 2): {odds['home_win']} | {odds['draw']} | {odds['away_win']}")
+    factors.append('Mando de campo')
+
+    home_p, draw_p, away_p = (round(p * 100, 1) for p in probabilities)
+    prediction = max(zip((home_p, draw_p, away_p), ('home', 'draw', 'away')))[1]
+    top = max(home_p, draw_p, away_p)
+    # Sem odds nem tabela a estimativa é quase a média da liga: confiança baixa
+    if not market and len(factors) == 1:
+        confidence = 2
+    else:
+        confidence = 4 if top >= 60 else 3 if top >= 45 else 2
+    home_xg, away_xg = _xg(match_data, diff)
+
+    analysis = (
+        "⚠️ Análise estatística simplificada: o serviço de IA está temporariamente indisponível.\n\n"
+        f"{home} x {away}\n"
+        f"Probabilidades: {home} {home_p:.0f}% | empate {draw_p:.0f}% | {away} {away_p:.0f}%\n"
+        f"Gols esperados: {home_xg} x {away_xg}\n"
+        f"Palpite: {PREDICTION_LABELS[prediction]} (confiança {confidence}/5)\n\n"
+        "Base: " + '; '.join(factors) + '.'
+    )
+    return {
+        'success': True,
+        'analysis': analysis,
+        'confidence': confidence,
+        'structured': {
+            'prediction': prediction,
+            'home_probability': home_p,
+            'draw_probability': draw_p,
+            'away_probability': away_p,
+            'home_xg': home_xg,
+            'away_xg': away_xg,
+            'confidence': confidence,
+            'key_factors': factors[:5],
+        },
+        'model': None,
+        'degraded': True,
+        'cached': False,
+    }
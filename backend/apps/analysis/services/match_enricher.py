@@ -4,27 +4,46 @@ Adiciona contexto completo para análises mais precisas
 """
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from django.conf import settings
+from apps.matches.services import team_history
+from apps.matches.services.football_api import FootballDataService
 from .api_football_service import APIFootballService
 
 logger = logging.getLogger(__name__)
 
+# Produtos de dados que o enriquecimento sabe obter. Cada um é buscado uma
+# única vez, sempre pela camada cacheada (APIFootballService/FootballDataService)
+PRODUCTS = frozenset({
+    'fixture',  # Detalhes da partida (sempre buscado: fornece os IDs)
+    'context',  # Tabela, lesões, odds, estatísticas da temporada, descanso, tendências
+    'statistics',  # Estatísticas da partida (vêm na mesma resposta do fixture)
+    'predictions',  # Previsões e comparativo da API-Football
+    'h2h',  # Histórico direto (Football-Data.org, requer football_data_id)
+    'football_data_match',  # Detalhes da partida na Football-Data.org
+})
+
 class MatchDataEnricher:
     """Enriquece dados básicos da partida com contexto adicional"""
     
     def __init__(self):
         self.api_service = APIFootballService()
+        self.football_data_service = FootballDataService()
     
-    def enrich(self, match_data):
+    def enrich(self, match_data, products=PRODUCTS):
         """
         Enriquece dados da partida com contexto completo
         
         Args:
-            match_data (dict): Dados básicos da partida
+            match_data (dict): Dados básicos da partida (api_id e, opcionalmente,
+                football_data_id)
+            products (iterable): Produtos de dados desejados (ver PRODUCTS)
         
         Returns:
             dict: Dados enriquecidos com contexto adicional
         """
+        products = set(products) & PRODUCTS
         logger.info("\n" + "="*80)
         logger.info("🔄 INICIANDO ENRIQUECIMENTO DE DADOS")
         logger.info("="*80)
@@ -35,8 +54,12 @@ class MatchDataEnricher:
             logger.warning("⚠️ api_id não fornecido - enriquecimento limitado")
             return match_data
         
-        # Buscar detalhes da partida primeiro
+        started = time.monotonic()
+        timings = {}
+        
+        # Etapa 1: detalhes da partida (pré-requisito de todas as outras buscas)
         fixture_details = self.api_service.fetch_fixture_details(api_id)
+        timings['fixture_details'] = int((time.monotonic() - started) * 1000)
         
         if not fixture_details:
             logger.warning("⚠️ Detalhes da partida não encontrados")
@@ -49,33 +72,98 @@ class MatchDataEnricher:
         season = fixture_details['league']['season']
         match_date = fixture_details.get('date', '')
         
-        # Buscar contexto da tabela primeiro (usado por motivação)
-        table_context = self._get_table_context(league_id, season, home_team_id, away_team_id)
-        
+        # Etapa 2: buscas independentes entre si (dependem só da partida) em paralelo
+        # nome: (função, argumentos, valor padrão em caso de erro)
+        tasks = {}
+        if 'context' in products:
+            tasks.update({
+                'table_context': (self._get_table_context, (league_id, season, home_team_id, away_team_id), None),
+                'injuries': (self._get_injuries, (api_id, home_team_id, away_team_id), {'home': [], 'away': []}),
+                'odds': (self._get_odds, (api_id,), None),
+                'home_stats': (self._get_team_statistics, (home_team_id, league_id, season), None),
+                'away_stats': (self._get_team_statistics, (away_team_id, league_id, season), None),
+                'home_history': (self._get_team_history, (home_team_id, league_id, season, match_date), []),
+                'away_history': (self._get_team_history, (away_team_id, league_id, season, match_date), []),
+            })
+        if 'predictions' in products:
+            tasks['predictions'] = (self.api_service.fetch_predictions, (api_id,), None)
+        
+        football_data_id = match_data.get('football_data_id')
+        if football_data_id and 'h2h' in products:
+            tasks['h2h'] = (self._get_h2h, (football_data_id,), None)
+        if football_data_id and 'football_data_match' in products:
+            tasks['football_data_match'] = (
+                self.football_data_service.get_match_details_cached, (football_data_id,), None
+            )
+        results = self._run_parallel(tasks, timings) if tasks else {}
+        
+        # Etapa 3: cálculos locais sobre os resultados (sem chamadas à API)
         enriched = {
             **match_data,
             'fixture_details': fixture_details,
-            'table_context': table_context,
-            'injuries': self._get_injuries(api_id, home_team_id, away_team_id),
-            'odds': self._get_odds(api_id),
-            'home_stats': self._get_team_statistics(home_team_id, league_id, season),
-            'away_stats': self._get_team_statistics(away_team_id, league_id, season),
-            'rest_context': self._calculate_rest_context(home_team_id, away_team_id, league_id, season, match_date),
-            'motivation': self._assess_motivation(table_context),
-            'trends': self._calculate_trends(home_team_id, away_team_id, league_id, season),
-            'season_context': self._get_season_context(fixture_details)
         }
+        if 'context' in products:
+            table_context = results['table_context']
+            enriched.update({
+                'table_context': table_context,
+                'injuries': results['injuries'],
+                'odds': results['odds'],
+                'home_stats': results['home_stats'],
+                'away_stats': results['away_stats'],
+                'rest_context': self._calculate_rest_context(results['home_history'][:1], results['away_history'][:1], match_date),
+                'motivation': self._assess_motivation(table_context),
+                'trends': self._calculate_trends(results['home_history'], results['away_history']),
+                'season_context': self._get_season_context(fixture_details)
+            })
+        if 'statistics' in products and fixture_details.get('statistics'):
+            enriched['statistics'] = fixture_details['statistics']
+        for product in ('predictions', 'h2h', 'football_data_match'):
+            if results.get(product):
+                enriched[product] = results[product]
+        
+        timings['total'] = int((time.monotonic() - started) * 1000)
+        enriched['enrichment_timings'] = timings
         
         logger.info("\n" + "="*80)
-        logger.info("✅ ENRIQUECIMENTO CONCLUÍDO")
+        logger.info(f"✅ ENRIQUECIMENTO CONCLUÍDO em {timings['total']}ms "
+                    f"(etapa paralela: {timings.get('parallel', 0)}ms)")
         logger.info("="*80 + "\n")
         
         return enriched
     
+    def _run_parallel(self, tasks, timings):
+        """
+        Executa as buscas independentes em um pool de threads limitado
+        
+        O tempo da etapa fica limitado pela busca mais lenta, não pela soma.
+        Uma busca que falhar recebe seu valor padrão sem afetar as demais.
+        
+        Returns:
+            dict: nome da busca -> resultado
+        """
+        max_workers = max(1, min(getattr(settings, 'ENRICHMENT_CONCURRENCY', 10), len(tasks)))
+        
+        def run(name):
+            func, args, default = tasks[name]
+            task_started = time.monotonic()
+            try:
+                return name, func(*args)
+            except Exception as e:
+                logger.error(f"   ❌ Erro na busca '{name}': {e}", exc_info=True)
+                return name, default
+            finally:
+                timings[name] = int((time.monotonic() - task_started) * 1000)
+        
+        stage_started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='enrich') as executor:
+            results = dict(executor.map(run, tasks))
+        timings['parallel'] = int((time.monotonic() - stage_started) * 1000)
+        
+        return results
+    
     def _get_table_context(self, league_id, season, home_team_id, away_team_id):
         """Busca posição na tabela e pontos dos times"""
         logger.info("\n📊 Buscando contexto da tabela...")
-        time.sleep(0.5)  # Delay para respeitar rate limit
         
         standings = self.api_service.fetch_standings(league_id, season)
         
@@ -112,7 +200,6 @@ class MatchDataEnricher:
     def _get_injuries(self, fixture_id, home_team_id, away_team_id):
         """Busca lesões e suspensões"""
         logger.info("\n🚑 Buscando lesões e suspensões...")
-        time.sleep(0.5)  # Delay para respeitar rate limit
         
         injuries_data = self.api_service.fetch_injuries(fixture_id)
         
@@ -129,7 +216,6 @@ class MatchDataEnricher:
     def _get_odds(self, fixture_id):
         """Busca odds das casas de apostas"""
         logger.info("\n💰 Buscando odds...")
-        time.sleep(0.5)  # Delay para respeitar rate limit
         
         odds = self.api_service.fetch_odds(fixture_id)
         
@@ -142,32 +228,57 @@ class MatchDataEnricher:
         
         return odds
     
+    def _get_h2h(self, football_data_id):
+        """Busca histórico direto (Football-Data.org)"""
+        logger.info(f"\n📜 Buscando H2H (Football-Data {football_data_id})...")
+        
+        h2h_data = self.football_data_service.get_h2h_cached(football_data_id)
+        
+        if not h2h_data or not h2h_data.get('matches'):
+            logger.info("   ⚠️ H2H não disponível")
+            return None
+        
+        logger.info(f"   ✅ {len(h2h_data['matches'])} confrontos anteriores")
+        return h2h_data['matches']
+    
+    def _get_team_history(self, team_id, league_id, season, match_date):
+        """
+        Últimas partidas do time antes desta, do histórico no cache
+        
+        Uma única busca (last=TEAM_HISTORY_SIZE) na primeira vez; depois o
+        histórico é estendido pelo refresh_fixtures. Serve descanso e tendências.
+        """
+        logger.info(f"\n📅 Histórico recente (Team {team_id})...")
+        
+        history = team_history.get_or_load(
+            team_id, league_id, season,
+            lambda size: self.api_service.fetch_team_fixtures(team_id, league_id, season, last=size)
+        )
+        
+        # Em análises de partidas já jogadas, ignorar a própria partida e as seguintes
+        if match_date:
+            history = [f for f in history if f['date'] < match_date]
+        
+        logger.info(f"   ✅ {len(history)} partidas no histórico")
+        return history
+    
     def _get_team_statistics(self, team_id, league_id, season):
         """Busca estatísticas detalhadas do time"""
         logger.info(f"\n📈 Buscando estatísticas (Team {team_id})...")
-        time.sleep(0.5)  # Delay para respeitar rate limit
         
         stats = self.api_service.fetch_team_statistics(team_id, league_id, season)
         
         if stats:
             logger.info(f"   ✅ {stats.get('games_played', 0)} jogos, "
-                       f"média {stats.get('goals_per_game_avg', 0):.2f} gols/jogo")
+                       f"média {float(stats.get('goals_per_game_avg') or 0):.2f} gols/jogo")
         else:
             logger.info("   ⚠️ Estatísticas não disponíveis")
         
         return stats
     
-    def _calculate_rest_context(self, home_team_id, away_team_id, league_id, season, match_date):
-        """Calcula dias de descanso real"""
+    def _calculate_rest_context(self, home_fixtures, away_fixtures, match_date):
+        """Calcula dias de descanso real a partir da última partida de cada time"""
         logger.info("\n⏱️ Calculando contexto de descanso...")
-        time.sleep(0.5)  # Delay para respeitar rate limit
-        
-        from datetime import datetime
-        
-        # Buscar última fixture de cada time
-        home_fixtures = self.api_service.fetch_team_fixtures(home_team_id, league_id, season, last=1)
-        time.sleep(0.5)
-        away_fixtures = self.api_service.fetch_team_fixtures(away_team_id, league_id, season, last=1)
         
         home_days = None
         away_days = None
@@ -269,19 +380,13 @@ class MatchDataEnricher:
         
         return motivation
     
-    def _calculate_trends(self, home_team_id, away_team_id, league_id, season):
-        """Calcula tendências Over/Under e BTTS"""
+    def _calculate_trends(self, home_fixtures, away_fixtures):
+        """Calcula forma, tendências Over/Under e BTTS a partir dos últimos jogos"""
         logger.info("\n📈 Calculando tendências...")
-        time.sleep(0.5)  # Delay para respeitar rate limit
-        
-        # Buscar últimos 10 jogos de cada time
-        home_fixtures = self.api_service.fetch_team_fixtures(home_team_id, league_id, season, last=10)
-        time.sleep(0.5)
-        away_fixtures = self.api_service.fetch_team_fixtures(away_team_id, league_id, season, last=10)
         
         trends = {
-            'home': {'over_25_pct': 0, 'btts_pct': 0, 'games_analyzed': 0},
-            'away': {'over_25_pct': 0, 'btts_pct': 0, 'games_analyzed': 0}
+            'home': {'over_25_pct': 0, 'btts_pct': 0, 'games_analyzed': 0, 'form': ''},
+            'away': {'over_25_pct': 0, 'btts_pct': 0, 'games_analyzed': 0, 'form': ''}
         }
         
         # Calcular para time da casa
@@ -293,7 +398,8 @@ class MatchDataEnricher:
             trends['home'] = {
                 'over_25_pct': (home_over / total_home * 100) if total_home > 0 else 0,
                 'btts_pct': (home_btts / total_home * 100) if total_home > 0 else 0,
-                'games_analyzed': total_home
+                'games_analyzed': total_home,
+                'form': ''.join(f['result'] for f in home_fixtures[:5])  # Mais recente primeiro
             }
         
         # Calcular para time visitante
@@ -305,7 +411,8 @@ class MatchDataEnricher:
             trends['away'] = {
                 'over_25_pct': (away_over / total_away * 100) if total_away > 0 else 0,
                 'btts_pct': (away_btts / total_away * 100) if total_away > 0 else 0,
-                'games_analyzed': total_away
+                'games_analyzed': total_away,
+                'form': ''.join(f['result'] for f in away_fixtures[:5])  # Mais recente primeiro
             }
         
         # Calcular probabilidade combinada
@@ -0,0 +1,126 @@
+"""
+Registro de modelos do Gemini (um por processo)
+A descoberta via list_models() acontece uma vez e é renovada em segundo plano
+após GEMINI_MODEL_REFRESH_SECONDS; os handles GenerativeModel são reaproveitados
+entre requisições
+"""
+import google.generativeai as genai
+from django.conf import settings
+from typing import List, Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_guard = threading.Lock()
+_initial_guard = threading.Lock()
+_configured_key = None
+_names = []  # Modelos com generateContent, em ordem de preferência
+_expires_at = 0.0
+_refreshing = False
+_models = {}  # nome -> GenerativeModel
+
+
+def _score(name: str) -> int:
+    """Ordem de preferência: gemini-2.5 > gemini-1.5 > gemini-1.0 > gemini-pro"""
+    name = name.lower()
+    if 'gemini-2.5' in name:
+        return 0
+    if 'gemini-1.5' in name:
+        return 1
+    if 'gemini-1.0' in name:
+        return 2
+    if 'gemini-pro' in name:
+        return 3
+    return 4
+
+
+def _configure() -> bool:
+    """genai.configure uma vez por processo (de novo só se a chave mudar)"""
+    global _configured_key
+    api_key = settings.GOOGLE_GEMINI_API_KEY
+    if not api_key:
+        return False
+    if _configured_key != api_key:
+        genai.configure(api_key=api_key)
+        _configured_key = api_key
+    return True
+
+
+def _discover() -> Optional[List[str]]:
+    """Lista os modelos com generateContent (uma chamada à API); None em caso de erro"""
+    try:
+        available = list(genai.list_models())
+    except Exception as e:
+        logger.error(f"Falha ao listar modelos do Gemini: {e}")
+        return None
+
+    names = []
+    for m in available:
+        if 'generateContent' not in (getattr(m, 'supported_generation_methods', None) or []):
+            continue
+        name = getattr(m, 'name', getattr(m, 'model', None)) or 'gemini-pro'
+        # Aceitar tanto 'models/...' quanto nome simples
+        names.append(name.replace('models/', '', 1) if name.startswith('models/') else name)
+    names.sort(key=_score)
+    return names
+
+
+def _refresh():
+    global _names, _expires_at, _refreshing
+    names = _discover()
+    with _guard:
+        if names is not None:
+            if names != _names:
+                logger.info(f"Modelos do Gemini disponíveis: {names[:5]}")
+            _names = names
+            _expires_at = time.monotonic() + settings.GEMINI_MODEL_REFRESH_SECONDS
+        else:
+            # Manter a lista anterior e tentar de novo em breve
+            _expires_at = time.monotonic() + settings.GEMINI_MODEL_RETRY_SECONDS
+        _refreshing = False
+
+
+def available_models() -> List[str]:
+    """
+    Modelos disponíveis em ordem de preferência
+
+    A primeira chamada do processo busca a lista de forma síncrona; depois de
+    vencida, a lista atual continua sendo servida enquanto uma thread a renova.
+    """
+    global _refreshing
+    if not _configure():
+        return []
+
+    # Primeira descoberta do processo: chamadores simultâneos aguardam a mesma
+    if not _expires_at:
+        with _initial_guard:
+            if not _expires_at:
+                _refresh()
+
+    with _guard:
+        start_background = time.monotonic() >= _expires_at and not _refreshing
+        if start_background:
+            _refreshing = True
+    if start_background:
+        threading.Thread(target=_refresh, name='gemini-models', daemon=True).start()
+
+    return list(_names)
+
+
+def default_model_name() -> Optional[str]:
+    """Modelo preferido para as análises (None se nenhum disponível)"""
+    names = available_models()
+    return names[0] if names else None
+
+
+def get_model(name: str):
+    """Handle GenerativeModel compartilhado para `name`"""
+    model = _models.get(name)
+    if model is None:
+        with _guard:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = genai.GenerativeModel(name)
+    return model
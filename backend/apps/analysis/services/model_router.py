@@ -0,0 +1,69 @@
+"""
+Roteamento das análises entre níveis de modelo do Gemini
+O plano do usuário (plan_config.PLANS[...]['ai_tier']) escolhe o nível: 'fast'
+(modelos flash/lite, rápidos e baratos) para freemium e prévias, 'deep' (modelos
+maiores) para Pro/VIP. A rota começa pelo melhor modelo do nível e segue para o
+outro nível; um modelo que devolve ResourceExhausted sai da rota por
+GEMINI_QUOTA_COOLDOWN_SECONDS (marca no cache, vale para todos os processos)
+"""
+from django.conf import settings
+from django.core.cache import cache
+from typing import List
+import logging
+
+from apps.subscriptions import entitlements
+from . import model_registry
+
+logger = logging.getLogger(__name__)
+
+FAST = 'fast'
+DEEP = 'deep'
+
+EXHAUSTED_KEY_PREFIX = 'gemini_exhausted:'
+
+
+def tier_of(name: str) -> str:
+    """Nível de um modelo pelo nome (flash/lite = rápido)"""
+    name = name.lower()
+    return FAST if ('flash' in name or 'lite' in name) else DEEP
+
+
+def tier_for_user(user) -> str:
+    """Nível do plano efetivo do usuário; anônimos (prévias) usam o rápido"""
+    if user is None or not user.is_authenticated:
+        return FAST
+    return entitlements.resolve(user)['ai_tier']
+
+
+def route(tier: str = None) -> List[str]:
+    """
+    Modelos a tentar para o nível, em ordem (no máximo 1 + GEMINI_MAX_FALLBACKS)
+
+    Melhor modelo do nível (ou o fixado em GEMINI_TIER_MODELS), depois o melhor
+    do outro nível (quota separada), depois os demais por preferência.
+    """
+    tier = tier or settings.GEMINI_DEFAULT_TIER
+    names = model_registry.available_models()
+    own = [n for n in names if tier_of(n) == tier]
+    other = [n for n in names if tier_of(n) != tier]
+
+    pinned = settings.GEMINI_TIER_MODELS.get(tier)
+    if pinned:
+        own = [pinned] + [n for n in own if n != pinned]
+
+    ordered = own[:1] + other[:1] + own[1:] + other[1:]
+    return ordered[:1 + settings.GEMINI_MAX_FALLBACKS]
+
+
+def mark_exhausted(name: str):
+    logger.warning(f"⚠️ Quota do modelo {name} esgotada - fora da rota por {settings.GEMINI_QUOTA_COOLDOWN_SECONDS}s")
+    cache.set(EXHAUSTED_KEY_PREFIX + name, True, settings.GEMINI_QUOTA_COOLDOWN_SECONDS)
+
+
+def usable(models: List[str]) -> List[str]:
+    """Modelos da rota fora do período de espera (todos esgotados: tenta o primeiro)"""
+    if not models:
+        return []
+    exhausted = cache.get_many([EXHAUSTED_KEY_PREFIX + name for name in models])
+    available = [name for name in models if EXHAUSTED_KEY_PREFIX + name not in exhausted]
+    return available or models[:1]
@@ -0,0 +1,106 @@
+"""
+Análises pré-geradas por partida (api_football_id)
+O comando pregenerate_analyses enriquece e analisa as próximas partidas das
+ligas prioritárias fora do horário de pico; quick_analyze e request_analysis
+usam o resultado guardado aqui em vez de esperar enriquecimento + geração
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from typing import Dict, Optional
+import logging
+
+from . import analysis_cache
+from .ai_analyzer import get_analyzer
+from .match_enricher import MatchDataEnricher
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'precomputed_analysis:'
+BUDGET_KEY_PREFIX = 'precomputed_analysis_budget:'
+# Status de partida ainda não iniciada (API-Football e Match.status)
+UPCOMING_STATUSES = ('NS', 'TBD', 'scheduled')
+
+
+def _key(api_id) -> str:
+    return f'{KEY_PREFIX}{api_id}'
+
+
+def get(api_id, current: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Análise pré-gerada da partida, se ainda válida
+
+    Só vale antes do início: é descartada (e apagada) quando o horário guardado
+    já passou ou quando `current` (status e date atuais da partida) indica que
+    ela começou, foi adiada ou mudou de horário.
+
+    Returns:
+        dict: {'match_data': dict enriquecido, 'result': resultado do analisador,
+               'generated_at': str} ou None
+    """
+    if not api_id:
+        return None
+    entry = cache.get(_key(api_id))
+    if entry is None:
+        return None
+    reason = _stale_reason(entry, current)
+    if reason:
+        logger.info(f"🗑️ Análise pré-gerada de api_id={api_id} descartada ({reason})")
+        cache.delete(_key(api_id))
+        return None
+    return entry
+
+
+def _stale_reason(entry: Dict, current: Optional[Dict]) -> Optional[str]:
+    stored_kickoff = analysis_cache.kickoff(entry['match_data'])
+    if stored_kickoff is not None and stored_kickoff <= timezone.now():
+        return 'partida já começou'
+    if not current:
+        return None
+    status = current.get('status')
+    if status and status not in UPCOMING_STATUSES:
+        return f'status {status}'
+    current_kickoff = analysis_cache.kickoff(current)
+    if current_kickoff is not None and stored_kickoff is not None and current_kickoff != stored_kickoff:
+        return 'horário alterado'
+    return None
+
+
+def generate(match_data: Dict) -> Dict:
+    """
+    Enriquece e analisa a partida, guardando o resultado se a geração der certo
+    (estimativas do modo degradado não são guardadas)
+
+    Returns:
+        dict: Resultado de AIAnalyzer.analyze_match
+    """
+    enriched = MatchDataEnricher().enrich(match_data)
+    result = get_analyzer().analyze_match(enriched)
+    if result.get('success') and not result.get('degraded'):
+        entry = {
+            'match_data': enriched,
+            'result': {k: v for k, v in result.items() if k != 'cached'},
+            'generated_at': timezone.now().isoformat(),
+        }
+        cache.set(_key(match_data['api_id']), entry, analysis_cache.ttl_for(enriched))
+    return result
+
+
+def budget_used_today() -> int:
+    """Gerações do Gemini já gastas hoje pela pré-geração"""
+    return cache.get(BUDGET_KEY_PREFIX + timezone.localdate().isoformat(), 0)
+
+
+def spend_budget() -> int:
+    """Registra uma geração no orçamento do dia; retorna o total usado"""
+    key = BUDGET_KEY_PREFIX + timezone.localdate().isoformat()
+    cache.add(key, 0, 2 * 24 * 3600)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, 2 * 24 * 3600)
+        return 1
+
+
+def remaining_budget() -> int:
+    return max(0, settings.PREGENERATE_DAILY_BUDGET - budget_used_today())
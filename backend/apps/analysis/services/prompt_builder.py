@@ -0,0 +1,409 @@
+"""
+Montagem dos prompts de análise com orçamento de tokens
+Todo prompt começa pelo mesmo PREAMBLE estático (papel do analista + formato de
+resposta + bloco JSON), seguido da tarefa e dos dados da partida em seções
+compactas (linhas tabulares com '|'). As seções estão em ordem de prioridade:
+se o prompt estimado passar de AI_PROMPT_TOKEN_BUDGET, as menos prioritárias
+são descartadas. Tokens por prompt e seções descartadas ficam em prompt_stats()
+"""
+from collections import Counter
+from django.conf import settings
+from typing import Dict, List, Optional
+import logging
+import math
+import re
+import threading
+
+from . import structured_output
+
+logger = logging.getLogger(__name__)
+
+# Estimativa local (o SDK instalado não expõe o tokenizer sem uma chamada à API);
+# texto em português com números rende ~3.5 caracteres por token
+CHARS_PER_TOKEN = 3.5
+
+PREAMBLE = """Você é um especialista em análise de apostas de futebol com 20 anos de experiência, atuando como motor de decisão profissional (não um chatbot): o usuário deve decidir em até 3 segundos. Linguagem profissional e objetiva, baseada nos dados fornecidos, sem exageros ou promessas.
+
+## FORMATO DE RESPOSTA (para cada partida, nesta ordem)
+
+BLOCO 1 — DECISÃO IMEDIATA (sem introdução; legível em 5 segundos):
+🎯 PREVISÃO DA IA
+**[RESULTADO MAIS PROVÁVEL]**
+📊 Probabilidade: [XX]%
+⚽ Placar esperado: [X:X]
+⭐ Confiança: [X] estrelas ([Alta | Média | Baixa])
+⚠️ Risco: [Baixo | Médio | Alto]
+
+BLOCO 2 — FATORES-CHAVE (3-4 bullets de 1 linha, **Fator:** explicação com dado concreto):
+⚡ POR QUE ESSA PREVISÃO?
+✓ **Forma recente:** [...]
+✓ **Confronto direto:** [...]
+✓ **Análise tática:** [...]
+✓ **Modelo estatístico:** [Poisson/xG, se houver dados]
+
+BLOCO 3 — PROBABILIDADES (soma = 100%):
+📊 PROBABILIDADES
+🏠 **[TIME_CASA]:** [XX]%
+🤝 **Empate:** [XX]%
+✈️ **[TIME_FORA]:** [XX]%
+💡 **Interpretação rápida:** [uma frase]
+
+BLOCO 4 — ANÁLISE DETALHADA:
+**📋 RESUMO EXECUTIVO** [2-3 frases]
+**1️⃣ ANÁLISE DE FORMA** — 🏠 casa e ✈️ fora: últimos 5 jogos (V-E-D), desempenho no mando, momento
+**2️⃣ CONFRONTOS DIRETOS (H2H)** — histórico, padrão, contexto
+**3️⃣ ANÁLISE TÁTICA E ESTATÍSTICA** — **Ataque vs Defesa:**, **Estilo de jogo:**, **Fator decisivo:**, **xG e Poisson:**
+
+BLOCO 5 — RECOMENDAÇÃO FINAL (orientadora, não impositiva):
+💰 RECOMENDAÇÃO
+**Aposta sugerida:** [mercado + seleção]
+**Tipo:** [Conservadora | Equilibrada | Agressiva]
+✅ **Justificativa:** [...]
+⚠️ **Gestão de risco:** [...]
+💡 **Alternativa:** [opcional]
+
+## REGRAS
+- **Negrito** em nomes dos times, fatores-chave, resultados e subtítulos (nunca "*" sozinho)
+- Números explícitos (65%, 2.4 gols, 3:1); bullets (•) em vez de parágrafos, no máximo 4-5 por seção
+- Emojis só estruturais (🎯 📊 ⚡ 💰 ⚠️ 🏠 ✈️)
+- Não invente dados, não pule nem reordene blocos, não comece com saudações
+- Confiança: 5 estrelas = 70%+ (favorito claro, dados completos); 4 = 60-69%; 3 = 50-59% (equilibrado); 2 = 40-49% (muita incerteza); 1 = <40% (evitar aposta)
+- Risco: Baixo = favorito óbvio; Médio = jogo competitivo; Alto = imprevisível
+""" + structured_output.SCHEMA_INSTRUCTIONS
+
+SINGLE_TASK = "\n## TAREFA\nAnalise em detalhes a partida abaixo.\n"
+
+# Cada análise da resposta de um lote começa com o marcador de BATCH_MARKER_RE
+BATCH_TASK = """
+## TAREFA
+Analise em detalhes cada uma das {count} partidas abaixo, de forma independente (não misture dados de partidas diferentes). Responda com uma análise completa por partida, na ordem em que aparecem, começando cada uma com uma linha contendo apenas o marcador
+=== PARTIDA <número> ===
+"""
+BATCH_MARKER_RE = re.compile(r'^[\s*#]*=+\s*PARTIDA\s+(\d+)\s*=+[\s*]*$', re.MULTILINE | re.IGNORECASE)
+
+_stats = {'prompts': 0, 'tokens': 0, 'max_tokens': 0, 'over_budget': 0, 'dropped': Counter()}
+_stats_guard = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _num(value, digits=2) -> str:
+    try:
+        return f"{float(value):.{digits}f}"
+    except (TypeError, ValueError):
+        return 'N/A'
+
+
+# ---------------------------------------------------------------------------
+# Seções (None quando não há dados); home/away são os nomes dos times
+# ---------------------------------------------------------------------------
+
+def _match_info(data, home, away):
+    lines = [
+        f"{home} x {away} | {data.get('league', 'Liga')} | {data.get('date', 'Data não disponível')} | "
+        f"{data.get('venue') or 'Estádio não informado'} | status: {data.get('status', 'scheduled')}"
+    ]
+    home_score, away_score = data.get('home_score'), data.get('away_score')
+    if home_score is not None and away_score is not None:
+        lines.append(f"Placar: {home} {home_score} x {away_score} {away}")
+    return '\n'.join(lines)
+
+
+def _live_statistics(data, home, away):
+    statistics = data.get('statistics')
+    if not statistics or len(statistics) < 2:
+        return None
+    home_stats = statistics[0].get('statistics', [])
+    away_stats = statistics[1].get('statistics', [])
+    lines = [f"## Estatísticas da partida ({home} | {away})"]
+    for idx, stat in enumerate(home_stats):
+        away_val = away_stats[idx].get('value') if idx < len(away_stats) else None
+        lines.append(f"{stat.get('type')}: {stat.get('value') or 0} | {away_val or 0}")
+    return '\n'.join(lines)
+
+
+def _odds(data, home, away):
+    odds = data.get('odds')
+    if not odds:
+        return None
+    lines = [
+        "## Odds (calibre as probabilidades e procure valor)",
+        f"1 | X | 2: {odds.get('home_win', 'N/A')} | {odds.get('draw', 'N/A')} | {odds.get('away_win', 'N/A')}",
+    ]
+    if odds.get('over_25'):
+        lines.append(f"Over | Under 2.5: {odds.get('over_25')} | {odds.get('under_25')}")
+    if odds.get('btts_yes'):
+        lines.append(f"Ambos marcam sim | não: {odds.get('btts_yes')} | {odds.get('btts_no')}")
+    return '\n'.join(lines)
+
+
+def _table(data, home, away):
+    table_context = data.get('table_context')
+    if not table_context:
+        return None
+    home_table = table_context.get('home', {})
+    away_table = table_context.get('away', {})
+    return '\n'.join([
+        "## Tabela (pos | pts | saldo | forma | campanha no mando)",
+        f"{home}: {home_table.get('position')} | {home_table.get('points')} | {home_table.get('goal_difference')} | "
+        f"{home_table.get('form', 'N/A')} | casa {home_table.get('home_record', 'N/A')}",
+        f"{away}: {away_table.get('position')} | {away_table.get('points')} | {away_table.get('goal_difference')} | "
+        f"{away_table.get('form', 'N/A')} | fora {away_table.get('away_record', 'N/A')}",
+    ])
+
+
+def _injuries(data, home, away):
+    injuries = data.get('injuries')
+    if not injuries or not (injuries.get('home') or injuries.get('away')):
+        return None
+    lines = ["## Desfalques (total: principais)"]
+    for name, side in ((home, injuries.get('home', [])), (away, injuries.get('away', []))):
+        if side:
+            players = '; '.join(f"{i.get('player')} ({i.get('reason')}, {i.get('type')})" for i in side[:3])
+            lines.append(f"{name} ({len(side)}): {players}")
+    return '\n'.join(lines)
+
+
+def _predictions(data, home, away):
+    predictions = data.get('predictions')
+    if not predictions:
+        return None
+    teams = predictions.get('teams', {})
+    lines = ["## Previsões da API (forma últimos 5 | gols pró/jogo | gols contra/jogo)"]
+    for name, team in ((home, teams.get('home', {})), (away, teams.get('away', {}))):
+        if team:
+            goals = team.get('league', {}).get('goals', {})
+            lines.append(
+                f"{name}: {team.get('last_5', {}).get('form', 'N/A')} | "
+                f"{goals.get('for', {}).get('average', {}).get('total', 'N/A')} | "
+                f"{goals.get('against', {}).get('average', {}).get('total', 'N/A')}"
+            )
+    comparison = predictions.get('comparison', {})
+    if comparison:
+        pairs = ', '.join(
+            f"{key.replace('_', ' ')} {value.get('home', 'N/A')}/{value.get('away', 'N/A')}"
+            for key, value in comparison.items()
+        )
+        lines.append(f"Comparação ({home}/{away}): {pairs}")
+    return '\n'.join(lines) if len(lines) > 1 else None
+
+
+def _team_stats(data, home, away):
+    home_stats, away_stats = data.get('home_stats'), data.get('away_stats')
+    if not home_stats and not away_stats:
+        return None
+    lines = ["## Temporada (jogos | gols pró/jogo | gols contra/jogo | clean sheets | maior sequência V-E-D)"]
+    for name, stats in ((home, home_stats), (away, away_stats)):
+        if stats:
+            streak = stats.get('biggest_streak', {})
+            lines.append(
+                f"{name}: {stats.get('games_played', 0)} | {_num(stats.get('goals_per_game_avg', 0) or 0)} | "
+                f"{_num(stats.get('goals_conceded_avg', 0) or 0)} | {stats.get('clean_sheets', 0)} | "
+                f"{streak.get('wins', 0)}-{streak.get('draws', 0)}-{streak.get('loses', 0)}"
+            )
+    return '\n'.join(lines)
+
+
+def _h2h(data, home, away):
+    h2h = data.get('h2h')
+    if not h2h:
+        return None
+    rows = []
+    home_wins = away_wins = draws = 0
+    for match in h2h[:5]:  # 5 jogos mais recentes
+        full_time = match.get('score', {}).get('fullTime', {})
+        home_score, away_score = full_time.get('home'), full_time.get('away')
+        if home_score is None or away_score is None:
+            continue
+        if home_score > away_score:
+            home_wins += 1
+        elif away_score > home_score:
+            away_wins += 1
+        else:
+            draws += 1
+        rows.append(
+            f"{match.get('utcDate', '')[:10]} {match.get('homeTeam', {}).get('name', 'Casa')} "
+            f"{home_score}x{away_score} {match.get('awayTeam', {}).get('name', 'Fora')}"
+        )
+    if not rows:
+        return None
+    return '\n'.join(
+        [f"## H2H ({len(rows)} de {len(h2h)} jogos; vitórias do mandante {home_wins} | empates {draws} | vitórias do visitante {away_wins})"]
+        + rows
+    )
+
+
+def _trends(data, home, away):
+    trends = data.get('trends')
+    if not trends or trends.get('home', {}).get('games_analyzed', 0) <= 0:
+        return None
+    lines = ["## Tendências recentes (jogos | over 2.5 % | ambos marcam %)"]
+    for name, side in ((home, trends.get('home', {})), (away, trends.get('away', {}))):
+        lines.append(f"{name}: {side.get('games_analyzed', 0)} | {side.get('over_25_pct', 0):.0f} | {side.get('btts_pct', 0):.0f}")
+    if 'combined_over_25_pct' in trends:
+        lines.append(f"Combinado: over 2.5 {trends['combined_over_25_pct']:.0f}% | ambos marcam {trends['combined_btts_pct']:.0f}%")
+    return '\n'.join(lines)
+
+
+def _rest(data, home, away):
+    rest_context = data.get('rest_context')
+    if not rest_context or rest_context.get('home_days_rest') is None:
+        return None
+    advantage = {'home': home, 'away': away}.get(rest_context.get('advantage'), 'equilibrado')
+    return (
+        f"## Descanso (dias): {home} {rest_context.get('home_days_rest')} | "
+        f"{away} {rest_context.get('away_days_rest')} | vantagem física: {advantage}"
+    )
+
+
+def _motivation(data, home, away):
+    motivation = data.get('motivation')
+    if not motivation or motivation.get('context') == 'Unknown':
+        return None
+    return '\n'.join([
+        f"## Motivação: {motivation.get('context', 'Normal league match')}",
+        f"{home}: {motivation.get('home', 'medium')} - {motivation.get('home_reason', '')}",
+        f"{away}: {motivation.get('away', 'medium')} - {motivation.get('away_reason', '')}",
+    ])
+
+
+def _season(data, home, away):
+    season_context = data.get('season_context')
+    if not season_context:
+        return None
+    return (
+        f"## Contexto: temporada {season_context.get('season')} | rodada {season_context.get('round')} | "
+        f"fase {season_context.get('stage', 'mid')}"
+    )
+
+
+def _fixture_details(data, home, away):
+    fixture_details = data.get('fixture_details')
+    if not fixture_details:
+        return None
+    lines = []
+    # Formato resumido do enriquecimento ou resposta bruta da API
+    referee = fixture_details.get('referee') or fixture_details.get('fixture', {}).get('referee')
+    if referee:
+        lines.append(f"## Árbitro: {referee}")
+    events = fixture_details.get('events', [])
+    if events:
+        lines.append("## Eventos")
+        for event in events[:5]:
+            lines.append(
+                f"{event.get('time', {}).get('elapsed', '?')}' {event.get('team', {}).get('name', 'N/A')}: "
+                f"{event.get('player', {}).get('name', 'N/A')} ({event.get('type', 'N/A')})"
+            )
+    return '\n'.join(lines) or None
+
+
+# Ordem de prioridade: as últimas são descartadas primeiro quando falta orçamento
+SECTIONS = (
+    ('statistics', _live_statistics),
+    ('odds', _odds),
+    ('table', _table),
+    ('injuries', _injuries),
+    ('predictions', _predictions),
+    ('team_stats', _team_stats),
+    ('h2h', _h2h),
+    ('trends', _trends),
+    ('rest', _rest),
+    ('motivation', _motivation),
+    ('season', _season),
+    ('fixture_details', _fixture_details),
+)
+
+
+def match_context(data: Dict, budget: Optional[int] = None) -> Dict:
+    """
+    Dados da partida em seções compactas, dentro de `budget` tokens
+
+    Returns:
+        dict: {'text': str, 'tokens': int, 'sections': [nomes], 'dropped': [nomes]}
+    """
+    home = data.get('home_team', {}).get('name', 'Time A')
+    away = data.get('away_team', {}).get('name', 'Time B')
+
+    sections = []
+    for name, build in SECTIONS:
+        text = build(data, home, away)
+        if text:
+            sections.append((name, text))
+
+    required = _match_info(data, home, away)
+    dropped = []
+    if budget is not None:
+        total = estimate_tokens(required) + sum(estimate_tokens(text) + 1 for _, text in sections)
+        while sections and total > budget:
+            name, text = sections.pop()
+            total -= estimate_tokens(text) + 1
+            dropped.append(name)
+
+    text = '\n\n'.join([required] + [section for _, section in sections])
+    return {
+        'text': text,
+        'tokens': estimate_tokens(text),
+        'sections': [name for name, _ in sections],
+        'dropped': dropped,
+    }
+
+
+def _data_budget(task: str) -> int:
+    """Tokens que sobram para os dados de uma partida depois do texto fixo"""
+    return max(0, settings.AI_PROMPT_TOKEN_BUDGET - estimate_tokens(PREAMBLE + task))
+
+
+def _record(tokens: int, dropped: List[str]):
+    with _stats_guard:
+        _stats['prompts'] += 1
+        _stats['tokens'] += tokens
+        _stats['max_tokens'] = max(_stats['max_tokens'], tokens)
+        if tokens > settings.AI_PROMPT_TOKEN_BUDGET:
+            _stats['over_budget'] += 1
+        _stats['dropped'].update(dropped)
+
+
+def build(data: Dict) -> Dict:
+    """
+    Prompt de análise de uma partida
+
+    Returns:
+        dict: {'prompt': str, 'context': str (dados da partida), 'tokens': int, 'dropped': [nomes]}
+    """
+    context = match_context(data, _data_budget(SINGLE_TASK))
+    prompt = f"{PREAMBLE}{SINGLE_TASK}\n## DADOS DA PARTIDA\n{context['text']}\n"
+    tokens = estimate_tokens(prompt)
+    _record(tokens, context['dropped'])
+    logger.info(
+        f"🧮 Prompt: ~{tokens} tokens (dados: {context['tokens']}, seções: {len(context['sections'])}"
+        + (f", descartadas: {', '.join(context['dropped'])}" if context['dropped'] else '') + ")"
+    )
+    return {'prompt': prompt, 'context': context['text'], 'tokens': tokens, 'dropped': context['dropped']}
+
+
+def build_batch(contexts: List[str]) -> str:
+    """Prompt com várias partidas (dados já compactados por build)"""
+    prompt = PREAMBLE + BATCH_TASK.format(count=len(contexts))
+    for number, context in enumerate(contexts, start=1):
+        prompt += f"\n## DADOS DA PARTIDA {number}\n{context}\n"
+    tokens = estimate_tokens(prompt)
+    _record(tokens, [])
+    logger.info(f"🧮 Prompt em lote: ~{tokens} tokens ({len(contexts)} partidas)")
+    return prompt
+
+
+def prompt_stats() -> Dict:
+    """Tokens estimados dos prompts montados neste processo"""
+    with _stats_guard:
+        prompts = _stats['prompts']
+        return {
+            'budget': settings.AI_PROMPT_TOKEN_BUDGET,
+            'preamble_tokens': estimate_tokens(PREAMBLE),
+            'prompts': prompts,
+            'avg_tokens': round(_stats['tokens'] / prompts) if prompts else 0,
+            'max_tokens': _stats['max_tokens'],
+            'over_budget': _stats['over_budget'],
+            'dropped_sections': dict(_stats['dropped']),
+        }
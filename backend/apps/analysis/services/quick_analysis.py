@@ -0,0 +1,337 @@
+"""
+Pipeline do quick_analyze (mapeamento de IDs, enriquecimento e análise)
+Compartilhado pela view síncrona, pela resposta em streaming e pelo job
+assíncrono (apps.analysis.tasks)
+"""
+from datetime import datetime
+from django.db import transaction
+from django.utils import timezone
+from apps.analysis.models import Analysis
+from apps.matches.models import League, Team, Match
+from apps.matches.services.id_mapper import APIIDMapper
+from apps.users.services import quota
+from . import model_router, precomputed, structured_output
+from .ai_analyzer import get_analyzer
+from .match_enricher import MatchDataEnricher
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _notify(on_stage, stage):
+    if on_stage:
+        on_stage(stage)
+
+
+def prepare(data, on_stage=None):
+    """
+    Monta os dados da partida a partir dos dados enviados pelo frontend
+    (análise pré-gerada, mapeamento de IDs e enriquecimento)
+    
+    Args:
+        data (dict): home_team, away_team, league, date, status, venue,
+            home_score, away_score, api_id, football_data_id
+        on_stage (callable): Chamado com 'enriching' ao iniciar o enriquecimento
+    
+    Returns:
+        dict: {'match_data': dict, 'football_data_id': int|None,
+               'precomputed': entrada pré-gerada ou None}
+    """
+    match_data = {
+        'home_team': {'name': data.get('home_team')},
+        'away_team': {'name': data.get('away_team')},
+        'league': data.get('league', 'Liga desconhecida'),
+        'date': data.get('date'),
+        'status': data.get('status'),
+        'venue': data.get('venue'),
+        'home_score': data.get('home_score'),
+        'away_score': data.get('away_score'),
+        'api_id': data.get('api_id')  # Adicionar para o enricher
+    }
+    
+    # Buscar dados enriquecidos das APIs se api_id fornecido
+    api_id = data.get('api_id')
+    football_data_id = data.get('football_data_id')  # ID da Football-Data.org
+    
+    # Análise pré-gerada (pregenerate_analyses): dispensa enriquecimento e geração
+    precomputed_entry = precomputed.get(api_id, data) if api_id else None
+    if precomputed_entry:
+        logger.info(f"📦 Análise pré-gerada encontrada para api_id={api_id}")
+        match_data = precomputed_entry['match_data']
+        football_data_id = match_data.get('football_data_id')
+    
+    # 🆕 MAPEAR FOOTBALL_DATA_ID automaticamente se não fornecido
+    if api_id and not football_data_id and not precomputed_entry:
+        logger.info(f"🔍 [ID Mapper] Tentando mapear football_data_id para {match_data.get('home_team')} vs {match_data.get('away_team')}")
+        try:
+            mapper = APIIDMapper()
+            match_date_str = match_data.get('date')
+            if match_date_str:
+                # Converter string para datetime
+                if isinstance(match_date_str, str):
+                    match_date = datetime.fromisoformat(match_date_str.replace('Z', '+00:00'))
+                else:
+                    match_date = match_date_str
+                
+                football_data_id = mapper.find_football_data_id(
+                    home_team=match_data.get('home_team'),
+                    away_team=match_data.get('away_team'),
+                    match_date=match_date
+                )
+                
+                if football_data_id:
+                    logger.info(f"✅ [ID Mapper] football_data_id={football_data_id} mapeado com sucesso!")
+                    match_data['football_data_id'] = football_data_id
+                else:
+                    logger.warning(f"⚠️ [ID Mapper] Não foi possível mapear football_data_id")
+        except Exception as e:
+            logger.error(f"❌ [ID Mapper] Erro ao mapear ID: {e}", exc_info=True)
+    
+    # Enriquecer dados se api_id fornecido: cada produto (fixture, estatísticas,
+    # previsões, H2H, partida na Football-Data) é buscado uma única vez,
+    # pela camada cacheada
+    if api_id and not precomputed_entry:
+        _notify(on_stage, 'enriching')
+        logger.info(f"\n{'='*80}")
+        logger.info(f"🚀 ENRIQUECIMENTO DE DADOS ATIVADO - API ID: {api_id}")
+        logger.info(f"{'='*80}\n")
+        
+        try:
+            match_data['football_data_id'] = football_data_id
+            enricher = MatchDataEnricher()
+            match_data = enricher.enrich(match_data)
+            
+            logger.info(f"✅ Dados enriquecidos com sucesso!")
+            logger.info(f"📊 TOTAL de dados enriquecidos: fixture={bool(match_data.get('fixture_details'))}, stats={bool(match_data.get('statistics'))}, predictions={bool(match_data.get('predictions'))}, h2h={bool(match_data.get('h2h'))}, fd_match={bool(match_data.get('football_data_match'))}")
+        except Exception as e:
+            logger.error(f"❌ Erro ao enriquecer dados: {str(e)}")
+            logger.exception(e)
+    
+    return {'match_data': match_data, 'football_data_id': football_data_id, 'precomputed': precomputed_entry}
+
+
+def _precomputed_result(entry):
+    return {**entry['result'], 'cached': True, 'precomputed': True}
+
+
+def run(data, on_stage=None, tier=None):
+    """
+    Executa a análise rápida a partir dos dados enviados pelo frontend
+    
+    Args:
+        data (dict): Mesmos campos de prepare()
+        on_stage (callable): Chamado com 'enriching' e 'generating' ao iniciar cada etapa
+        tier (str): Nível de modelo (model_router.tier_for_user)
+    
+    Returns:
+        dict: {'match_data': dict, 'result': dict do analisador, 'football_data_id': int|None}
+    """
+    prepared = prepare(data, on_stage)
+    match_data = prepared['match_data']
+    
+    if prepared['precomputed']:
+        result = _precomputed_result(prepared['precomputed'])
+    else:
+        _notify(on_stage, 'generating')
+        analyzer = get_analyzer()
+        result = analyzer.analyze_match(match_data, tier)
+    
+    return {'match_data': match_data, 'result': result, 'football_data_id': prepared['football_data_id']}
+
+
+def stream_events(data, user):
+    """
+    Análise rápida como uma sequência de eventos para a resposta em streaming
+    
+    Yields:
+        tuple: (evento, dados), na ordem:
+            ('stage', {'stage': 'enriching'|'generating'}),
+            ('chunk', {'text': str}) para cada trecho gerado pelo Gemini,
+            e por fim ('done', payload do quick_analyze) ou ('error', {...})
+    
+    Confiança e persistência no histórico são feitas sobre o texto completo, no final.
+    """
+    if data.get('api_id'):
+        yield 'stage', {'stage': 'enriching'}
+    prepared = prepare(data)
+    match_data = prepared['match_data']
+    
+    if prepared['precomputed']:
+        result = _precomputed_result(prepared['precomputed'])
+        yield 'chunk', {'text': result['analysis']}
+    else:
+        yield 'stage', {'stage': 'generating'}
+        result = None
+        for kind, value in get_analyzer().analyze_match_stream(match_data, model_router.tier_for_user(user)):
+            if kind == 'chunk':
+                yield 'chunk', {'text': value}
+            else:
+                result = value
+    
+    if not result['success']:
+        yield 'error', {
+            'error': result.get('error'),
+            'details': result.get('details'),
+            'code': result.get('error_code'),
+            'http_status': result.get('http_status', 500),
+        }
+        return
+    
+    payload = build_payload(match_data, result, prepared['football_data_id'])
+    saved, saved_info = save_to_history(user, data, result)
+    # O texto já foi enviado em partes; 'done' traz o restante do payload
+    payload.pop('analysis')
+    yield 'done', {**payload, 'saved': saved, 'saved_analysis': saved_info}
+
+
+def match_data_from_fixture(fixture):
+    """
+    Mesmos dados que o quick_analyze monta a partir do frontend, para uma partida
+    do snapshot de fixtures (pregenerate_analyses, análise em lote)
+    """
+    match_data = {
+        'home_team': {'name': fixture['home_team']['name']},
+        'away_team': {'name': fixture['away_team']['name']},
+        'league': fixture['league']['name'],
+        'date': fixture['date'],
+        'status': fixture['status'],
+        'venue': fixture.get('venue'),
+        'home_score': fixture.get('home_score'),
+        'away_score': fixture.get('away_score'),
+        'api_id': fixture['id'],
+    }
+    try:
+        match_data['football_data_id'] = APIIDMapper().find_football_data_id(
+            home_team=match_data['home_team'],
+            away_team=match_data['away_team'],
+            match_date=datetime.fromisoformat(fixture['date'].replace('Z', '+00:00'))
+        )
+    except Exception as e:
+        logger.warning(f"Não foi possível mapear football_data_id para {fixture['id']}: {e}")
+    return match_data
+
+
+def build_payload(match_data, result, football_data_id):
+    """Resposta do quick_analyze (análise, metadados e dados enriquecidos)"""
+    # Criar metadados sobre quais dados foram analisados
+    metadata = {
+        'has_predictions': bool(match_data.get('predictions')),
+        'has_statistics': bool(match_data.get('statistics')),
+        'has_h2h': bool(match_data.get('h2h')),
+        'h2h_count': len(match_data.get('h2h', [])) if match_data.get('h2h') else 0,
+        'has_fixture_details': bool(match_data.get('fixture_details')),
+        'has_football_data': bool(match_data.get('football_data_match')),
+        'cached': result.get('cached', False),
+        'precomputed': result.get('precomputed', False),
+        'model': result.get('model'),
+        'degraded': result.get('degraded', False),
+    }
+    
+    # 🔥 Extrair dados enriquecidos para enviar ao frontend
+    enriched_data = {
+        'table_context': match_data.get('table_context'),
+        'injuries': match_data.get('injuries'),
+        'odds': match_data.get('odds'),
+        'home_stats': match_data.get('home_stats'),
+        'away_stats': match_data.get('away_stats'),
+        'rest_context': match_data.get('rest_context'),
+        'motivation': match_data.get('motivation'),
+        'trends': match_data.get('trends'),
+        'season_context': match_data.get('season_context'),
+        'fixture_details': match_data.get('fixture_details'),
+        'h2h': match_data.get('h2h'),  # 🆕 Histórico direto (Football-Data.org)
+        'football_data_id': football_data_id,  # 🆕 ID mapeado
+        'football_data_match': match_data.get('football_data_match')  # 🆕 Detalhes do Football-Data.org
+    }
+    
+    return {
+        'analysis': result['analysis'],
+        'confidence': result['confidence'],
+        'structured': result.get('structured'),  # Previsão, probabilidades, xG e fatores-chave
+        'metadata': metadata,
+        'enriched_data': enriched_data,
+    }
+
+
+def save_to_history(user, data, result):
+    """
+    Salva a análise no histórico do usuário se pedido (save_to_history)
+    
+    A cota e a análise são gravadas na mesma transação: se salvar falhar, a
+    unidade da cota não é consumida.
+    
+    Returns:
+        tuple: (saved, saved_info)
+    """
+    saved = False
+    saved_info = None
+    api_id_val = data.get('api_id')
+    if not (user.is_authenticated and data.get('save_to_history') and api_id_val):
+        return saved, saved_info
+    try:
+        with transaction.atomic():
+            # Tentar mapear para uma partida existente no banco
+            db_match = Match.objects.filter(api_football_id=api_id_val).first()
+            # Evitar duplicar análises
+            if db_match and Analysis.objects.filter(user=user, match=db_match).exists():
+                return saved, saved_info
+            # Consumir a cota do dia (atômico; sem cota não salva)
+            if not quota.consume(user):
+                return saved, saved_info
+            if db_match is None:
+                # Criar um registro mínimo da partida e salvar análise
+                db_match = _create_minimal_match(data, api_id_val)
+            saved_analysis = Analysis.objects.create(
+                user=user,
+                match=db_match,
+                **structured_output.analysis_fields(result)
+            )
+            saved = True
+            saved_info = {'id': saved_analysis.id, 'created_at': saved_analysis.created_at}
+    except Exception as e:
+        # O preview continua sendo devolvido; a cota voltou com o rollback
+        logger.error(f"❌ Erro ao salvar análise no histórico (usuário {user.pk}, api_id={api_id_val}): {e}", exc_info=True)
+        user.refresh_from_db(fields=quota.COUNTER_FIELDS)
+        saved = False
+        saved_info = None
+
+    return saved, saved_info
+
+
+def _create_minimal_match(data, api_id_val):
+    league_name = data.get('league') or 'Liga Desconhecida'
+    home_name = data.get('home_team') or 'Time Casa'
+    away_name = data.get('away_team') or 'Time Visitante'
+    match_date_str = data.get('date')
+    try:
+        match_date = datetime.fromisoformat(str(match_date_str).replace('Z', '+00:00')) if match_date_str else timezone.now()
+    except Exception:
+        match_date = timezone.now()
+
+    league_obj, _ = League.objects.get_or_create(
+        name=league_name,
+        defaults={
+            'country': '',
+            'logo': '',
+            'is_active': True,
+        }
+    )
+    home_team_obj, _ = Team.objects.get_or_create(
+        name=home_name,
+        defaults={'country': '', 'logo': ''}
+    )
+    away_team_obj, _ = Team.objects.get_or_create(
+        name=away_name,
+        defaults={'country': '', 'logo': ''}
+    )
+
+    return Match.objects.create(
+        league=league_obj,
+        home_team=home_team_obj,
+        away_team=away_team_obj,
+        match_date=match_date,
+        status=data.get('status') or 'scheduled',
+        api_football_id=api_id_val,
+        football_data_id=data.get('football_data_id') or None,
+        is_analysis_available=True,
+    )
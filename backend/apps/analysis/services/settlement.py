@@ -0,0 +1,153 @@
+"""
+Liquidação em lote das análises de partidas encerradas
+Para as partidas 'finished' com placar e análises a liquidar (pendentes, ou já
+liquidadas com um resultado que não é mais o da partida, após correção do
+placar), marca as análises com no máximo um UPDATE por resultado
+(casa/empate/fora) e aplica a diferença de acertos (para mais ou para menos) em
+User.successful_predictions e em UserAnalysisStats com UPDATEs F() agrupados
+pelo mesmo incremento. Só toca análises cujo resultado mudou, então rodar de
+novo não conta nada duas vezes; o custo acompanha o número de partidas
+"""
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Exists, F, OuterRef, Q, Value, When
+from django.utils import timezone
+from typing import Dict, Iterable
+import logging
+
+from apps.analysis.models import Analysis, UserAnalysisStats
+from apps.matches.models import Match
+from . import user_stats
+
+logger = logging.getLogger(__name__)
+
+
+def _unsettled(result) -> Q:
+    """Análises ainda não liquidadas com `result` (pendentes ou com outro resultado)"""
+    return Q(is_correct__isnull=True) | ~Q(actual_result=result)
+
+
+def _finished(match_ids: Iterable[int] = None):
+    result = Case(
+        When(home_score__gt=F('away_score'), then=Value('home')),
+        When(home_score__lt=F('away_score'), then=Value('away')),
+        default=Value('draw'),
+        output_field=CharField(),
+    )
+    unsettled = Analysis.objects.filter(match_id=OuterRef('pk')).filter(_unsettled(OuterRef('settled_result')))
+    matches = Match.objects.filter(
+        status='finished', home_score__isnull=False, away_score__isnull=False,
+    ).annotate(settled_result=result).filter(Exists(unsettled))
+    if match_ids is not None:
+        matches = matches.filter(id__in=list(match_ids))
+    return matches
+
+
+def _correct_fields() -> Dict[str, Q]:
+    """Contadores de acerto de UserAnalysisStats e o filtro de cada um"""
+    fields = {'correct': Q()}
+    for level in user_stats.CONFIDENCE_LEVELS:
+        fields[f'correct_confidence_{level}'] = Q(confidence=level)
+    for prediction in user_stats.PREDICTIONS:
+        fields[f'correct_{prediction}'] = Q(prediction=prediction)
+    return fields
+
+
+def _stats_deltas(to_settle, correct_q) -> Dict[int, Dict[str, int]]:
+    """
+    Incrementos de UserAnalysisStats por usuário (uma consulta agregada)
+
+    Acertos = corretas após a liquidação - corretas antes (negativo quando uma
+    correção de placar desfaz um acerto); 'validated' conta só as pendentes.
+    """
+    fields = _correct_fields()
+    aggregates = {'settled': Count('id'), 'validated': Count('id', filter=Q(is_correct__isnull=True))}
+    for field, field_q in fields.items():
+        aggregates[f'{field}__now'] = Count('id', filter=correct_q & field_q)
+        aggregates[f'{field}__was'] = Count('id', filter=Q(is_correct=True) & field_q)
+    deltas = {}
+    for row in to_settle.order_by().values('user_id').annotate(**aggregates):
+        deltas[row['user_id']] = {
+            'settled': row['settled'],
+            'validated': row['validated'],
+            **{field: row[f'{field}__now'] - row[f'{field}__was'] for field in fields},
+            'now_correct': row['correct__now'],
+        }
+    return deltas
+
+
+def _apply_grouped(queryset, deltas: Dict[int, Dict[str, int]], **extra):
+    """Um UPDATE F() por combinação distinta de incrementos"""
+    groups = defaultdict(list)
+    for user_id, fields in deltas.items():
+        signature = tuple(sorted((field, delta) for field, delta in fields.items() if delta))
+        if signature:
+            groups[signature].append(user_id)
+    for signature, user_ids in groups.items():
+        queryset.filter(pk__in=user_ids).update(
+            **extra, **{field: F(field) + delta for field, delta in signature}
+        )
+
+
+def settle(match_ids: Iterable[int] = None, dry_run: bool = False) -> Dict:
+    """
+    Liquida as análises das partidas encerradas (todas ou `match_ids`)
+
+    Returns:
+        dict: {'matches', 'settled' (análises liquidadas ou corrigidas),
+               'correct' (corretas entre elas), 'users'}
+    """
+    with transaction.atomic():
+        # Trava as partidas: liquidações simultâneas das mesmas partidas esperam
+        # e, depois, não encontram mais análises a liquidar
+        matches = list(
+            _finished(match_ids).select_for_update().only('id', 'status', 'home_score', 'away_score')
+        )
+        by_result = defaultdict(list)
+        for match in matches:
+            by_result[match.get_result()].append(match.id)
+        by_result.pop(None, None)
+        if not by_result:
+            return {'matches': 0, 'settled': 0, 'correct': 0, 'users': 0}
+
+        match_ids = [match_id for ids in by_result.values() for match_id in ids]
+        settle_q = Q()
+        correct_q = Q()
+        for result, ids in by_result.items():
+            settle_q |= Q(match_id__in=ids) & _unsettled(result)
+            correct_q |= Q(match_id__in=ids, prediction=result)
+        deltas = _stats_deltas(Analysis.objects.filter(settle_q), correct_q)
+        summary = {
+            'matches': len(match_ids),
+            'settled': sum(d.pop('settled') for d in deltas.values()),
+            'correct': sum(d.pop('now_correct') for d in deltas.values()),
+            'users': len(deltas),
+        }
+        if dry_run:
+            transaction.set_rollback(True)
+            return summary
+
+        now = timezone.now()
+        for result, ids in by_result.items():
+            Analysis.objects.filter(match_id__in=ids).filter(_unsettled(result)).update(
+                actual_result=result,
+                is_correct=Case(When(prediction=result, then=Value(True)), default=Value(False)),
+                updated_at=now,
+            )
+
+        _apply_grouped(
+            get_user_model().objects.all(),
+            {user_id: {'successful_predictions': d['correct']} for user_id, d in deltas.items()},
+        )
+        _apply_grouped(UserAnalysisStats.objects.all(), deltas, updated_at=now)
+        # Usuários ainda sem linha de estatísticas: recalcular do histórico (já liquidado)
+        existing = set(UserAnalysisStats.objects.filter(user_id__in=list(deltas)).values_list('user_id', flat=True))
+        for user_id in set(deltas) - existing:
+            user_stats.rebuild(user_id)
+
+    logger.info(
+        f"🏁 Liquidação: {summary['settled']} análises de {summary['matches']} partidas "
+        f"({summary['correct']} corretas, {summary['users']} usuários)"
+    )
+    return summary
@@ -0,0 +1,135 @@
+"""
+Saída estruturada das análises da IA
+O prompt pede ao Gemini que termine a análise com um bloco ```json no esquema de
+SCHEMA_INSTRUCTIONS (previsão, probabilidades, xG, confiança e fatores-chave).
+parse() separa esse bloco do texto exibido e normaliza os valores, e
+analysis_fields() converte o resultado nos campos do modelo Analysis
+"""
+from typing import Dict, Optional, Tuple
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+MARKER = '```json'
+
+PREDICTIONS = ('home', 'draw', 'away')
+
+SCHEMA_INSTRUCTIONS = """
+## DADOS ESTRUTURADOS (OBRIGATÓRIO)
+Termine a análise (de cada partida) com um bloco ```json neste formato:
+```json
+{"prediction": "home | draw | away", "home_probability": 0-100, "draw_probability": 0-100, "away_probability": 0-100, "home_xg": 0.0, "away_xg": 0.0, "confidence": 1-5, "key_factors": ["fator 1", "fator 2", "fator 3"]}
+```
+- Probabilidades em %, somando 100 e iguais às do Bloco 3
+- confidence igual às estrelas do Bloco 1
+- key_factors: até 5 frases curtas
+"""
+
+# Valores gravados quando a resposta não traz o bloco estruturado
+FALLBACK_FIELDS = {
+    'prediction': 'home',
+    'home_probability': 40.0,
+    'draw_probability': 30.0,
+    'away_probability': 30.0,
+    'home_xg': 1.5,
+    'away_xg': 1.3,
+    'key_factors': ['Mando de campo', 'Forma recente'],
+}
+
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize(raw: Dict) -> Optional[Dict]:
+    """Valida e normaliza o JSON do modelo; None se as probabilidades não servirem"""
+    probabilities = [_number(raw.get(f'{side}_probability')) for side in PREDICTIONS]
+    if any(p is None or p < 0 for p in probabilities) or sum(probabilities) <= 0:
+        return None
+    # Aceita frações (0-1) ou somas que não fecham 100: reescala para %
+    total = sum(probabilities)
+    home_p, draw_p, away_p = (round(p * 100 / total, 1) for p in probabilities)
+
+    prediction = str(raw.get('prediction') or '').strip().lower()
+    if prediction not in PREDICTIONS:
+        prediction = max(zip((home_p, draw_p, away_p), PREDICTIONS))[1]
+
+    confidence = _number(raw.get('confidence'))
+    confidence = min(5, max(1, int(round(confidence)))) if confidence is not None else None
+
+    home_xg, away_xg = _number(raw.get('home_xg')), _number(raw.get('away_xg'))
+    key_factors = raw.get('key_factors')
+    if not isinstance(key_factors, list):
+        key_factors = []
+
+    return {
+        'prediction': prediction,
+        'home_probability': home_p,
+        'draw_probability': draw_p,
+        'away_probability': away_p,
+        'home_xg': round(home_xg, 2) if home_xg is not None and home_xg >= 0 else None,
+        'away_xg': round(away_xg, 2) if away_xg is not None and away_xg >= 0 else None,
+        'confidence': confidence,
+        'key_factors': [str(f).strip() for f in key_factors if str(f).strip()][:5],
+    }
+
+
+def parse(text: str) -> Tuple[str, Optional[Dict]]:
+    """
+    Separa o bloco ```json final da análise
+
+    Returns:
+        tuple: (texto para exibição, dados normalizados ou None)
+    """
+    start = text.rfind(MARKER)
+    if start == -1:
+        return text, None
+    display = text[:start].rstrip()
+    body = text[start + len(MARKER):]
+    end = body.find('```')
+    if end != -1:
+        body = body[:end]
+    try:
+        raw = json.loads(body)
+    except ValueError:
+        logger.warning("⚠️ Bloco JSON da análise inválido - usando apenas o texto")
+        return display, None
+    if not isinstance(raw, dict):
+        return display, None
+    return display, _normalize(raw)
+
+
+def analysis_fields(result: Dict) -> Dict:
+    """
+    Campos do modelo Analysis a partir de um resultado do AIAnalyzer
+
+    Usa os números estruturados quando a resposta os trouxe; caso contrário
+    grava a distribuição padrão, marcada como fallback em analysis_data.
+    Estimativas do modo degradado (heuristic) ficam com source 'heuristic'.
+    """
+    structured = result.get('structured')
+    fields = {
+        'confidence': int(result.get('confidence', 3) or 3),
+        'reasoning': result.get('analysis') or 'Análise gerada pela IA.',
+    }
+    if structured:
+        fields.update({
+            'prediction': structured['prediction'],
+            'home_probability': structured['home_probability'],
+            'draw_probability': structured['draw_probability'],
+            'away_probability': structured['away_probability'],
+            'home_xg': structured['home_xg'],
+            'away_xg': structured['away_xg'],
+            'key_factors': structured['key_factors'],
+            'analysis_data': {'source': 'ai', 'structured': True},
+        })
+        if result.get('degraded'):
+            fields['analysis_data'] = {'source': 'heuristic', 'degraded': True}
+    else:
+        fields.update(FALLBACK_FIELDS)
+        fields['analysis_data'] = {'source': 'ai', 'fallback': True}
+    return fields
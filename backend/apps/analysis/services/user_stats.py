@@ -0,0 +1,120 @@
+"""
+Estatísticas de acerto por usuário (UserAnalysisStats)
+Uma linha por usuário com totais e acertos por nível de confiança e por predição,
+atualizada com UPDATEs incrementais (F) quando análises são criadas, validadas
+ou removidas. my_stats e UserStatsView leem só essa linha; se ela não existir, é
+reconstruída a partir do histórico com uma única agregação
+"""
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from typing import Dict, Optional
+
+from apps.analysis.models import Analysis, UserAnalysisStats
+
+CONFIDENCE_LEVELS = range(1, 6)
+PREDICTIONS = ('home', 'draw', 'away')
+
+
+def _fields(prefix: str, analysis) -> list:
+    """Contadores afetados por uma análise ('total' ou 'correct')"""
+    fields = [prefix]
+    if analysis.confidence in CONFIDENCE_LEVELS:
+        fields.append(f'{prefix}_confidence_{analysis.confidence}')
+    if analysis.prediction in PREDICTIONS:
+        fields.append(f'{prefix}_{analysis.prediction}')
+    return fields
+
+
+def aggregations() -> Dict:
+    """Contagens de UserAnalysisStats como agregações sobre Analysis"""
+    aggregates = {
+        'total': Count('id'),
+        'validated': Count('id', filter=Q(is_correct__isnull=False)),
+        'correct': Count('id', filter=Q(is_correct=True)),
+    }
+    for level in CONFIDENCE_LEVELS:
+        aggregates[f'total_confidence_{level}'] = Count('id', filter=Q(confidence=level))
+        aggregates[f'correct_confidence_{level}'] = Count('id', filter=Q(confidence=level, is_correct=True))
+    for prediction in PREDICTIONS:
+        aggregates[f'total_{prediction}'] = Count('id', filter=Q(prediction=prediction))
+        aggregates[f'correct_{prediction}'] = Count('id', filter=Q(prediction=prediction, is_correct=True))
+    return aggregates
+
+
+def rebuild(user_id) -> UserAnalysisStats:
+    """Recalcula a linha do usuário a partir do histórico (uma consulta de agregação)"""
+    counts = Analysis.objects.filter(user_id=user_id).aggregate(**aggregations())
+    stats, _ = UserAnalysisStats.objects.update_or_create(user_id=user_id, defaults=counts)
+    return stats
+
+
+def _apply(user_id, deltas: Dict[str, int]):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = UserAnalysisStats.objects.filter(user_id=user_id).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated:
+        # Sem linha ainda: o histórico (já com esta alteração) vira a linha
+        rebuild(user_id)
+
+
+def record_created(analysis):
+    _apply(analysis.user_id, {field: 1 for field in _fields('total', analysis)})
+
+
+def record_validated(analysis, previous_is_correct: Optional[bool]):
+    """Ajusta os acertos após (re)validar uma análise que antes tinha previous_is_correct"""
+    deltas = {'validated': (analysis.is_correct is not None) - (previous_is_correct is not None)}
+    correct_delta = (analysis.is_correct is True) - (previous_is_correct is True)
+    for field in _fields('correct', analysis):
+        deltas[field] = correct_delta
+    _apply(analysis.user_id, deltas)
+
+
+def record_deleted(analysis):
+    deltas = {field: -1 for field in _fields('total', analysis)}
+    if analysis.is_correct is not None:
+        deltas['validated'] = -1
+    if analysis.is_correct:
+        for field in _fields('correct', analysis):
+            deltas[field] = -1
+    _apply(analysis.user_id, deltas)
+
+
+def for_user(user) -> UserAnalysisStats:
+    stats = UserAnalysisStats.objects.filter(user_id=user.pk).first()
+    return stats if stats is not None else rebuild(user.pk)
+
+
+def _accuracy(correct: int, total: int) -> float:
+    return round((correct / total * 100), 1) if total > 0 else 0
+
+
+def payload(stats: UserAnalysisStats) -> Dict:
+    """Resposta do my_stats: totais, acerto geral e por confiança/predição"""
+    if stats.total == 0:
+        return {'total': 0, 'correct': 0, 'accuracy': 0, 'validated': 0, 'by_confidence': {}, 'by_prediction': {}}
+
+    by_confidence = {}
+    for level in CONFIDENCE_LEVELS:
+        total = getattr(stats, f'total_confidence_{level}')
+        correct = getattr(stats, f'correct_confidence_{level}')
+        by_confidence[level] = {'total': total, 'correct': correct, 'accuracy': _accuracy(correct, total)}
+
+    by_prediction = {}
+    for prediction in PREDICTIONS:
+        total = getattr(stats, f'total_{prediction}')
+        correct = getattr(stats, f'correct_{prediction}')
+        by_prediction[prediction] = {'total': total, 'correct': correct, 'accuracy': _accuracy(correct, total)}
+
+    return {
+        'total': stats.total,
+        'correct': stats.correct,
+        'accuracy': _accuracy(stats.correct, stats.total),
+        'validated': stats.validated,
+        'by_confidence': by_confidence,
+        'by_prediction': by_prediction,
+    }
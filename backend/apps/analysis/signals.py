@@ -0,0 +1,49 @@
+"""
+Atualização incremental de UserAnalysisStats na criação e remoção de análises
+(a validação é registrada em Analysis.validate_result) e liquidação das
+análises quando a partida é salva como encerrada
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+import logging
+
+from apps.matches.models import Match
+from .models import Analysis
+from .services import user_stats
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Analysis)
+def analysis_created(sender, instance, created, **kwargs):
+    if created:
+        user_stats.record_created(instance)
+
+
+@receiver(post_delete, sender=Analysis)
+def analysis_deleted(sender, instance, **kwargs):
+    user_stats.record_deleted(instance)
+
+
+def _enqueue_settlement(match_id):
+    from .tasks import settle_matches
+    try:
+        # Sem novas tentativas de publicação: broker fora do ar falha na hora em
+        # vez de segurar a requisição que salvou a partida
+        settle_matches.apply_async(args=[[match_id]], retry=False)
+    except Exception as e:
+        # A varredura periódica (settle_analyses / beat) liquida depois
+        logger.error(f"❌ Liquidação da partida {match_id} não enfileirada: {e}", exc_info=True)
+
+
+@receiver(post_save, sender=Match)
+def match_saved(sender, instance, **kwargs):
+    """Partida encerrada com análises a liquidar (pendentes ou placar corrigido): liquidar após o commit"""
+    result = instance.get_result()
+    if result is None or instance.away_score is None:
+        return
+    unsettled = Q(is_correct__isnull=True) | ~Q(actual_result=result)
+    if Analysis.objects.filter(unsettled, match_id=instance.pk).exists():
+        transaction.on_commit(lambda: _enqueue_settlement(instance.pk))
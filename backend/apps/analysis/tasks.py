@@ -0,0 +1,58 @@
+"""
+Tasks Celery do app de análises
+"""
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from apps.analysis.services import analysis_jobs, model_router, quick_analysis, settlement
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def run_quick_analysis_job(job_id, data, user_id=None):
+    """Executa o quick_analyze fora do ciclo da requisição, registrando as etapas no job"""
+    try:
+        user = AnonymousUser()
+        if user_id:
+            user = get_user_model().objects.filter(id=user_id).first() or user
+        outcome = quick_analysis.run(
+            data,
+            on_stage=lambda stage: analysis_jobs.update(job_id, stage),
+            tier=model_router.tier_for_user(user)
+        )
+        result = outcome['result']
+
+        if not result['success']:
+            analysis_jobs.update(
+                job_id,
+                analysis_jobs.FAILED,
+                error={'error': result.get('error'), 'details': result.get('details'), 'code': result.get('error_code')},
+                http_status=result.get('http_status', 500)
+            )
+            return
+
+        payload = quick_analysis.build_payload(outcome['match_data'], result, outcome['football_data_id'])
+
+        saved, saved_info = quick_analysis.save_to_history(user, data, result)
+
+        analysis_jobs.update(
+            job_id,
+            analysis_jobs.DONE,
+            result={**payload, 'saved': saved, 'saved_analysis': saved_info}
+        )
+    except Exception as e:
+        logger.error(f"❌ Job de análise {job_id} falhou: {e}", exc_info=True)
+        analysis_jobs.update(
+            job_id,
+            analysis_jobs.FAILED,
+            error={'error': 'Falha ao gerar a análise. Tente novamente mais tarde.', 'details': str(e)},
+            http_status=500
+        )
+
+
+@shared_task(ignore_result=True)
+def settle_matches(match_ids=None):
+    """Liquida as análises das partidas encerradas (todas se match_ids for None; idempotente)"""
+    settlement.settle(match_ids)
@@ -3,9 +3,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import IntegrityError, transaction
 from .models import Analysis
 from .serializers import AnalysisSerializer, AnalysisRequestSerializer
 from apps.matches.models import Match
+from apps.users.services import quota
+from .services import user_stats
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class AnalysisViewSet(viewsets.ReadOnlyModelViewSet):
@@ -32,12 +38,8 @@ class AnalysisViewSet(viewsets.ReadOnlyModelViewSet):
         user = request.user
         
         # Verificar se usuário pode analisar
-        if not user.can_analyze():
-            return Response({
-                'error': 'Limite de análises diárias atingido',
-                'daily_limit': 5 if not user.is_premium_active() else 100,
-                'used': user.daily_analysis_count
-            }, status=status.HTTP_403_FORBIDDEN)
+        if not quota.can_analyze(user):
+            return self._limit_reached(user)
         
         # Verificar se já existe análise
         match = Match.objects.get(id=match_id)
@@ -50,9 +52,14 @@ class AnalysisViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_200_OK)
         
         # Usar AI Analyzer para gerar análise
-        from apps.analysis.services.ai_analyzer import AIAnalyzer
+        from apps.analysis.services import heuristic, model_router, precomputed, structured_output
+        from apps.analysis.services.ai_analyzer import get_analyzer
         
-        analyzer = AIAnalyzer()
+        analyzer = get_analyzer()
+        precomputed_entry = precomputed.get(match.api_football_id, {
+            'status': match.status,
+            'date': match.match_date.isoformat(),
+        })
         match_data = {
             'home_team': {
                 'name': match.home_team.name,
@@ -67,91 +74,80 @@ class AnalysisViewSet(viewsets.ReadOnlyModelViewSet):
             'date': match.match_date.strftime('%Y-%m-%d')
         }
         
-        ai_result = analyzer.analyze_match(match_data)
+        if precomputed_entry:
+            # Pré-gerada pelo pregenerate_analyses: resposta imediata
+            ai_result = {**precomputed_entry['result'], 'cached': True}
+        else:
+            ai_result = analyzer.analyze_match(match_data, model_router.tier_for_user(user))
 
-        # Fallback seguro quando IA não disponível: gerar análise básica
+        # IA indisponível: estimativa estatística com os dados da partida
         if not ai_result or not isinstance(ai_result, dict) or ai_result.get('success') is False:
-            # Probabilidades simples e estáveis
-            home_p, draw_p, away_p = 40.0, 30.0, 30.0
-            prediction = 'home'
-            confidence = 3
-            reasoning = (
-                'Análise padrão aplicada devido à indisponibilidade temporária do serviço de IA. '
-                'Distribuição neutra de probabilidades baseada em fatores gerais de mando de campo.'
-            )
-            key_factors = ['Mando de campo', 'Equilíbrio de forças presumido']
-            analysis_data = {'fallback': True, 'source': 'heuristic'}
-            home_xg, away_xg = 1.5, 1.3
-        else:
-            # Adaptar se o serviço retornar apenas texto + confiança
-            # Esperados: prediction, confidence, probabilities, reasoning, key_factors
-            prediction = ai_result.get('prediction', 'home')
-            confidence = int(ai_result.get('confidence', 3) or 3)
-            home_p = float(ai_result.get('home_probability', 40.0) or 40.0)
-            draw_p = float(ai_result.get('draw_probability', 30.0) or 30.0)
-            away_p = float(ai_result.get('away_probability', 30.0) or 30.0)
-            reasoning = ai_result.get('reasoning') or ai_result.get('analysis') or 'Resumo gerado pela IA.'
-            key_factors = ai_result.get('key_factors') or []
-            analysis_data = ai_result.get('analysis_breakdown') or {'raw_text': ai_result.get('analysis')}
-            home_xg = float(ai_result.get('home_xg', 1.5) or 1.5)
-            away_xg = float(ai_result.get('away_xg', 1.3) or 1.3)
+            ai_result = heuristic.estimate(match_data)
 
-        # Criar análise já com dados finais (IA ou fallback)
-        analysis = Analysis.objects.create(
-            user=user,
-            match=match,
-            prediction=prediction,
-            confidence=confidence,
-            home_probability=home_p,
-            draw_probability=draw_p,
-            away_probability=away_p,
-            home_xg=home_xg,
-            away_xg=away_xg,
-            reasoning=reasoning,
-            key_factors=key_factors,
-            analysis_data=analysis_data,
-        )
-        
-        # Incrementar contador
-        user.increment_analysis_count()
+        # Números do bloco estruturado da resposta (ou distribuição padrão)
+        fields = structured_output.analysis_fields(ai_result)
+        prediction = fields['prediction']
+        confidence = fields['confidence']
+        home_p = fields['home_probability']
+        draw_p = fields['draw_probability']
+        away_p = fields['away_probability']
+        reasoning = fields['reasoning']
+        key_factors = fields['key_factors']
+        analysis_data = {**fields['analysis_data'], 'raw_text': ai_result.get('analysis'), 'cached': ai_result.get('cached', False)}
+        home_xg = fields['home_xg']
+        away_xg = fields['away_xg']
+
+        # Consumir a cota (atômico: pedidos simultâneos não passam do limite) e
+        # salvar a análise na mesma transação: se salvar falhar, a cota volta
+        try:
+            with transaction.atomic():
+                if not quota.consume(user):
+                    return self._limit_reached(user)
+                analysis = Analysis.objects.create(
+                    user=user,
+                    match=match,
+                    prediction=prediction,
+                    confidence=confidence,
+                    home_probability=home_p,
+                    draw_probability=draw_p,
+                    away_probability=away_p,
+                    home_xg=home_xg,
+                    away_xg=away_xg,
+                    reasoning=reasoning,
+                    key_factors=key_factors,
+                    analysis_data=analysis_data,
+                )
+        except IntegrityError:
+            # Pedido simultâneo da mesma partida já salvou a análise (sem cobrar de novo)
+            user.refresh_from_db(fields=quota.COUNTER_FIELDS)
+            existing = Analysis.objects.filter(user=user, match=match).first()
+            if existing is None:
+                raise
+            return Response({
+                'message': 'Você já analisou esta partida',
+                'analysis': AnalysisSerializer(existing).data
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar análise da partida {match.id}: {e}", exc_info=True)
+            user.refresh_from_db(fields=quota.COUNTER_FIELDS)
+            return Response(
+                {'error': 'Não foi possível salvar a análise. Tente novamente.'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
         
         return Response({
             'message': 'Análise gerada com sucesso!',
             'analysis': AnalysisSerializer(analysis).data
         }, status=status.HTTP_201_CREATED)
     
+    def _limit_reached(self, user):
+        return Response({
+            'error': 'Limite de análises diárias atingido',
+            'daily_limit': quota.daily_limit(user),
+            'used': quota.used_today(user)
+        }, status=status.HTTP_403_FORBIDDEN)
+    
     @action(detail=False, methods=['get'])
     def my_stats(self, request):
-        """Estatísticas das análises do usuário"""
-        analyses = self.get_queryset()
-        total = analyses.count()
-        
-        if total == 0:
-            return Response({
-                'total': 0,
-                'correct': 0,
-                'accuracy': 0,
-                'by_confidence': {}
-            })
-        
-        correct = analyses.filter(is_correct=True).count()
-        
-        # Estatísticas por nível de confiança
-        by_confidence = {}
-        for level in range(1, 6):
-            level_analyses = analyses.filter(confidence=level)
-            level_total = level_analyses.count()
-            level_correct = level_analyses.filter(is_correct=True).count()
-            
-            by_confidence[level] = {
-                'total': level_total,
-                'correct': level_correct,
-                'accuracy': round((level_correct / level_total * 100), 1) if level_total > 0 else 0
-            }
-        
-        return Response({
-            'total': total,
-            'correct': correct,
-            'accuracy': round((correct / total * 100), 1),
-            'by_confidence': by_confidence
-        })
+        """Estatísticas das análises do usuário (linha de UserAnalysisStats)"""
+        return Response(user_stats.payload(user_stats.for_user(request.user)))
@@ -0,0 +1,68 @@
+"""
+Management Command para manter os shards diários da janela de partidas aquecidos
+Executar via cron (python manage.py refresh_fixtures) ou como processo
+contínuo (python manage.py refresh_fixtures --loop)
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.matches.services import fixture_window
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Atualiza os dias vencidos da janela usada por /matches/from_api e /matches/search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Executar continuamente, atualizando cada dia antes de expirar'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=None,
+            help='Segundos entre verificações no modo --loop (padrão: FIXTURES_REFRESH_LOOP_INTERVAL)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Atualizar todos os dias da janela, mesmo os ainda válidos'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.FIXTURES_REFRESH_LOOP_INTERVAL
+
+        if not options['loop']:
+            self._refresh(options['force'])
+            return
+
+        self.stdout.write(f'🔄 Verificando a janela a cada {interval}s (Ctrl+C para parar)')
+        while True:
+            try:
+                self._refresh(options['force'])
+            except Exception as e:
+                # Nunca derrubar o loop: os shards anteriores continuam sendo servidos
+                logger.error(f'Erro ao atualizar a janela de partidas: {e}', exc_info=True)
+            time.sleep(interval)
+
+    def _refresh(self, force):
+        started = time.monotonic()
+        summary = fixture_window.refresh_stale_shards(force=force)
+        elapsed = time.monotonic() - started
+
+        if summary is None:
+            self.stdout.write(self.style.WARNING('Atualização já em andamento em outro processo'))
+            return
+
+        if not summary['refreshed'] and not summary['failed']:
+            self.stdout.write(f"Todos os {summary['fresh']} dias ainda válidos - nada a fazer")
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {len(summary['refreshed'])} dias atualizados em {elapsed:.1f}s "
+            f"({len(summary['failed'])} falhas, {summary['fresh']} ainda válidos)"
+        ))
@@ -0,0 +1,86 @@
+"""
+Índice de busca em memória sobre o snapshot da janela de partidas
+Tokens normalizados (minúsculas, sem acentos) dos nomes dos times e da liga,
+com busca por prefixo: "atl mad" encontra "Atlético Madrid"
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Set
+import logging
+import re
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Índice do snapshot atual (por processo), reconstruído quando a versão muda
+_index = None
+_index_guard = threading.Lock()
+
+
+def normalize(text: str) -> str:
+    """Minúsculas e sem acentos: 'Atlético' -> 'atletico'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(normalize(text))
+
+
+class FixtureSearchIndex:
+    """Índice invertido token -> partidas, com lookup por prefixo"""
+
+    def __init__(self, matches: List[Dict], version=None):
+        self.matches = matches
+        self.version = version
+        postings = defaultdict(set)
+        for position, match in enumerate(matches):
+            names = (match['home_team']['name'], match['away_team']['name'], match['league']['name'])
+            for name in names:
+                for token in tokenize(name):
+                    postings[token].add(position)
+        self._postings = dict(postings)
+        self._tokens = sorted(postings)
+
+    def _prefix_lookup(self, prefix: str) -> Set[int]:
+        """Partidas com algum token começando por `prefix`"""
+        found = set()
+        start = bisect_left(self._tokens, prefix)
+        for token in self._tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            found |= self._postings[token]
+        return found
+
+    def search(self, query: str) -> List[Dict]:
+        """Partidas em que todos os termos da busca casam com algum token (AND)"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        result = None
+        for term in terms:
+            positions = self._prefix_lookup(term)
+            result = positions if result is None else result & positions
+            if not result:
+                return []
+
+        # Posições preservam a ordem do snapshot (por data)
+        return [self.matches[position] for position in sorted(result)]
+
+
+def get_index(snapshot: Dict) -> FixtureSearchIndex:
+    """Índice do snapshot, reconstruído apenas quando o snapshot muda"""
+    global _index
+    index = _index
+    if index is not None and index.version == snapshot['version']:
+        return index
+
+    with _index_guard:
+        if _index is None or _index.version != snapshot['version']:
+            _index = FixtureSearchIndex(snapshot['matches'], snapshot['version'])
+            logger.info(f"Índice de busca reconstruído: {len(snapshot['matches'])} partidas")
+        return _index
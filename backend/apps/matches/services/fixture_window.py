@@ -0,0 +1,333 @@
+"""
+Janela de partidas pré-computada (snapshot)
+Cada dia da janela é um shard independente no cache, com validade própria:
+hoje é atualizado com frequência, dias distantes raramente. O comando
+refresh_fixtures atualiza apenas os shards vencidos; as views montam o
+snapshot a partir dos shards
+"""
+from django.conf import settings
+from django.core.cache import cache
+from collections import Counter
+from datetime import date as date_cls, datetime, timedelta
+from typing import Dict, List, Optional
+import logging
+import threading
+import time
+
+from .football_api import FootballAPIService
+from . import single_flight, team_history
+
+logger = logging.getLogger(__name__)
+
+SHARD_KEY_PREFIX = 'matches_api_day:'
+# Lock da janela: serializa atualizações entre o refresher e as views
+WINDOW_LOCK_KEY = 'matches_api_window'
+# Dia anterior à janela já registrado no histórico dos times
+RECORDED_DAY_KEY_PREFIX = 'team_history_recorded:'
+
+# Busca dos dias sem shard em segundo plano (no máximo uma por processo)
+_fetching_missing = False
+_fetching_guard = threading.Lock()
+
+# Contadores hit/stale/miss por shard (por processo)
+_shard_stats = {}
+_shard_stats_guard = threading.Lock()
+
+
+def window_dates() -> List[str]:
+    """Datas (YYYY-mm-dd) da janela de partidas: hoje + próximos dias"""
+    today = datetime.now()
+    return [
+        (today + timedelta(days=day_offset)).strftime('%Y-%m-%d')
+        for day_offset in range(settings.FIXTURES_WINDOW_DAYS)
+    ]
+
+
+def format_api_matches(fixtures: List[Dict]) -> List[Dict]:
+    """Formatar partidas da API para o formato do frontend"""
+    matches = []
+    for fixture in fixtures:
+        match_date = fixture['fixture']['date']
+        fixture_id = fixture['fixture']['id']  # ID real da API
+
+        matches.append({
+            'id': fixture_id,  # Usar ID real em vez de temporário
+            'api_football_id': fixture_id,  # ID para buscar dados adicionais
+            'home_team': {
+                'name': fixture['teams']['home']['name'],
+                'logo': fixture['teams']['home']['logo'],
+            },
+            'away_team': {
+                'name': fixture['teams']['away']['name'],
+                'logo': fixture['teams']['away']['logo'],
+            },
+            'league': {
+                'id': fixture['league'].get('id'),
+                'name': fixture['league']['name'],
+                'logo': fixture['league']['logo'],
+                'country': fixture['league'].get('country', ''),
+            },
+            'match_date': match_date,
+            'date': match_date,
+            'status': fixture['fixture']['status']['short'],
+            'venue': fixture['fixture'].get('venue', {}).get('name'),
+            'home_score': fixture['goals'].get('home'),
+            'away_score': fixture['goals'].get('away'),
+        })
+
+    return matches
+
+
+def shard_key(day: str) -> str:
+    return f'{SHARD_KEY_PREFIX}{day}'
+
+
+def shard_ttl(day: str) -> int:
+    """Validade (segundos) do shard de um dia: hoje/passado < próximos < distantes"""
+    ttls = settings.FIXTURES_DAY_TTL
+    offset = (date_cls.fromisoformat(day) - datetime.now().date()).days
+    if offset <= 0:
+        return ttls['today']
+    if offset <= settings.FIXTURES_NEAR_DAYS:
+        return ttls['near']
+    return ttls['far']
+
+
+def _shard_status(shard: Optional[Dict], now: float) -> str:
+    if shard is None:
+        return 'miss'
+    return 'hit' if now < shard['fresh_until'] else 'stale'
+
+
+def _record_stats(statuses: Dict[str, str]):
+    with _shard_stats_guard:
+        for day, shard_status in statuses.items():
+            _shard_stats.setdefault(day, Counter())[shard_status] += 1
+        # Descartar dias que já saíram da janela
+        for day in [d for d in _shard_stats if d not in statuses]:
+            if day < min(statuses):
+                del _shard_stats[day]
+
+
+def shard_stats() -> Dict:
+    """Contadores hit/stale/miss por shard (dia) acumulados neste processo"""
+    with _shard_stats_guard:
+        days = {day: dict(counter) for day, counter in sorted(_shard_stats.items())}
+    totals = Counter()
+    for counter in days.values():
+        totals.update(counter)
+    return {'days': days, 'totals': dict(totals)}
+
+
+def get_snapshot(record_stats: bool = True) -> Optional[Dict]:
+    """
+    Monta o snapshot da janela a partir dos shards (uma leitura get_many)
+
+    Shards vencidos são servidos normalmente (is_stale=True) até o refresher
+    atualizá-los. Retorna None se nenhum shard existir.
+    """
+    dates = window_dates()
+    shards = cache.get_many([shard_key(day) for day in dates])
+    now = time.time()
+
+    statuses = {}
+    days = []
+    unique = {}
+    for day in dates:
+        shard = shards.get(shard_key(day))
+        statuses[day] = _shard_status(shard, now)
+        day_meta = {'date': day, 'cache': statuses[day]}
+        if shard is not None:
+            day_meta.update({
+                'count': len(shard['matches']),
+                'fetched_at': shard['fetched_at'],
+                'elapsed_ms': shard['elapsed_ms'],
+            })
+            if shard.get('error'):
+                day_meta['error'] = shard['error']
+            for match in shard['matches']:
+                unique[match['id']] = match
+        days.append(day_meta)
+
+    if record_stats:
+        _record_stats(statuses)
+
+    present = [shards[shard_key(d)] for d in dates if shard_key(d) in shards]
+    if not present:
+        return None
+
+    oldest = min(shard['fetched_ts'] for shard in present)
+    matches = sorted(unique.values(), key=lambda m: m['date'])
+    return {
+        'count': len(matches),
+        'matches': matches,
+        'refreshed_at': datetime.fromtimestamp(oldest).isoformat(),
+        'refreshed_ts': oldest,
+        # Versão muda sempre que qualquer shard é regravado
+        'version': tuple(shard['fetched_ts'] for shard in present),
+        'is_stale': any(s != 'hit' for s in statuses.values()),
+        'missing_days': [d for d, s in statuses.items() if s == 'miss'],
+        'fetch_meta': {
+            'days': days,
+            'failed_days': sum(1 for d in days if d.get('error') or d['cache'] == 'miss'),
+        },
+    }
+
+
+def is_stale(snapshot: Dict) -> bool:
+    """Algum shard do snapshot está vencido ou ausente?"""
+    return snapshot['is_stale']
+
+
+def is_refreshing() -> bool:
+    """Há uma atualização da janela em andamento?"""
+    return cache.get(WINDOW_LOCK_KEY + single_flight.LOCK_SUFFIX) is not None
+
+
+def get_or_build_snapshot() -> Optional[Dict]:
+    """
+    Snapshot atual, sem chamar a API na requisição
+
+    Dias sem shard voltam ausentes (missing_days) e são buscados por uma thread
+    em segundo plano (uma por vez); dias vencidos ficam com o refresher.
+    Retorna None enquanto nenhum shard existir.
+    """
+    snapshot = get_snapshot()
+    if snapshot is None or snapshot['missing_days']:
+        _fetch_missing_in_background(snapshot['missing_days'] if snapshot else window_dates())
+    return snapshot
+
+
+def _fetch_missing_in_background(missing: List[str]):
+    global _fetching_missing
+    with _fetching_guard:
+        if _fetching_missing or is_refreshing():
+            return
+        _fetching_missing = True
+    threading.Thread(
+        target=_fetch_missing, args=(missing,), name='fixture-window', daemon=True,
+    ).start()
+
+
+def _fetch_missing(missing: List[str]):
+    global _fetching_missing
+    try:
+        with single_flight.fetch_lock(WINDOW_LOCK_KEY, settings.FIXTURES_SNAPSHOT_LOCK_TIMEOUT) as acquired:
+            if not acquired:
+                return
+            # Reler: outro processo pode ter preenchido os shards nesse meio tempo
+            current = cache.get_many([shard_key(day) for day in missing])
+            still_missing = [day for day in missing if shard_key(day) not in current]
+            if still_missing:
+                logger.info(f"Buscando {len(still_missing)} dias sem shard: {still_missing}")
+                _refresh_days(still_missing, {})
+    except Exception as e:
+        logger.error(f"Erro ao buscar os dias sem shard: {e}", exc_info=True)
+    finally:
+        with _fetching_guard:
+            _fetching_missing = False
+
+
+def refresh_stale_shards(force: bool = False) -> Optional[Dict]:
+    """
+    Atualiza apenas os shards ausentes ou vencidos (todos se force=True)
+
+    Apenas um processo atualiza por vez. Dias que falharem mantêm o shard
+    anterior (marcado com o erro) e são tentados de novo na próxima execução;
+    sem shard anterior, ficam vazios por FIXTURES_FAILED_DAY_TTL.
+
+    Returns:
+        dict: {'refreshed': [...], 'failed': [...], 'fresh': int, 'meta': {...}},
+              ou None se outra atualização já estava em andamento
+    """
+    with single_flight.fetch_lock(WINDOW_LOCK_KEY, settings.FIXTURES_SNAPSHOT_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            logger.info("Atualização da janela já em andamento - ignorando")
+            return None
+
+        dates = window_dates()
+        shards = cache.get_many([shard_key(day) for day in dates])
+        now = time.time()
+        due = [
+            day for day in dates
+            if force or _shard_status(shards.get(shard_key(day)), now) != 'hit'
+        ]
+        if not due:
+            _record_yesterday()
+            return {'refreshed': [], 'failed': [], 'fresh': len(dates), 'meta': None}
+
+        summary = _refresh_days(due, shards)
+        summary['fresh'] = len(dates) - len(due)
+        _record_yesterday()
+        return summary
+
+
+def _refresh_days(days: List[str], previous: Dict) -> Dict:
+    """Busca os dias na API e grava um shard por dia (chamar com o lock da janela)"""
+    result = FootballAPIService().get_fixtures_for_dates(days)
+    now = datetime.now()
+    to_store = {}
+    refreshed, failed = [], []
+
+    for day_meta in result['meta']['days']:
+        day = day_meta['date']
+        key = shard_key(day)
+        if day_meta['success']:
+            to_store[key] = {
+                'date': day,
+                'matches': format_api_matches(result['fixtures_by_date'][day]),
+                'fetched_at': now.isoformat(),
+                'fetched_ts': now.timestamp(),
+                'fresh_until': now.timestamp() + shard_ttl(day),
+                'elapsed_ms': day_meta['elapsed_ms'],
+                'error': None,
+            }
+            refreshed.append(day)
+        else:
+            failed.append(day)
+            # Manter os dados anteriores (servidos como vencidos) com o erro
+            if key in previous:
+                to_store[key] = {**previous[key], 'error': day_meta.get('error')}
+            else:
+                # Sem dados anteriores: shard vazio por pouco tempo, para não
+                # repetir a busca a cada requisição enquanto a API falha
+                to_store[key] = {
+                    'date': day,
+                    'matches': [],
+                    'fetched_at': now.isoformat(),
+                    'fetched_ts': now.timestamp(),
+                    'fresh_until': now.timestamp() + settings.FIXTURES_FAILED_DAY_TTL,
+                    'elapsed_ms': day_meta['elapsed_ms'],
+                    'error': day_meta.get('error'),
+                }
+
+    if to_store:
+        cache.set_many(to_store, settings.FIXTURES_SHARD_TTL)
+    logger.info(f"Shards atualizados: {len(refreshed)} dias, {len(failed)} falhas")
+
+    # Partidas que terminaram entram no histórico recente dos times
+    for day in refreshed:
+        team_history.record_finished(result['fixtures_by_date'][day])
+    return {'refreshed': refreshed, 'failed': failed, 'meta': result['meta']}
+
+
+def _record_yesterday():
+    """
+    Registra no histórico dos times as partidas de ontem (fora da janela)
+
+    Partidas que terminam depois do último refresh do dia não seriam vistas
+    por _refresh_days. Ontem é buscado a cada execução até não restar partida
+    em andamento; depois disso, não mais.
+    """
+    day = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    done_key = RECORDED_DAY_KEY_PREFIX + day
+    if cache.get(done_key):
+        return
+    result = FootballAPIService().get_fixtures_by_date(day)
+    if not result['success']:
+        logger.warning(f"⚠️ Partidas de ontem ({day}) indisponíveis - tentando na próxima execução")
+        return
+    fixtures = result['fixtures']
+    team_history.record_finished(fixtures)
+    if not any(f['fixture']['status']['short'] in team_history.IN_PLAY_STATUSES for f in fixtures):
+        cache.set(done_key, True, 2 * 24 * 3600)
@@ -3,13 +3,16 @@ Serviços de integração com APIs de futebol
 Inclui API-Football e Football-Data.org
 """
 import requests
-from requests import Session
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
+import time
+
+from django.core.cache import cache
+
+from . import http_client, single_flight
 
 logger = logging.getLogger(__name__)
 
@@ -21,18 +24,6 @@ class FootballAPIService:
         self.api_key = settings.API_FOOTBALL_KEY
         self.base_url = settings.API_FOOTBALL_URL
         self.headers = {'x-apisports-key': self.api_key}
-        # Sessão com retry/backoff para maior resiliência
-        self.session: Session = requests.Session()
-        self.session.headers.update(self.headers)
-        retry = Retry(
-            total=3,
-            backoff_factor=0.5,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["GET"],
-        )
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount('https://', adapter)
-        self.session.mount('http://', adapter)
     
     def get_fixtures_by_date(self, date: str = None) -> Dict:
         """Buscar partidas por data"""
@@ -41,10 +32,10 @@ class FootballAPIService:
         
         try:
             logger.info(f"Buscando partidas para {date}")
-            response = self.session.get(
+            response = http_client.get(
                 f'{self.base_url}/fixtures',
                 params={'date': date},
-                timeout=15
+                headers=self.headers
             )
             response.raise_for_status()
             data = response.json()
@@ -65,6 +56,58 @@ class FootballAPIService:
             logger.error(f"Erro ao buscar partidas: {e}")
             return {'success': False, 'error': 'Erro desconhecido ao buscar partidas', 'details': str(e), 'http_status': 500, 'error_code': 'UNKNOWN_ERROR'}
     
+    def get_fixtures_for_dates(self, dates: List[str], max_workers: int = None) -> Dict:
+        """
+        Buscar partidas de vários dias em paralelo (pool de threads limitado)
+
+        Cada dia continua sendo uma chamada a get_fixtures_by_date; o pool apenas
+        sobrepõe a latência de rede. Resultados são unidos e deduplicados por ID.
+        """
+        if max_workers is None:
+            max_workers = getattr(settings, 'FIXTURES_FETCH_CONCURRENCY', 5)
+        max_workers = max(1, min(int(max_workers), len(dates) or 1))
+
+        def fetch_day(day):
+            started = time.monotonic()
+            result = self.get_fixtures_by_date(day)
+            return day, result, int((time.monotonic() - started) * 1000)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fixtures') as executor:
+            outcomes = list(executor.map(fetch_day, dates))
+
+        unique = {}
+        by_date = {}
+        days = []
+        for day, result, elapsed_ms in outcomes:
+            day_meta = {'date': day, 'success': result['success'], 'elapsed_ms': elapsed_ms}
+            if result['success']:
+                day_meta['count'] = result['count']
+                by_date[day] = result['fixtures']
+                for fixture in result['fixtures']:
+                    unique[fixture['fixture']['id']] = fixture
+            else:
+                day_meta['error'] = result.get('error')
+                day_meta['error_code'] = result.get('error_code')
+            days.append(day_meta)
+
+        fixtures = sorted(unique.values(), key=lambda x: x['fixture']['date'])
+        failed_days = sum(1 for d in days if not d['success'])
+        logger.info(f"{len(dates)} dias buscados ({max_workers} em paralelo): {len(fixtures)} partidas, {failed_days} falhas")
+
+        return {
+            'success': failed_days < len(dates),
+            'count': len(fixtures),
+            'fixtures': fixtures,
+            'fixtures_by_date': by_date,  # Apenas dias com sucesso
+            'meta': {
+                'days': days,
+                'failed_days': failed_days,
+                'concurrency': max_workers,
+                'elapsed_ms': int((time.monotonic() - started) * 1000),
+            }
+        }
+
     def get_fixtures_by_league(self, league_id: int, from_date: str = None, to_date: str = None, season: int = None, next_matches: int = 50) -> Dict:
         """Buscar partidas por liga"""
         try:
@@ -84,10 +127,10 @@ class FootballAPIService:
                 params['next'] = next_matches
                 logger.info(f"Buscando próximas {next_matches} partidas da liga {league_id}")
             
-            response = self.session.get(
+            response = http_client.get(
                 f'{self.base_url}/fixtures',
                 params=params,
-                timeout=15
+                headers=self.headers
             )
             response.raise_for_status()
             data = response.json()
@@ -112,10 +155,10 @@ class FootballAPIService:
         """Buscar partidas ao vivo"""
         try:
             logger.info("Buscando partidas ao vivo")
-            response = self.session.get(
+            response = http_client.get(
                 f'{self.base_url}/fixtures',
                 params={'live': 'all'},
-                timeout=15
+                headers=self.headers
             )
             response.raise_for_status()
             data = response.json()
@@ -139,10 +182,10 @@ class FootballAPIService:
     def get_fixture_by_id(self, fixture_id: int) -> Dict:
         """Buscar detalhes de uma partida específica"""
         try:
-            response = self.session.get(
+            response = http_client.get(
                 f'{self.base_url}/fixtures',
                 params={'id': fixture_id},
-                timeout=15
+                headers=self.headers
             )
             response.raise_for_status()
             data = response.json()
@@ -164,10 +207,10 @@ class FootballAPIService:
     def get_fixture_statistics(self, fixture_id: int) -> Dict:
         """Buscar estatísticas de uma partida específica"""
         try:
-            response = self.session.get(
+            response = http_client.get(
                 f'{self.base_url}/fixtures/statistics',
                 params={'fixture': fixture_id},
-                timeout=15
+                headers=self.headers
             )
             response.raise_for_status()
             data = response.json()
@@ -189,10 +232,10 @@ class FootballAPIService:
     def get_predictions(self, fixture_id: int) -> Dict:
         """Buscar previsões e odds de uma partida"""
         try:
-            response = self.session.get(
+            response = http_client.get(
                 f'{self.base_url}/predictions',
                 params={'fixture': fixture_id},
-                timeout=15
+                headers=self.headers
             )
             response.raise_for_status()
             data = response.json()
@@ -234,19 +277,36 @@ class FootballDataService:
         }
         
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = http_client.get(url, headers=self.headers, params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Erro ao buscar partidas: {e}")
             return None
     
+    def _cached(self, path, cache_type, fetch):
+        """Resultado de `fetch()` cacheado por `path` (um único fetch por miss)"""
+        ttl = getattr(settings, 'CACHE_TTL', {}).get(cache_type, 3600)
+        key = f"football_data:{path}"
+        value = cache.get(key)
+        if value is not None:
+            return value
+        return single_flight.get_or_fetch(key, fetch, ttl)
+    
+    def get_match_details_cached(self, match_id):
+        """Detalhes de uma partida via cache (ver get_match_details)"""
+        return self._cached(f'matches/{match_id}', 'football_data_match', lambda: self.get_match_details(match_id))
+    
+    def get_h2h_cached(self, match_id):
+        """Histórico direto via cache (ver get_h2h)"""
+        return self._cached(f'matches/{match_id}/head2head', 'h2h', lambda: self.get_h2h(match_id))
+    
     def get_match_details(self, match_id):
         """Buscar detalhes de uma partida"""
         url = f"{self.BASE_URL}/matches/{match_id}"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = http_client.get(url, headers=self.headers)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -258,7 +318,7 @@ class FootballDataService:
         url = f"{self.BASE_URL}/teams/{team_id}"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = http_client.get(url, headers=self.headers)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -270,7 +330,7 @@ class FootballDataService:
         url = f"{self.BASE_URL}/matches/{match_id}/head2head"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = http_client.get(url, headers=self.headers)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -0,0 +1,149 @@
+"""
+Cliente HTTP compartilhado (um por processo) para as APIs de futebol
+Conexões keep-alive reaproveitadas entre requisições (sem novo handshake TLS
+a cada chamada), pool dimensionado por host e retry/backoff unificados.
+As retentativas ficam aqui (não no adapter do urllib3) para que cada tentativa
+passe pelo rate limiter e um 429 chegue ao rate_limiter.observe
+"""
+from django.conf import settings
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+import requests
+from urllib.parse import urlsplit
+from collections import defaultdict
+from typing import Dict
+import logging
+import threading
+import time
+
+from . import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_guard = threading.Lock()
+
+# Contadores por host (por processo)
+_stats = defaultdict(lambda: {'requests': 0, 'errors': 0, 'total_ms': 0})
+_stats_guard = threading.Lock()
+
+
+def _option(name, default):
+    return getattr(settings, 'HTTP_CLIENT', {}).get(name, default)
+
+
+# Erros transitórios do servidor: nova tentativa com backoff. 429 não entra:
+# volta ao chamador e o rate limiter bloqueia o host pelo Retry-After
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+def _build_adapter(pool_maxsize: int) -> HTTPAdapter:
+    # Sem retentativas no adapter: get() refaz cada tentativa pelo rate limiter
+    return HTTPAdapter(
+        pool_connections=_option('pool_connections', 10),
+        pool_maxsize=pool_maxsize,
+        max_retries=0,
+    )
+
+
+def _backoff(attempt: int):
+    time.sleep(_option('backoff_factor', 0.5) * (2 ** attempt))
+
+
+def get_session() -> Session:
+    """Sessão compartilhada do processo (criada na primeira chamada)"""
+    global _session
+    if _session is None:
+        with _session_guard:
+            if _session is None:
+                session = Session()
+                default_adapter = _build_adapter(_option('pool_maxsize', 10))
+                session.mount('https://', default_adapter)
+                session.mount('http://', default_adapter)
+                # Hosts com mais tráfego simultâneo ganham pool próprio
+                for host, maxsize in _option('host_pool_maxsize', {}).items():
+                    session.mount(f'https://{host}/', _build_adapter(maxsize))
+                _session = session
+    return _session
+
+
+def get(url: str, params: Dict = None, headers: Dict = None, timeout=None) -> Response:
+    """
+    GET pela sessão compartilhada
+
+    Cada serviço envia seus próprios headers de autenticação; a sessão não
+    guarda headers nem cookies de nenhuma API. Antes de cada tentativa um
+    token do host é consumido (ver rate_limiter). Erros de conexão e 5xx são
+    repetidos com backoff; a última resposta (inclusive 429) volta ao chamador.
+    """
+    host = urlsplit(url).netloc
+    retries = _option('retries', 3)
+    for attempt in range(retries + 1):
+        last_attempt = attempt == retries
+        try:
+            response = _attempt(host, url, params, headers, timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if last_attempt:
+                raise
+            _backoff(attempt)
+            continue
+        if response.status_code in RETRY_STATUSES and not last_attempt:
+            logger.warning(f"⚠️ {host} retornou {response.status_code} - nova tentativa ({attempt + 1}/{retries})")
+            _backoff(attempt)
+            continue
+        return response
+
+
+def _attempt(host: str, url: str, params: Dict, headers: Dict, timeout) -> Response:
+    """Uma requisição real: consome um token do host e observa a resposta"""
+    rate_limiter.acquire(host)
+    started = time.monotonic()
+    failed = False
+    try:
+        response = get_session().get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=timeout or _option('timeout', (5, 15)),
+        )
+        rate_limiter.observe(host, response)
+        return response
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        with _stats_guard:
+            host_stats = _stats[host]
+            host_stats['requests'] += 1
+            host_stats['total_ms'] += elapsed_ms
+            if failed:
+                host_stats['errors'] += 1
+
+
+def pool_stats() -> Dict:
+    """
+    Uso do cliente neste processo: requisições por host e estado dos pools
+
+    `connections_opened` menor que `requests` indica conexões reaproveitadas.
+    """
+    with _stats_guard:
+        hosts = {host: dict(values) for host, values in _stats.items()}
+
+    pools = {}
+    if _session is not None:
+        for adapter in {id(a): a for a in _session.adapters.values()}.values():
+            manager = adapter.poolmanager
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                pools[f'{pool.scheme}://{pool.host}'] = {
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    # A fila do urllib3 é pré-preenchida com None (vagas sem conexão)
+                    'idle_connections': sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+                    'maxsize': adapter._pool_maxsize,
+                }
+
+    return {'hosts': hosts, 'pools': pools}
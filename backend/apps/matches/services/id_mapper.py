@@ -5,9 +5,12 @@ Como as APIs usam sistemas de ID diferentes, fazemos lookup por time + data
 import logging
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.core.cache import cache
 import requests
 from difflib import SequenceMatcher
 
+from . import http_client, single_flight
+
 logger = logging.getLogger(__name__)
 
 
@@ -74,19 +77,11 @@ class APIIDMapper:
             date_from = (match_date - timedelta(days=1)).strftime('%Y-%m-%d')
             date_to = (match_date + timedelta(days=1)).strftime('%Y-%m-%d')
             
-            url = f"{self.BASE_URL}/matches"
-            params = {
-                'dateFrom': date_from,
-                'dateTo': date_to
-            }
-            
             logger.info(f"🔍 [ID Mapper] Buscando jogo: {home_team} vs {away_team} em {match_date.strftime('%Y-%m-%d')}")
             
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._matches_between(date_from, date_to)
             
-            if not data.get('matches'):
+            if not data or not data.get('matches'):
                 logger.warning(f"⚠️ [ID Mapper] Nenhum jogo encontrado no período")
                 return None
             
@@ -137,6 +132,32 @@ class APIIDMapper:
             logger.error(f"❌ [ID Mapper] Erro inesperado: {e}", exc_info=True)
             return None
     
+    def _matches_between(self, date_from, date_to):
+        """
+        Jogos da Football-Data.org no intervalo, via cache: partidas da mesma
+        rodada (ex.: análise em lote) compartilham uma única listagem
+        """
+        key = f"football_data:matches:{date_from}:{date_to}"
+        data = cache.get(key)
+        if data is not None:
+            return data
+        
+        def fetch():
+            try:
+                response = http_client.get(
+                    f"{self.BASE_URL}/matches",
+                    headers=self.headers,
+                    params={'dateFrom': date_from, 'dateTo': date_to}
+                )
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                logger.error(f"❌ [ID Mapper] Erro na requisição: {e}")
+                return None
+        
+        ttl = getattr(settings, 'CACHE_TTL', {}).get('football_data_matches', 1800)
+        return single_flight.get_or_fetch(key, fetch, ttl)
+    
     def populate_football_data_id(self, match_obj):
         """
         Popula o football_data_id num objeto Match do Django
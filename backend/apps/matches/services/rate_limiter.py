@@ -0,0 +1,176 @@
+"""
+Rate limiter (token bucket) por host, compartilhado entre workers via cache
+Consumido apenas pelo cliente HTTP antes de cada requisição real: respostas
+servidas do cache não pagam espera nenhuma. O saldo se adapta aos headers de
+cota restante devolvidos pelas APIs
+"""
+from django.conf import settings
+from django.core.cache import cache
+from typing import Dict, Optional
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY_PREFIX = 'rate_limit:'
+MUTEX_SUFFIX = ':mutex'
+MUTEX_TIMEOUT = 2  # segundos; a seção crítica é só leitura/escrita do estado
+
+# Headers de cota (requests trata nomes sem diferenciar maiúsculas)
+MINUTE_LIMIT_HEADERS = ('X-RateLimit-Limit',)
+MINUTE_REMAINING_HEADERS = ('X-RateLimit-Remaining', 'X-Requests-Available-Minute')
+DAILY_REMAINING_HEADERS = ('x-ratelimit-requests-remaining',)
+RESET_HEADERS = ('Retry-After', 'X-RequestCounter-Reset')
+
+
+def _config(host: str) -> Optional[Dict]:
+    return getattr(settings, 'RATE_LIMITS', {}).get(host)
+
+
+def _state_key(host: str) -> str:
+    return f'{STATE_KEY_PREFIX}{host}'
+
+
+def _int_header(headers, names) -> Optional[int]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(float(value))
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def _update(host: str, change) -> Dict:
+    """
+    Lê, altera e grava o estado do bucket sob um mutex curto no cache
+
+    `change(state, now)` altera o estado e devolve o valor a retornar.
+    """
+    config = _config(host)
+    key = _state_key(host)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + MUTEX_TIMEOUT
+
+    locked = cache.add(key + MUTEX_SUFFIX, token, MUTEX_TIMEOUT)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(0.01)
+        locked = cache.add(key + MUTEX_SUFFIX, token, MUTEX_TIMEOUT)
+
+    try:
+        now = time.time()
+        state = cache.get(key) or {
+            'tokens': float(config['burst']),
+            'updated': now,
+            'per_minute': config['per_minute'],
+            'blocked_until': 0,
+        }
+        # Reabastecer pelo tempo decorrido desde a última atualização
+        elapsed = max(0.0, now - state['updated'])
+        state['tokens'] = min(
+            float(config['burst']),
+            state['tokens'] + elapsed * state['per_minute'] / 60.0
+        )
+        state['updated'] = now
+        result = change(state, now)
+        cache.set(key, state, 3600)
+        return result
+    finally:
+        if locked and cache.get(key + MUTEX_SUFFIX) == token:
+            cache.delete(key + MUTEX_SUFFIX)
+
+
+def acquire(host: str, max_wait: float = None) -> float:
+    """
+    Consome um token de `host`, aguardando se o bucket estiver vazio
+
+    Hosts sem configuração em RATE_LIMITS não são limitados. Se a espera
+    passar de `max_wait`, a requisição segue mesmo assim (com aviso no log).
+
+    Returns:
+        float: Segundos aguardados (0.0 quando havia token disponível)
+    """
+    if _config(host) is None:
+        return 0.0
+
+    max_wait = settings.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+    started = time.monotonic()
+
+    def take(state, now):
+        if now >= state['blocked_until'] and state['tokens'] >= 1:
+            state['tokens'] -= 1
+            return 0.0
+        # Tempo até o próximo token (ou até o fim do bloqueio por 429)
+        refill_wait = (1 - state['tokens']) * 60.0 / state['per_minute']
+        return max(refill_wait, state['blocked_until'] - now, 0.01)
+
+    while True:
+        wait = _update(host, take)
+        waited = time.monotonic() - started
+        if wait == 0.0:
+            if waited > 0:
+                logger.info(f"⏳ Rate limit {host}: aguardou {waited:.2f}s")
+            return waited
+        if waited + wait > max_wait:
+            logger.warning(f"⚠️ Rate limit {host}: espera de {waited + wait:.1f}s excede {max_wait}s - seguindo")
+            return waited
+        time.sleep(wait)
+
+
+def observe(host: str, response) -> None:
+    """Ajusta o bucket de `host` pelos headers de cota da resposta"""
+    config = _config(host)
+    if config is None:
+        return
+
+    headers = response.headers
+    minute_limit = _int_header(headers, MINUTE_LIMIT_HEADERS)
+    minute_remaining = _int_header(headers, MINUTE_REMAINING_HEADERS)
+    daily_remaining = _int_header(headers, DAILY_REMAINING_HEADERS)
+    reset = _int_header(headers, RESET_HEADERS)
+    throttled = response.status_code == 429
+
+    if minute_remaining is None and daily_remaining is None and not throttled:
+        return
+
+    def adjust(state, now):
+        per_minute = config['per_minute']
+        # O plano contratado pode ser menor que o configurado
+        if minute_limit:
+            per_minute = min(per_minute, minute_limit)
+        # Cota diária quase no fim: reduzir para um gotejamento
+        reserve = config.get('daily_reserve')
+        if daily_remaining is not None and reserve and daily_remaining <= reserve:
+            if state['per_minute'] > 1:
+                logger.warning(f"⚠️ Cota diária de {host} baixa ({daily_remaining} restantes) - reduzindo taxa")
+            per_minute = 1
+        state['per_minute'] = max(1, per_minute)
+
+        # O servidor sabe quanto resta na janela atual: nunca gastar mais que isso
+        if minute_remaining is not None:
+            state['tokens'] = min(state['tokens'], float(minute_remaining))
+        if throttled:
+            state['tokens'] = 0.0
+            state['blocked_until'] = now + (reset or 60)
+            logger.warning(f"⚠️ {host} retornou 429 - pausando por {reset or 60}s")
+
+    _update(host, adjust)
+
+
+def bucket_stats() -> Dict:
+    """Estado atual dos buckets configurados (compartilhado entre workers)"""
+    hosts = list(getattr(settings, 'RATE_LIMITS', {}))
+    states = cache.get_many([_state_key(host) for host in hosts])
+    stats = {}
+    for host in hosts:
+        state = states.get(_state_key(host))
+        stats[host] = {
+            'configured_per_minute': _config(host)['per_minute'],
+            'burst': _config(host)['burst'],
+            'per_minute': state['per_minute'] if state else None,
+            'tokens': round(state['tokens'], 2) if state else None,
+            'blocked': bool(state and state['blocked_until'] > time.time()),
+        }
+    return stats
@@ -0,0 +1,137 @@
+"""
+Coalescência de requisições (single-flight) sobre o cache do Django
+Em um cache miss, apenas o primeiro chamador busca na origem; os demais
+aguardam o resultado dele em vez de repetir a mesma chamada à API
+"""
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from typing import Any, Callable, Optional
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+LOCK_SUFFIX = ':inflight'
+
+# Chamadas em andamento neste processo (chave -> _Call)
+_inflight = {}
+_inflight_guard = threading.Lock()
+
+
+class _Call:
+    """Busca em andamento: threads do mesmo processo aguardam o evento"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+def _option(name, default):
+    return getattr(settings, 'SINGLE_FLIGHT', {}).get(name, default)
+
+
+@contextmanager
+def fetch_lock(key: str, timeout: int = None):
+    """
+    Lock entre processos para buscar `key` na origem
+
+    Funciona entre workers quando o backend de cache é compartilhado (Redis).
+    O lock expira sozinho após `timeout` segundos caso o dono morra.
+
+    Yields:
+        bool: True se o lock foi obtido
+    """
+    lock_key = key + LOCK_SUFFIX
+    token = uuid.uuid4().hex
+    acquired = cache.add(lock_key, token, timeout or _option('lock_timeout', 30))
+    try:
+        yield acquired
+    finally:
+        # Só liberar se ainda for nosso (pode ter expirado e sido retomado)
+        if acquired and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def get_or_fetch(key: str, fetch: Callable[[], Any], ttl: int,
+                 lock_timeout: int = None, wait_timeout: float = None,
+                 fail_open: bool = True) -> Optional[Any]:
+    """
+    Retorna `key` do cache ou busca uma única vez via `fetch()`
+
+    Args:
+        key: Chave de cache (ex.: saída de APIFootballService._get_cache_key)
+        fetch: Função que busca na origem; retornar None indica falha (não cacheado)
+        ttl: Validade do valor no cache (segundos)
+        lock_timeout: Validade do lock entre processos (segundos)
+        wait_timeout: Tempo máximo aguardando outro chamador (segundos)
+        fail_open: Se o tempo de espera acabar, buscar mesmo assim (True)
+                   ou desistir e retornar None (False)
+
+    Returns:
+        Valor cacheado/buscado, ou None se a busca falhou
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    wait_timeout = wait_timeout if wait_timeout is not None else _option('wait_timeout', 20)
+
+    # 1) Coalescer threads do mesmo processo
+    with _inflight_guard:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        if call.done.wait(wait_timeout):
+            return call.value
+        return fetch() if fail_open else None
+
+    try:
+        # 2) Coalescer processos diferentes via lock no cache
+        call.value = _fetch_across_processes(key, fetch, ttl, lock_timeout, wait_timeout, fail_open)
+        return call.value
+    finally:
+        with _inflight_guard:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+def _fetch_across_processes(key, fetch, ttl, lock_timeout, wait_timeout, fail_open):
+    with fetch_lock(key, lock_timeout) as acquired:
+        if acquired:
+            # Outro processo pode ter concluído entre o miss e o lock
+            value = cache.get(key)
+            if value is None:
+                value = fetch()
+                if value is not None:
+                    cache.set(key, value, ttl)
+            return value
+
+    # Outro processo está buscando: aguardar o resultado dele
+    if not wait_for_release(key, wait_timeout):
+        logger.warning(f"Single-flight: tempo de espera esgotado para {key}")
+        return fetch() if fail_open else None
+
+    # Lock liberado sem valor no cache = a busca do outro processo falhou
+    return cache.get(key)
+
+
+def wait_for_release(key: str, timeout: float) -> bool:
+    """
+    Aguarda o dono do lock de `key` terminar a busca
+
+    Returns:
+        bool: True se o lock foi liberado dentro de `timeout` segundos
+    """
+    poll_interval = _option('poll_interval', 0.1)
+    deadline = time.monotonic() + timeout
+    while cache.get(key + LOCK_SUFFIX) is not None:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+    return True
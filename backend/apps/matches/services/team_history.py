@@ -0,0 +1,146 @@
+"""
+Histórico recente de partidas por time (time/liga/temporada) no cache
+Uma única busca last=N por time alimenta descanso, forma, Over 2.5 e BTTS;
+depois disso o histórico é estendido pelo refresh_fixtures conforme as
+partidas terminam. Como essa extensão pode perder partidas (cache por
+processo, partidas que terminam depois que o dia saiu da janela), um histórico
+buscado há mais de TEAM_HISTORY_RECHECK_SECONDS é buscado de novo
+"""
+from django.conf import settings
+from django.core.cache import cache
+from typing import Callable, Dict, List, Optional
+import logging
+import time
+
+from . import single_flight
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'team_history:'
+FINISHED_STATUSES = ('FT', 'AET', 'PEN')
+IN_PLAY_STATUSES = ('1H', 'HT', '2H', 'ET', 'BT', 'P', 'LIVE', 'INT', 'SUSP')
+
+
+def history_key(team_id, league_id, season) -> str:
+    return f'{KEY_PREFIX}{team_id}:{league_id}:{season}'
+
+
+def summarize_fixture(fixture: Dict, team_id) -> Dict:
+    """Resumo de uma partida finalizada do ponto de vista de `team_id`"""
+    goals_home = fixture['goals']['home']
+    goals_away = fixture['goals']['away']
+    is_home = fixture['teams']['home']['id'] == team_id
+    scored, conceded = (goals_home, goals_away) if is_home else (goals_away, goals_home)
+
+    if scored > conceded:
+        result = 'W'
+    elif scored < conceded:
+        result = 'L'
+    else:
+        result = 'D'
+
+    return {
+        'fixture_id': fixture['fixture']['id'],
+        'date': fixture['fixture']['date'],
+        'home_team_id': fixture['teams']['home']['id'],
+        'away_team_id': fixture['teams']['away']['id'],
+        'home_team': fixture['teams']['home']['name'],
+        'away_team': fixture['teams']['away']['name'],
+        'goals_home': goals_home,
+        'goals_away': goals_away,
+        'total_goals': goals_home + goals_away,
+        'is_home': is_home,
+        'result': result,
+        'btts': goals_home > 0 and goals_away > 0,  # Ambos marcaram
+        'over_25': goals_home + goals_away > 2.5,
+    }
+
+
+def get_or_load(team_id, league_id, season, load: Callable[[int], Optional[List[Dict]]]) -> List[Dict]:
+    """
+    Últimas partidas do time (mais recente primeiro)
+
+    Na primeira vez, `load(size)` busca as últimas `size` partidas na API;
+    chamadores simultâneos aguardam essa mesma busca. Um histórico vencido
+    (TEAM_HISTORY_RECHECK_SECONDS) é buscado de novo por um único chamador;
+    os demais, e todos se a busca falhar, usam o histórico atual.
+    """
+    key = history_key(team_id, league_id, season)
+    history = cache.get(key)
+    if history is not None and _due(history):
+        with single_flight.fetch_lock(key) as acquired:
+            if acquired:
+                fresh = _wrap(load(settings.TEAM_HISTORY_SIZE))
+                if fresh is not None:
+                    cache.set(key, fresh, settings.TEAM_HISTORY_TTL)
+                    history = fresh
+        return history['fixtures']
+
+    history = single_flight.get_or_fetch(
+        key,
+        lambda: _wrap(load(settings.TEAM_HISTORY_SIZE)),
+        settings.TEAM_HISTORY_TTL,
+    )
+    return history['fixtures'] if history else []
+
+
+def _wrap(fixtures: Optional[List[Dict]]) -> Optional[Dict]:
+    # Lista vazia também é cacheada (time sem jogos na temporada);
+    # None indica falha na busca e não é cacheado
+    if fixtures is None:
+        return None
+    return {'fixtures': _trim(fixtures), 'fetched_ts': time.time()}
+
+
+def _due(history: Dict) -> bool:
+    """Buscado na API há mais de TEAM_HISTORY_RECHECK_SECONDS?"""
+    return time.time() - history.get('fetched_ts', 0) > settings.TEAM_HISTORY_RECHECK_SECONDS
+
+
+def _trim(fixtures: List[Dict]) -> List[Dict]:
+    unique = {f['fixture_id']: f for f in fixtures}
+    ordered = sorted(unique.values(), key=lambda f: f['date'], reverse=True)
+    return ordered[:settings.TEAM_HISTORY_SIZE]
+
+
+def record_finished(fixtures: List[Dict]) -> int:
+    """
+    Acrescenta partidas finalizadas (formato bruto da API) aos históricos
+
+    Só estende históricos que já existem no cache: um histórico criado a
+    partir de uma única partida ficaria incompleto.
+
+    Returns:
+        int: Quantidade de históricos atualizados
+    """
+    updates = {}
+    for fixture in fixtures:
+        if fixture['fixture']['status']['short'] not in FINISHED_STATUSES:
+            continue
+        if fixture['goals']['home'] is None or fixture['goals']['away'] is None:
+            continue
+        league_id = fixture['league']['id']
+        season = fixture['league']['season']
+        for side in ('home', 'away'):
+            team_id = fixture['teams'][side]['id']
+            key = history_key(team_id, league_id, season)
+            updates.setdefault(key, []).append(summarize_fixture(fixture, team_id))
+
+    if not updates:
+        return 0
+
+    current = cache.get_many(list(updates))
+    to_store = {}
+    for key, finished in updates.items():
+        history = current.get(key)
+        if history is None:
+            continue
+        known = {f['fixture_id'] for f in history['fixtures']}
+        new = [f for f in finished if f['fixture_id'] not in known]
+        if new:
+            to_store[key] = {**history, 'fixtures': _trim(history['fixtures'] + new)}
+
+    if to_store:
+        cache.set_many(to_store, settings.TEAM_HISTORY_TTL)
+        logger.info(f"Histórico de times: {len(to_store)} históricos estendidos")
+    return len(to_store)
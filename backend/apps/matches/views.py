@@ -1,22 +1,41 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.reverse import reverse
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.core.cache import cache
 from datetime import timedelta, datetime
 from .models import League, Team, Match
 from .serializers import LeagueSerializer, TeamSerializer, MatchListSerializer, MatchDetailSerializer
 from .services.football_api import FootballAPIService
-from .services.id_mapper import APIIDMapper
-from apps.analysis.services.ai_analyzer import AIAnalyzer
+from .services import fixture_window, fixture_search, http_client, rate_limiter
+from apps.analysis.services import (
+    analysis_jobs, batch_analysis, circuit_breaker, model_router, prompt_builder, quick_analysis, structured_output,
+)
+from apps.analysis.services.ai_analyzer import get_analyzer
 from apps.analysis.models import Analysis
+from apps.users.services import quota
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class EventStreamRenderer(BaseRenderer):
+    """Aceita 'Accept: text/event-stream' (erros antes do streaming saem como JSON)"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder)
+
+
 class LeagueViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet para Ligas"""
     queryset = League.objects.filter(is_active=True)
@@ -182,62 +201,35 @@ class MatchViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def from_api(self, request):
-        """Buscar partidas diretamente da API-Football (próximos 14 dias) com cache"""
+        """Partidas dos próximos 14 dias a partir do snapshot pré-computado"""
         date = request.query_params.get('date', datetime.now().strftime('%Y-%m-%d'))
         force_real = request.query_params.get('force_real', 'false').lower() == 'true'
         
-        # Cache key baseado na hora atual (atualiza a cada hora)
-        cache_key = f'matches_api_{datetime.now().strftime("%Y%m%d_%H")}'
-        
-        # Tentar buscar do cache (30 minutos)
-        if not force_real:
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                logger.info(f"✅ CACHE HIT: Retornando {len(cached_data['matches'])} partidas do cache")
-                return Response(cached_data)
-        
-        logger.info(f"❌ CACHE MISS: Buscando partidas da API...")
-        football_api = FootballAPIService()
-        all_matches = []
-        
-        # Buscar apenas partidas futuras (próximos 14 dias)
-        # Plataforma de apostas: foco em jogos que ainda não ocorreram
-        logger.info("Buscando partidas futuras (próximos 14 dias)...")
+        # Os shards diários são mantidos pelo comando refresh_fixtures; aqui apenas
+        # montamos o snapshot (dias ainda sem shard são buscados em segundo plano)
+        snapshot = fixture_window.get_or_build_snapshot()
+        if snapshot is None:
+            return Response({
+                'date': date,
+                'count': 0,
+                'matches': [],
+                'is_mock': False,
+                'source': 'warming',
+                'is_stale': False,
+            })
         
-        for day_offset in range(15):
-            search_date = (datetime.now() + timedelta(days=day_offset)).strftime('%Y-%m-%d')
-            result = football_api.get_fixtures_by_date(search_date)
-            
-            if result['success'] and result['fixtures']:
-                all_matches.extend(result['fixtures'])
-                logger.info(f"{search_date}: {len(result['fixtures'])} partidas")
-        
-        # Se encontrou partidas reais, retorná-las
-        if all_matches:
-            # Remover duplicatas por ID
-            unique_matches = {m['fixture']['id']: m for m in all_matches}.values()
-            matches_list = list(unique_matches)
-            
-            # Ordenar por data
-            matches_list.sort(key=lambda x: x['fixture']['date'])
-            
-            logger.info(f"Total de {len(matches_list)} partidas únicas encontradas")
-            # Remover limite - carregar TODAS as partidas
-            matches = self._format_api_matches(matches_list)
-            
-            response_data = {
+        if snapshot and snapshot['matches']:
+            logger.info(f"✅ SNAPSHOT: Retornando {snapshot['count']} partidas (stale={snapshot['is_stale']})")
+            return Response({
                 'date': date,
-                'count': len(matches),
-                'matches': matches,
+                'count': snapshot['count'],
+                'matches': snapshot['matches'],
                 'is_mock': False,
-                'source': 'api-football'
-            }
-            
-            # Cachear resultado por 30 minutos
-            cache.set(cache_key, response_data, 60 * 30)
-            logger.info(f"Cache atualizado com {len(matches)} partidas")
-            
-            return Response(response_data)
+                'source': 'api-football',
+                'refreshed_at': snapshot['refreshed_at'],
+                'is_stale': fixture_window.is_stale(snapshot),
+                'fetch_meta': snapshot['fetch_meta'],
+            })
         
         # Se force_real está ativo, retornar erro em vez de mock
         if force_real:
@@ -260,7 +252,7 @@ class MatchViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def search(self, request):
-        """Busca inteligente de partidas - busca na API se não encontrar localmente"""
+        """Busca de partidas no índice do snapshot pré-computado (sem chamadas à API)"""
         query = request.query_params.get('q', '').strip()
         
         if not query or len(query) < 3:
@@ -271,71 +263,49 @@ class MatchViewSet(viewsets.ReadOnlyModelViewSet):
         
         logger.info(f"Busca por: {query}")
         
-        # Tentar buscar do cache primeiro
-        cache_key = f'matches_api_{datetime.now().strftime("%Y%m%d_%H")}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            matches = cached_data.get('matches', [])
-            query_lower = query.lower()
-            
-            # Busca local em cache
-            filtered = [
-                m for m in matches
-                if query_lower in m['home_team']['name'].lower()
-                or query_lower in m['away_team']['name'].lower()
-                or query_lower in m['league']['name'].lower()
-            ]
-            
-            if filtered:
-                logger.info(f"Encontradas {len(filtered)} partidas no cache")
-                return Response({
-                    'query': query,
-                    'count': len(filtered),
-                    'matches': filtered,
-                    'source': 'cache'
-                })
-        
-        # Se não encontrou no cache, buscar direto na API
-        logger.info(f"Partida não encontrada localmente, buscando na API...")
-        football_api = FootballAPIService()
-        
-        # Buscar nos próximos 14 dias por time
-        all_matches = []
-        for day_offset in range(15):
-            search_date = (datetime.now() + timedelta(days=day_offset)).strftime('%Y-%m-%d')
-            result = football_api.get_fixtures_by_date(search_date)
-            
-            if result['success'] and result['fixtures']:
-                all_matches.extend(result['fixtures'])
-        
-        if all_matches:
-            # Filtrar por query
-            query_lower = query.lower()
-            matches = self._format_api_matches(all_matches)
-            
-            filtered = [
-                m for m in matches
-                if query_lower in m['home_team']['name'].lower()
-                or query_lower in m['away_team']['name'].lower()
-                or query_lower in m['league']['name'].lower()
-            ]
-            
-            logger.info(f"Encontradas {len(filtered)} partidas na API")
+        snapshot = fixture_window.get_snapshot()
+        if not snapshot:
             return Response({
                 'query': query,
-                'count': len(filtered),
-                'matches': filtered,
-                'source': 'api-football'
+                'count': 0,
+                'matches': [],
+                'source': 'not-found'
             })
         
+        filtered = fixture_search.get_index(snapshot).search(query)
+        
+        logger.info(f"Encontradas {len(filtered)} partidas no snapshot")
         return Response({
             'query': query,
-            'count': 0,
-            'matches': [],
-            'source': 'not-found'
+            'count': len(filtered),
+            'matches': filtered,
+            'source': 'cache' if filtered else 'not-found',
+            'is_stale': fixture_window.is_stale(snapshot),
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def fixture_cache_stats(self, request):
+        """Contadores hit/stale/miss por shard diário da janela (por processo)"""
+        return Response(fixture_window.shard_stats())
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def http_client_stats(self, request):
+        """Uso do cliente HTTP compartilhado (requisições, pools e rate limit)"""
+        return Response({
+            **http_client.pool_stats(),
+            'rate_limits': rate_limiter.bucket_stats(),
         })
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def prompt_stats(self, request):
+        """Tokens estimados dos prompts de análise e seções descartadas pelo orçamento (por processo)"""
+        return Response(prompt_builder.prompt_stats())
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def ai_circuit_stats(self, request):
+        """Estado do disjuntor do Gemini (fechado/aberto/meio-aberto) e falhas na janela"""
+        return Response(circuit_breaker.state())
+
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def api_detail(self, request):
         """Detalhes de partida por ID diretamente da API-Football (sem DB)."""
@@ -366,36 +336,7 @@ class MatchViewSet(viewsets.ReadOnlyModelViewSet):
     
     def _format_api_matches(self, fixtures):
         """Formatar partidas da API para o formato do frontend"""
-        matches = []
-        for fixture in fixtures:
-            match_date = fixture['fixture']['date']
-            fixture_id = fixture['fixture']['id']  # ID real da API
-            
-            matches.append({
-                'id': fixture_id,  # Usar ID real em vez de temporário
-                'api_football_id': fixture_id,  # ID para buscar dados adicionais
-                'home_team': {
-                    'name': fixture['teams']['home']['name'],
-                    'logo': fixture['teams']['home']['logo'],
-                },
-                'away_team': {
-                    'name': fixture['teams']['away']['name'],
-                    'logo': fixture['teams']['away']['logo'],
-                },
-                'league': {
-                    'name': fixture['league']['name'],
-                    'logo': fixture['league']['logo'],
-                    'country': fixture['league'].get('country', ''),
-                },
-                'match_date': match_date,
-                'date': match_date,
-                'status': fixture['fixture']['status']['short'],
-                'venue': fixture['fixture'].get('venue', {}).get('name'),
-                'home_score': fixture['goals'].get('home'),
-                'away_score': fixture['goals'].get('away'),
-            })
-        
-        return matches
+        return fixture_window.format_api_matches(fixtures)
     
     @action(detail=True, methods=['post'])
     def analyze(self, request, pk=None):
@@ -403,7 +344,7 @@ class MatchViewSet(viewsets.ReadOnlyModelViewSet):
         match = self.get_object()
         
         # Verificar se usuário pode analisar
-        if not request.user.can_analyze():
+        if not quota.can_analyze(request.user):
             return Response(
                 {'error': 'Limite diário de análises atingido. Faça upgrade para Premium!'},
                 status=status.HTTP_403_FORBIDDEN
@@ -418,8 +359,8 @@ class MatchViewSet(viewsets.ReadOnlyModelViewSet):
         }
         
         # Gerar análise com IA
-        analyzer = AIAnalyzer()
-        result = analyzer.analyze_match(match_data)
+        analyzer = get_analyzer()
+        result = analyzer.analyze_match(match_data, model_router.tier_for_user(request.user))
         
         if not result['success']:
             return Response(
@@ -427,41 +368,32 @@ class MatchViewSet(viewsets.ReadOnlyModelViewSet):
                 status=result.get('http_status', status.HTTP_500_INTERNAL_SERVER_ERROR)
             )
         
-        # Criar e salvar análise no banco de dados
+        # Consumir a cota (atômico: pedidos simultâneos não passam do limite) e
+        # salvar a análise na mesma transação: se salvar falhar, a cota volta
+        analysis = None
         try:
-            # Heurística simples para probabilidades e xG quando IA não fornece estruturado
-            home_p, draw_p, away_p = 40.0, 30.0, 30.0
-            home_xg, away_xg = 1.5, 1.3
-            prediction = 'home'
-            confidence = int(result.get('confidence', 3) or 3)
-            reasoning = result.get('analysis') or 'Análise gerada pela IA.'
-            key_factors = ['Mando de campo', 'Forma recente']
-
-            analysis = Analysis.objects.create(
-                user=request.user,
-                match=match,
-                prediction=prediction,
-                confidence=confidence,
-                home_probability=home_p,
-                draw_probability=draw_p,
-                away_probability=away_p,
-                home_xg=home_xg,
-                away_xg=away_xg,
-                reasoning=reasoning,
-                key_factors=key_factors,
-                analysis_data={'source': 'ai', 'fallback': True}
-            )
-        except Exception:
+            with transaction.atomic():
+                if not quota.consume(request.user):
+                    return Response(
+                        {'error': 'Limite diário de análises atingido. Faça upgrade para Premium!'},
+                        status=status.HTTP_403_FORBIDDEN
+                    )
+                analysis = Analysis.objects.create(
+                    user=request.user,
+                    match=match,
+                    **structured_output.analysis_fields(result)
+                )
+        except Exception as e:
             # Mesmo que salvar falhe, ainda retornamos a análise textual
-            analysis = None
-        
-        # Incrementar contador de análises do usuário
-        request.user.increment_analysis_count()
+            logger.error(f"❌ Erro ao salvar análise da partida {match.id}: {e}", exc_info=True)
+            request.user.refresh_from_db(fields=quota.COUNTER_FIELDS)
         
         payload = {
             'analysis': result['analysis'],
             'confidence': result['confidence'],
-            'remaining_analyses': request.user.get_remaining_analyses()
+            'structured': result.get('structured'),
+            'cached': result.get('cached', False),
+            'remaining_analyses': quota.remaining(request.user)
         }
         if analysis:
             payload['saved'] = True
@@ -484,285 +416,140 @@ class MatchViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        match_data = {
-            'home_team': {'name': home_team},
-            'away_team': {'name': away_team},
-            'league': request.data.get('league', 'Liga desconhecida'),
-            'date': request.data.get('date'),
-            'status': request.data.get('status'),
-            'venue': request.data.get('venue'),
-            'home_score': request.data.get('home_score'),
-            'away_score': request.data.get('away_score'),
-            'api_id': request.data.get('api_id')  # Adicionar para o enricher
-        }
+        outcome = quick_analysis.run(request.data, tier=model_router.tier_for_user(request.user))
+        result = outcome['result']
         
-        # Buscar dados enriquecidos das APIs se api_id fornecido
-        api_id = request.data.get('api_id')
-        football_data_id = request.data.get('football_data_id')  # ID da Football-Data.org
+        if not result['success']:
+            return Response(
+                {'error': result.get('error'), 'details': result.get('details'), 'code': result.get('error_code')},
+                status=result.get('http_status', status.HTTP_500_INTERNAL_SERVER_ERROR)
+            )
         
-        # 🆕 MAPEAR FOOTBALL_DATA_ID automaticamente se não fornecido
-        if api_id and not football_data_id:
-            logger.info(f"🔍 [ID Mapper] Tentando mapear football_data_id para {match_data.get('home_team')} vs {match_data.get('away_team')}")
-            try:
-                mapper = APIIDMapper()
-                match_date_str = match_data.get('date')
-                if match_date_str:
-                    # Converter string para datetime
-                    if isinstance(match_date_str, str):
-                        match_date = datetime.fromisoformat(match_date_str.replace('Z', '+00:00'))
-                    else:
-                        match_date = match_date_str
-                    
-                    football_data_id = mapper.find_football_data_id(
-                        home_team=match_data.get('home_team'),
-                        away_team=match_data.get('away_team'),
-                        match_date=match_date
-                    )
-                    
-                    if football_data_id:
-                        logger.info(f"✅ [ID Mapper] football_data_id={football_data_id} mapeado com sucesso!")
-                        match_data['football_data_id'] = football_data_id
-                    else:
-                        logger.warning(f"⚠️ [ID Mapper] Não foi possível mapear football_data_id")
-            except Exception as e:
-                logger.error(f"❌ [ID Mapper] Erro ao mapear ID: {e}", exc_info=True)
+        payload = quick_analysis.build_payload(outcome['match_data'], result, outcome['football_data_id'])
+        # Opcional: salvar no histórico se usuário autenticado e houver match mapeado
+        saved, saved_info = quick_analysis.save_to_history(request.user, request.data, result)
+
+        return Response({
+            **payload,
+            'saved': saved,
+            'saved_analysis': saved_info
+        })
+    
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny],
+            renderer_classes=[JSONRenderer, EventStreamRenderer])
+    def quick_analyze_stream(self, request):
+        """
+        quick_analyze com a análise enviada em partes (Server-Sent Events)
+        
+        Eventos: 'stage' (enriching/generating), 'chunk' (trecho do texto assim que
+        o Gemini o gera) e, no final, 'done' (mesmo payload do quick_analyze, sem
+        o texto) ou 'error'
+        """
+        if not request.data.get('home_team') or not request.data.get('away_team'):
+            return Response(
+                {'error': 'home_team e away_team são obrigatórios'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # 🔥 NOVO: Enriquecer dados se api_id fornecido
-        if api_id:
-            logger.info(f"\n{'='*80}")
-            logger.info(f"🚀 ENRIQUECIMENTO DE DADOS ATIVADO - API ID: {api_id}")
-            logger.info(f"{'='*80}\n")
-            
-            try:
-                from apps.analysis.services.match_enricher import MatchDataEnricher
-                enricher = MatchDataEnricher()
-                match_data = enricher.enrich(match_data)
-                
-                logger.info(f"✅ Dados enriquecidos com sucesso!")
-                logger.info(f"   Campos adicionados: {list(match_data.keys())}")
-            except Exception as e:
-                logger.error(f"❌ Erro ao enriquecer dados: {str(e)}")
-                logger.exception(e)
+        data = request.data.dict() if hasattr(request.data, 'dict') else dict(request.data)
+        user = request.user
         
-        # Continuar com busca normal de dados adicionais (compatibilidade)
-        if api_id:
-            logger.info(f"🔍 QUICK_ANALYZE: Buscando dados adicionais para api_id={api_id}")
+        def events():
             try:
-                from .services.football_api import FootballAPIService, FootballDataService
-                api_service = FootballAPIService()
-                
-                # ===== API-FOOTBALL (RapidAPI) =====
-                # Buscar detalhes da partida
-                logger.info(f"📥 [API-Football] Buscando fixture_details...")
-                fixture_result = api_service.get_fixture_by_id(api_id)
-                if fixture_result.get('success') and fixture_result.get('fixture'):
-                    fixture = fixture_result['fixture']
-                    match_data['fixture_details'] = fixture
-                    logger.info(f"✅ [API-Football] Fixture carregado: {list(fixture.keys())[:5]}")
-                else:
-                    logger.warning(f"❌ [API-Football] Fixture falhou: {fixture_result.get('error')}")
-                
-                # Buscar estatísticas da partida (para jogos ao vivo/finalizados)
-                logger.info(f"📥 [API-Football] Buscando statistics...")
-                stats_result = api_service.get_fixture_statistics(api_id)
-                if stats_result.get('success') and stats_result.get('statistics'):
-                    match_data['statistics'] = stats_result['statistics']
-                    logger.info(f"✅ [API-Football] Statistics carregadas: {len(stats_result['statistics'])} times")
-                else:
-                    logger.warning(f"❌ [API-Football] Statistics falhou: {stats_result.get('error')}")
-                
-                # Buscar previsões/estatísticas
-                logger.info(f"📥 [API-Football] Buscando predictions...")
-                predictions_result = api_service.get_predictions(api_id)
-                if predictions_result.get('success') and predictions_result.get('predictions'):
-                    match_data['predictions'] = predictions_result['predictions']
-                    logger.info(f"✅ [API-Football] Predictions carregadas: {list(predictions_result['predictions'].keys())[:5]}")
-                else:
-                    logger.warning(f"❌ [API-Football] Predictions falhou: {predictions_result.get('error')}")
-                
-                # ===== FOOTBALL-DATA.ORG =====
-                # Buscar dados adicionais da Football-Data.org (H2H e estatísticas dos times)
-                if football_data_id:
-                    logger.info(f"📥 [Football-Data.org] Buscando dados adicionais para football_data_id={football_data_id}...")
-                    try:
-                        fd_service = FootballDataService()
-                        
-                        # Buscar H2H (histórico direto)
-                        logger.info(f"📥 [Football-Data.org] Buscando H2H...")
-                        h2h_data = fd_service.get_h2h(football_data_id)
-                        if h2h_data and 'matches' in h2h_data:
-                            match_data['h2h'] = h2h_data['matches']
-                            logger.info(f"✅ [Football-Data.org] H2H carregado: {len(h2h_data['matches'])} jogos anteriores")
-                        else:
-                            logger.warning(f"❌ [Football-Data.org] H2H não disponível")
-                        
-                        # Buscar detalhes da partida (pode ter estatísticas adicionais)
-                        logger.info(f"📥 [Football-Data.org] Buscando match details...")
-                        match_details = fd_service.get_match_details(football_data_id)
-                        if match_details:
-                            match_data['football_data_match'] = match_details
-                            logger.info(f"✅ [Football-Data.org] Match details carregados")
-                        else:
-                            logger.warning(f"❌ [Football-Data.org] Match details não disponível")
-                            
-                    except Exception as e:
-                        logger.warning(f"⚠️ [Football-Data.org] Erro ao buscar dados: {e}")
-                else:
-                    logger.info(f"ℹ️ [Football-Data.org] Sem football_data_id - pulando")
-                    
-                logger.info(f"📊 TOTAL de dados enriquecidos: fixture={bool(match_data.get('fixture_details'))}, stats={bool(match_data.get('statistics'))}, predictions={bool(match_data.get('predictions'))}, h2h={bool(match_data.get('h2h'))}, fd_match={bool(match_data.get('football_data_match'))}")
+                for event, payload in quick_analysis.stream_events(data, user):
+                    yield f"event: {event}\ndata: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n"
             except Exception as e:
-                logger.error(f"❌ ERRO ao buscar dados adicionais das APIs: {e}", exc_info=True)
-        
-        analyzer = AIAnalyzer()
-        result = analyzer.analyze_match(match_data)
+                logger.error(f"❌ Erro na análise em streaming: {e}", exc_info=True)
+                error = {'error': 'Falha ao gerar a análise. Tente novamente mais tarde.', 'details': str(e)}
+                yield f"event: error\ndata: {json.dumps(error)}\n\n"
+        
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Nginx: repassar cada trecho sem bufferizar
+        return response
+    
+    @action(detail=False, methods=['post'])
+    def batch_analyze(self, request):
+        """
+        Analisa um cupom de partidas de uma vez
+        
+        Body: {"fixture_ids": [ids da API-Football]} (até BATCH_ANALYSIS_MAX_MATCHES).
+        Enriquecimentos compartilham o cache e as análises são agrupadas em menos
+        chamadas ao Gemini; cada partida traz o próprio sucesso ou erro. Cada
+        análise entregue consome a cota diária; sem cota, nada é gerado.
+        """
+        fixture_ids = request.data.get('fixture_ids')
+        if not isinstance(fixture_ids, list) or not fixture_ids:
+            return Response(
+                {'error': 'fixture_ids deve ser uma lista de ids de partidas'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            fixture_ids = [int(fixture_id) for fixture_id in fixture_ids]
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'fixture_ids deve conter apenas ids numéricos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_matches = settings.BATCH_ANALYSIS_MAX_MATCHES
+        if len(set(fixture_ids)) > max_matches:
+            return Response(
+                {'error': f'Máximo de {max_matches} partidas por lote'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if not result['success']:
+        if not quota.can_analyze(request.user):
             return Response(
-                {'error': result.get('error'), 'details': result.get('details'), 'code': result.get('error_code')},
-                status=result.get('http_status', status.HTTP_500_INTERNAL_SERVER_ERROR)
+                {'error': 'Limite diário de análises atingido. Faça upgrade para Premium!'},
+                status=status.HTTP_403_FORBIDDEN
             )
         
-        # Criar metadados sobre quais dados foram analisados
-        metadata = {
-            'has_predictions': bool(match_data.get('predictions')),
-            'has_statistics': bool(match_data.get('statistics')),
-            'has_h2h': bool(match_data.get('h2h')),
-            'h2h_count': len(match_data.get('h2h', [])) if match_data.get('h2h') else 0,
-            'has_fixture_details': bool(match_data.get('fixture_details')),
-            'has_football_data': bool(match_data.get('football_data_match'))
-        }
+        result = batch_analysis.analyze(fixture_ids, model_router.tier_for_user(request.user), request.user)
+        result['remaining_analyses'] = quota.remaining(request.user)
+        return Response(result)
+    
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    def quick_analyze_async(self, request):
+        """
+        quick_analyze em segundo plano (Celery): devolve o id do job imediatamente
+        
+        O progresso (queued, enriching, generating, done/failed) e o resultado final
+        ficam em GET /matches/analysis_jobs/<job_id>/
+        """
+        if not request.data.get('home_team') or not request.data.get('away_team'):
+            return Response(
+                {'error': 'home_team e away_team são obrigatórios'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # 🔥 Extrair dados enriquecidos para enviar ao frontend
-        enriched_data = {
-            'table_context': match_data.get('table_context'),
-            'injuries': match_data.get('injuries'),
-            'odds': match_data.get('odds'),
-            'home_stats': match_data.get('home_stats'),
-            'away_stats': match_data.get('away_stats'),
-            'rest_context': match_data.get('rest_context'),
-            'motivation': match_data.get('motivation'),
-            'trends': match_data.get('trends'),
-            'season_context': match_data.get('season_context'),
-            'fixture_details': match_data.get('fixture_details'),
-            'h2h': match_data.get('h2h'),  # 🆕 Histórico direto (Football-Data.org)
-            'football_data_id': football_data_id,  # 🆕 ID mapeado
-            'football_data_match': match_data.get('football_data_match')  # 🆕 Detalhes do Football-Data.org
-        }
+        from apps.analysis.tasks import run_quick_analysis_job
         
-        # Opcional: salvar no histórico se usuário autenticado e houver match mapeado
-        saved = False
-        saved_info = None
+        data = request.data.dict() if hasattr(request.data, 'dict') else dict(request.data)
+        user_id = request.user.id if request.user.is_authenticated else None
+        job = analysis_jobs.create(user_id)
         try:
-            if request.user.is_authenticated and request.data.get('save_to_history'):
-                api_id_val = request.data.get('api_id')
-                if api_id_val:
-                    # Tentar mapear para uma partida existente no banco
-                    db_match = Match.objects.filter(api_football_id=api_id_val).first()
-                    if db_match:
-                        # Evitar duplicar análises
-                        existing = Analysis.objects.filter(user=request.user, match=db_match).first()
-                        if not existing:
-                            # Checar limite diário
-                            if request.user.can_analyze():
-                                home_p, draw_p, away_p = 40.0, 30.0, 30.0
-                                home_xg, away_xg = 1.5, 1.3
-                                prediction = 'home'
-                                confidence = int(result.get('confidence', 3) or 3)
-                                reasoning = result.get('analysis') or 'Análise gerada pela IA.'
-                                key_factors = ['Mando de campo', 'Forma recente']
-                                saved_analysis = Analysis.objects.create(
-                                    user=request.user,
-                                    match=db_match,
-                                    prediction=prediction,
-                                    confidence=confidence,
-                                    home_probability=home_p,
-                                    draw_probability=draw_p,
-                                    away_probability=away_p,
-                                    home_xg=home_xg,
-                                    away_xg=away_xg,
-                                    reasoning=reasoning,
-                                    key_factors=key_factors,
-                                    analysis_data={'source': 'ai', 'fallback': True}
-                                )
-                                request.user.increment_analysis_count()
-                                saved = True
-                                saved_info = {'id': saved_analysis.id, 'created_at': saved_analysis.created_at}
-                    else:
-                        # Criar um registro mínimo da partida e salvar análise
-                        if request.user.can_analyze():
-                            from django.utils import timezone
-                            league_name = request.data.get('league') or 'Liga Desconhecida'
-                            home_name = request.data.get('home_team') or 'Time Casa'
-                            away_name = request.data.get('away_team') or 'Time Visitante'
-                            match_date_str = request.data.get('date')
-                            try:
-                                match_date = datetime.fromisoformat(str(match_date_str).replace('Z', '+00:00')) if match_date_str else timezone.now()
-                            except Exception:
-                                match_date = timezone.now()
-
-                            league_obj, _ = League.objects.get_or_create(
-                                name=league_name,
-                                defaults={
-                                    'country': '',
-                                    'logo': '',
-                                    'is_active': True,
-                                }
-                            )
-                            home_team_obj, _ = Team.objects.get_or_create(
-                                name=home_name,
-                                defaults={'country': '', 'logo': ''}
-                            )
-                            away_team_obj, _ = Team.objects.get_or_create(
-                                name=away_name,
-                                defaults={'country': '', 'logo': ''}
-                            )
-
-                            db_match = Match.objects.create(
-                                league=league_obj,
-                                home_team=home_team_obj,
-                                away_team=away_team_obj,
-                                match_date=match_date,
-                                status=request.data.get('status') or 'scheduled',
-                                api_football_id=api_id_val,
-                                football_data_id=request.data.get('football_data_id') or None,
-                                is_analysis_available=True,
-                            )
-
-                            home_p, draw_p, away_p = 40.0, 30.0, 30.0
-                            home_xg, away_xg = 1.5, 1.3
-                            prediction = 'home'
-                            confidence = int(result.get('confidence', 3) or 3)
-                            reasoning = result.get('analysis') or 'Análise gerada pela IA.'
-                            key_factors = ['Mando de campo', 'Forma recente']
-                            saved_analysis = Analysis.objects.create(
-                                user=request.user,
-                                match=db_match,
-                                prediction=prediction,
-                                confidence=confidence,
-                                home_probability=home_p,
-                                draw_probability=draw_p,
-                                away_probability=away_p,
-                                home_xg=home_xg,
-                                away_xg=away_xg,
-                                reasoning=reasoning,
-                                key_factors=key_factors,
-                                analysis_data={'source': 'ai', 'fallback': True}
-                            )
-                            request.user.increment_analysis_count()
-                            saved = True
-                            saved_info = {'id': saved_analysis.id, 'created_at': saved_analysis.created_at}
-        except Exception:
-            # Ignorar erros de persistência silenciosamente para não quebrar preview
-            saved = False
-            saved_info = None
-
+            run_quick_analysis_job.delay(job['id'], data, user_id)
+        except Exception as e:
+            logger.error(f"❌ Não foi possível enfileirar a análise: {e}", exc_info=True)
+            analysis_jobs.update(job['id'], analysis_jobs.FAILED, error={'error': 'Fila de análises indisponível'})
+            return Response(
+                {'error': 'Fila de análises indisponível. Tente a análise direta.', 'code': 'QUEUE_UNAVAILABLE'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
         return Response({
-            'analysis': result['analysis'],
-            'confidence': result['confidence'],
-            'metadata': metadata,
-            'enriched_data': enriched_data,  # 🔥 ADICIONADO!
-            'saved': saved,
-            'saved_analysis': saved_info
-        })
+            'job_id': job['id'],
+            'status': job['status'],
+            'status_url': reverse('match-analysis-job', kwargs={'job_id': job['id']}, request=request),
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny],
+            url_path=r'analysis_jobs/(?P<job_id>[0-9a-f]{32})', url_name='analysis-job')
+    def analysis_job(self, request, job_id=None):
+        """Etapa atual do job de análise e, ao concluir, o mesmo payload do quick_analyze"""
+        job = analysis_jobs.get(job_id)
+        # Jobs de usuários autenticados só são visíveis para o próprio usuário
+        if job is None or (job['user_id'] and job['user_id'] != request.user.id):
+            return Response({'error': 'Job não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(analysis_jobs.public(job))
 
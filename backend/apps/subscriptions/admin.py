@@ -1,4 +1,5 @@
 from django.contrib import admin
+from . import entitlements
 from .models import Subscription, Payment
 
 
@@ -39,6 +40,8 @@ class SubscriptionAdmin(admin.ModelAdmin):
     def activate_subscriptions(self, request, queryset):
         """Ação para ativar assinaturas"""
         queryset.update(status='active')
+        # update() não dispara signals: invalidar os direitos em cache
+        entitlements.invalidate_many(queryset.values_list('user_id', flat=True))
         self.message_user(request, f"{queryset.count()} assinatura(s) ativada(s).")
     activate_subscriptions.short_description = "Ativar assinaturas selecionadas"
 
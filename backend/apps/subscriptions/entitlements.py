@@ -0,0 +1,122 @@
+"""
+Direitos efetivos do usuário (plano, limite diário, nível de IA e validade)
+Calculados uma vez a partir da assinatura ativa (ou premium legado/freemium),
+guardados no cache por ENTITLEMENT_CACHE_SECONDS (nunca além do vencimento) e
+no próprio objeto do usuário durante a requisição. Os signals de Subscription e
+Payment (signals.py) invalidam o cache do usuário
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from typing import Dict
+
+from .plan_config import get_plan, get_plan_ai_tier, get_plan_limit
+
+KEY_PREFIX = 'entitlement:'
+# Atributo do objeto User com os direitos já resolvidos nesta requisição
+MEMO_ATTR = '_entitlement'
+
+SOURCE_SUBSCRIPTION = 'subscription'
+SOURCE_LEGACY_PREMIUM = 'legacy_premium'
+SOURCE_FREEMIUM = 'freemium'
+
+
+def _compute(user) -> Dict:
+    active = user.subscriptions.filter(
+        status='active', end_date__gt=timezone.now()
+    ).order_by('-end_date').first()
+    if active:
+        slug = active.plan_slug or active.plan
+        if get_plan(slug) is not None:
+            daily_limit, ai_tier = get_plan_limit(slug), get_plan_ai_tier(slug)
+        else:
+            # Planos antigos (monthly/quarterly/yearly) não estão em PLANS:
+            # mantêm os direitos do premium de antes dos planos configuráveis
+            daily_limit, ai_tier = settings.PREMIUM_ANALYSIS_LIMIT, 'deep'
+        return {
+            'source': SOURCE_SUBSCRIPTION,
+            'subscription_id': active.pk,
+            'plan_slug': slug,
+            'is_premium': True,
+            'daily_limit': daily_limit,
+            'ai_tier': ai_tier,
+            'expires_at': active.end_date,
+        }
+    if user.is_premium_active():
+        return {
+            'source': SOURCE_LEGACY_PREMIUM,
+            'subscription_id': None,
+            'plan_slug': None,
+            'is_premium': True,
+            'daily_limit': settings.PREMIUM_ANALYSIS_LIMIT,
+            'ai_tier': 'deep',
+            'expires_at': user.premium_until,
+        }
+    return {
+        'source': SOURCE_FREEMIUM,
+        'subscription_id': None,
+        'plan_slug': 'freemium',
+        'is_premium': False,
+        'daily_limit': get_plan_limit('freemium'),
+        'ai_tier': get_plan_ai_tier('freemium'),
+        'expires_at': None,
+    }
+
+
+def _expired(entitlement: Dict) -> bool:
+    expires_at = entitlement['expires_at']
+    return expires_at is not None and expires_at <= timezone.now()
+
+
+def resolve(user, refresh: bool = False) -> Dict:
+    """
+    Direitos efetivos do usuário
+
+    Returns:
+        dict: {'source': 'subscription'|'legacy_premium'|'freemium',
+               'subscription_id', 'plan_slug', 'is_premium', 'daily_limit',
+               'ai_tier', 'expires_at'}
+    """
+    if not refresh:
+        entitlement = getattr(user, MEMO_ATTR, None)
+        if entitlement is None:
+            entitlement = cache.get(KEY_PREFIX + str(user.pk))
+        if entitlement is not None and not _expired(entitlement):
+            setattr(user, MEMO_ATTR, entitlement)
+            return entitlement
+
+    entitlement = _compute(user)
+    ttl = settings.ENTITLEMENT_CACHE_SECONDS
+    if entitlement['expires_at'] is not None:
+        # Vencimento antes do TTL: recalcular na hora certa
+        ttl = max(1, min(ttl, int((entitlement['expires_at'] - timezone.now()).total_seconds())))
+    cache.set(KEY_PREFIX + str(user.pk), entitlement, ttl)
+    setattr(user, MEMO_ATTR, entitlement)
+    return entitlement
+
+
+def active_subscription(user):
+    """Assinatura ativa do usuário (None em freemium/premium legado, sem consulta)"""
+    from .models import Subscription
+    subscription_id = resolve(user)['subscription_id']
+    if subscription_id is None:
+        return None
+    subscription = Subscription.objects.filter(pk=subscription_id).first()
+    if subscription is None or not subscription.is_active():
+        # Cache desatualizado (alteração sem signal): recalcular
+        subscription_id = resolve(user, refresh=True)['subscription_id']
+        subscription = Subscription.objects.filter(pk=subscription_id).first() if subscription_id else None
+    return subscription
+
+
+def invalidate(user):
+    """Descarta os direitos em cache (aceita o usuário ou o id)"""
+    user_id = getattr(user, 'pk', user)
+    cache.delete(KEY_PREFIX + str(user_id))
+    if hasattr(user, 'pk'):
+        user.__dict__.pop(MEMO_ATTR, None)
+
+
+def invalidate_many(user_ids):
+    """Descarta os direitos em cache de vários usuários (atualizações em massa)"""
+    cache.delete_many([KEY_PREFIX + str(user_id) for user_id in set(user_ids)])
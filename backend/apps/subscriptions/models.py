@@ -83,11 +83,12 @@ class Subscription(models.Model):
     
     def update_user_premium_status(self):
         """Atualiza status premium do usuário baseado nas assinaturas ativas."""
-        # Encontrar qualquer assinatura ativa atual do usuário
-        active = self.user.subscriptions.filter(status='active', end_date__gt=timezone.now()).order_by('-end_date').first()
-        if active:
+        # Direitos recalculados a partir das assinaturas ativas atuais do usuário
+        from .entitlements import SOURCE_SUBSCRIPTION, invalidate, resolve
+        entitlement = resolve(self.user, refresh=True)
+        if entitlement['source'] == SOURCE_SUBSCRIPTION:
             self.user.is_premium = True
-            self.user.premium_until = active.end_date
+            self.user.premium_until = entitlement['expires_at']
         else:
             self.user.is_premium = False
             self.user.premium_until = None
@@ -95,6 +96,8 @@ class Subscription(models.Model):
             self.user.save(update_fields=['is_premium', 'premium_until'])
         except Exception:
             self.user.save()
+        # A flag premium legado mudou: os direitos em cache não valem mais
+        invalidate(self.user)
     
     def is_active(self):
         """Verifica se assinatura está ativa"""
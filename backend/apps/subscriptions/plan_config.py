@@ -7,6 +7,7 @@ PLANS = {
     'freemium': {
         'name': 'Freemium',
         'slug': 'freemium',
+        'ai_tier': 'fast',  # Nível de modelo do Gemini (apps.analysis.services.model_router)
         'price': 0,
         'daily_analysis_limit': 3,
         'duration_days': None,  # Permanente
@@ -23,6 +24,7 @@ PLANS = {
     'teste': {
         'name': 'Teste (1 MZN)',
         'slug': 'teste',
+        'ai_tier': 'fast',
         'price': 1,
         'daily_analysis_limit': 3,
         'duration_days': 1,  # 1 dia apenas
@@ -40,6 +42,7 @@ PLANS = {
     'starter': {
         'name': 'Starter',
         'slug': 'starter',
+        'ai_tier': 'fast',
         'price': 299,
         'daily_analysis_limit': 15,
         'duration_days': 30,
@@ -59,6 +62,7 @@ PLANS = {
     'pro': {
         'name': 'Pro',
         'slug': 'pro',
+        'ai_tier': 'deep',
         'price': 599,
         'daily_analysis_limit': 40,
         'duration_days': 30,
@@ -78,6 +82,7 @@ PLANS = {
     'vip': {
         'name': 'VIP',
         'slug': 'vip',
+        'ai_tier': 'deep',
         'price': 1499,
         'daily_analysis_limit': 80,
         'duration_days': 90,
@@ -121,6 +126,12 @@ def get_plan_limit(slug):
     return plan['daily_analysis_limit'] if plan else 5  # Default freemium
 
 
+def get_plan_ai_tier(slug):
+    """Retorna o nível de modelo de IA de um plano ('fast' ou 'deep')"""
+    plan = get_plan(slug)
+    return plan.get('ai_tier', 'fast') if plan else 'fast'
+
+
 def get_plan_price(slug):
     """Retorna o preço de um plano"""
     plan = get_plan(slug)
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.throttling import ScopedRateThrottle
+from . import entitlements
 from .plan_config import get_active_plans, get_premium_plans, get_plan
 from .serializers import PlanSerializer, SubscriptionSerializer
 from .models import Subscription
@@ -49,7 +50,7 @@ def admin_assign_subscription(request):
     # Se o destino for freemium, apenas cancelar e retornar stub
     if plan_slug == 'freemium':
         with transaction.atomic():
-            current = user.subscriptions.filter(status='active', end_date__gt=timezone.now()).first()
+            current = entitlements.active_subscription(user)
             if current:
                 current.cancel()
         # Retornar um stub compatível com frontend
@@ -74,7 +75,7 @@ def admin_assign_subscription(request):
 
     # Para planos pagos, criar assinatura com end_date explícita
     with transaction.atomic():
-        current = user.subscriptions.filter(status='active', end_date__gt=timezone.now()).first()
+        current = entitlements.active_subscription(user)
         if current:
             current.cancel()
 
@@ -129,7 +130,7 @@ def admin_remove_subscription(request):
     except User.DoesNotExist:
         return Response({'error': 'Usuário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
-    current = user.subscriptions.filter(status='active', end_date__gt=timezone.now()).first()
+    current = entitlements.active_subscription(user)
     if not current:
         return Response({'message': 'Usuário não possui assinatura ativa'}, status=status.HTTP_200_OK)
 
@@ -223,12 +224,7 @@ def my_subscription(request):
     """
     Retorna assinatura ativa do usuário atual
     """
-    from django.utils import timezone
-    
-    subscription = request.user.subscriptions.filter(
-        status='active',
-        end_date__gt=timezone.now()
-    ).first()
+    subscription = entitlements.active_subscription(request.user)
     
     if not subscription:
         # Usuário sem assinatura = freemium
@@ -256,12 +252,7 @@ def cancel_subscription(request):
     """
     Cancela assinatura ativa do usuário
     """
-    from django.utils import timezone
-    
-    subscription = request.user.subscriptions.filter(
-        status='active',
-        end_date__gt=timezone.now()
-    ).first()
+    subscription = entitlements.active_subscription(request.user)
     
     if not subscription:
         return Response(
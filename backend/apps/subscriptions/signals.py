@@ -0,0 +1,20 @@
+"""
+Invalidação dos direitos em cache (entitlements) quando assinaturas ou
+pagamentos do usuário mudam
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import entitlements
+from .models import Payment, Subscription
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    entitlements.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    entitlements.invalidate(instance.user_id)
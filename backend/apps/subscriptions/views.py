@@ -2,6 +2,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from . import entitlements
 from .models import Subscription, Payment
 from .serializers import SubscriptionSerializer, PaymentSerializer, PaymentCreateSerializer
 import uuid
@@ -18,10 +19,7 @@ class SubscriptionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def current(self, request):
         """Assinatura atual ativa"""
-        subscription = Subscription.objects.filter(
-            user=request.user,
-            status='active'
-        ).first()
+        subscription = entitlements.active_subscription(request.user)
         
         if subscription:
             return Response(SubscriptionSerializer(subscription).data)
@@ -84,6 +82,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
         subscription = Subscription.objects.create(
             user=request.user,
             plan=plan,
+            plan_slug=plan,
             status='pending',
             amount_paid=amount
         )
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import MetricsRollup, User
 
 
 @admin.register(User)
@@ -22,3 +22,11 @@ class UserAdmin(BaseUserAdmin):
     )
     
     readonly_fields = ['created_at', 'updated_at', 'total_analyses', 'successful_predictions']
+
+
+@admin.register(MetricsRollup)
+class MetricsRollupAdmin(admin.ModelAdmin):
+    list_display = ['period', 'bucket_start', 'new_users', 'new_analyses', 'premium_users', 'revenue', 'updated_at']
+    list_filter = ['period']
+    date_hierarchy = 'bucket_start'
+    readonly_fields = [field.name for field in MetricsRollup._meta.fields]
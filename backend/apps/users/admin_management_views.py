@@ -8,6 +8,7 @@ from rest_framework import status
 from django.db import transaction
 from django.utils import timezone
 from datetime import datetime
+from apps.subscriptions import entitlements
 from .models import User
 from .serializers import UserSerializer
 
@@ -163,6 +164,7 @@ def admin_update_user(request, user_id):
     
     try:
         user.save()
+        entitlements.invalidate(user)
     except Exception as e:
         import traceback
         error_detail = traceback.format_exc()
@@ -2,12 +2,15 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
+from django.conf import settings
 from django.db.models import Count, Q, Sum
 from django.utils import timezone
 from datetime import timedelta
+from apps.subscriptions import entitlements
 from .models import User
 from .serializers import UserSerializer
-from apps.analysis.models import Analysis
+from .services import metrics, quota
+from apps.analysis.models import Analysis, UserAnalysisStats
 from apps.matches.models import Match
 
 
@@ -53,6 +56,7 @@ class AdminUserViewSet(viewsets.ModelViewSet):
             user.premium_until = timezone.now() + timedelta(days=30)
         
         user.save()
+        entitlements.invalidate(user)
         
         return Response({
             'message': f'Premium {"ativado" if user.is_premium else "desativado"} com sucesso',
@@ -63,8 +67,7 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     def reset_daily_limit(self, request, pk=None):
         """Resetar limite diário do usuário"""
         user = self.get_object()
-        user.daily_analysis_count = 0
-        user.save()
+        quota.reset(user)
         
         return Response({
             'message': 'Limite diário resetado com sucesso',
@@ -75,22 +78,24 @@ class AdminUserViewSet(viewsets.ModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_stats(request):
-    """Estatísticas gerais do sistema"""
-    
-    # Usuários
-    total_users = User.objects.count()
-    premium_users = User.objects.filter(is_premium=True).count()
-    new_users_today = User.objects.filter(
-        created_at__date=timezone.now().date()
-    ).count()
-    
-    # Análises
-    total_analyses = Analysis.objects.count()
-    today = timezone.now().date()
-    analyses_today = Analysis.objects.filter(created_at__date=today).count()
-    analyses_this_week = Analysis.objects.filter(
-        created_at__gte=timezone.now() - timedelta(days=7)
-    ).count()
+    """
+    Estatísticas gerais do sistema, lidas das métricas agregadas (MetricsRollup)
+
+    Query params:
+        days: Dias da série by_day (padrão 7, máx. ADMIN_STATS_MAX_DAYS)
+        hours: Se informado, inclui a série by_hour das últimas N horas (máx. 168)
+    """
+    try:
+        days = min(max(int(request.query_params.get('days', 7)), 1), settings.ADMIN_STATS_MAX_DAYS)
+        hours = min(max(int(request.query_params.get('hours', 0)), 0), 168)
+    except ValueError:
+        return Response({'error': 'days e hours devem ser inteiros'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Série diária já calculada pelo job (o mais recente por último): totais de
+    # hoje no último período
+    by_day = metrics.series(metrics.DAY, days)
+    today = by_day[-1]
+    premium_users = today.premium_users
     
     # Partidas
     active_matches = Match.objects.filter(
@@ -100,33 +105,30 @@ def admin_stats(request):
     # Receita estimada (500 MT por premium)
     revenue = premium_users * 500
     
-    # Top usuários por análises
-    top_users = User.objects.annotate(
-        analysis_count=Count('analyses')
-    ).order_by('-analysis_count')[:5]
-    
-    # Análises por dia (últimos 7 dias)
-    analyses_by_day = []
-    for i in range(7):
-        day = today - timedelta(days=i)
-        count = Analysis.objects.filter(created_at__date=day).count()
-        analyses_by_day.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'count': count
-        })
-    
-    return Response({
+    # Top usuários por análises (estatísticas agregadas por usuário)
+    top_users = UserAnalysisStats.objects.select_related('user').order_by('-total')[:5]
+
+    response = {
         'users': {
-            'total': total_users,
+            'total': today.total_users,
             'premium': premium_users,
-            'free': total_users - premium_users,
-            'new_today': new_users_today,
+            'free': today.total_users - premium_users,
+            'new_today': today.new_users,
         },
         'analyses': {
-            'total': total_analyses,
-            'today': analyses_today,
-            'this_week': analyses_this_week,
-            'by_day': analyses_by_day,
+            'total': today.total_analyses,
+            'today': today.new_analyses,
+            'this_week': sum(row.new_analyses for row in by_day[-7:]),
+            'by_day': [
+                {
+                    'date': timezone.localtime(row.bucket_start).strftime('%Y-%m-%d'),
+                    'count': row.new_analyses,
+                    'new_users': row.new_users,
+                    'premium': row.premium_users,
+                    'revenue': float(row.revenue),
+                }
+                for row in reversed(by_day)
+            ],
         },
         'matches': {
             'active': active_matches,
@@ -134,18 +136,35 @@ def admin_stats(request):
         'revenue': {
             'monthly_estimate': revenue,
             'per_premium': 500,
+            'period_total': float(sum(row.revenue for row in by_day)),
+            'period_days': days,
         },
         'top_users': [
             {
-                'id': u.id,
-                'username': u.username,
-                'email': u.email,
-                'analysis_count': u.analysis_count,
-                'is_premium': u.is_premium,
+                'id': stats.user.id,
+                'username': stats.user.username,
+                'email': stats.user.email,
+                'analysis_count': stats.total,
+                'is_premium': stats.user.is_premium,
             }
-            for u in top_users
+            for stats in top_users
+        ],
+        # Último recálculo das métricas (None: job ainda não rodou)
+        'updated_at': max((row.updated_at for row in by_day if row.updated_at), default=None),
+    }
+
+    if hours:
+        response['analyses']['by_hour'] = [
+            {
+                'hour': timezone.localtime(row.bucket_start).strftime('%Y-%m-%d %H:00'),
+                'count': row.new_analyses,
+                'new_users': row.new_users,
+                'revenue': float(row.revenue),
+            }
+            for row in reversed(metrics.series(metrics.HOUR, hours))
         ]
-    })
+
+    return Response(response)
 
 
 @api_view(['GET'])
@@ -0,0 +1,33 @@
+"""
+Management Command para recalcular as métricas agregadas do painel admin
+(MetricsRollup por hora e por dia; seguro para rodar de novo)
+O Celery beat já roda a tarefa rollup_metrics a cada 10 minutos; sem beat,
+executar via cron: python manage.py rollup_metrics
+Histórico após o deploy: python manage.py rollup_metrics --days 365 --hours 168
+"""
+from django.core.management.base import BaseCommand
+from apps.users.services import metrics
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as métricas agregadas (por hora e por dia) do painel admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=3,
+            help='Últimas N horas a recalcular (inclui a atual)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=2,
+            help='Últimos N dias a recalcular (inclui hoje)'
+        )
+
+    def handle(self, *args, **options):
+        counts = metrics.refresh_recent(options['hours'], options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Métricas recalculadas: {counts['hours']} horas, {counts['days']} dias"
+        ))
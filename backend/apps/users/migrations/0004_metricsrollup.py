@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_device_fingerprint_user_last_device_fingerprint_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hora'), ('day', 'Dia')], max_length=4, verbose_name='Período')),
+                ('bucket_start', models.DateTimeField(verbose_name='Início do Período')),
+                ('new_users', models.IntegerField(default=0, verbose_name='Novos Usuários')),
+                ('new_analyses', models.IntegerField(default=0, verbose_name='Novas Análises')),
+                ('new_subscriptions', models.IntegerField(default=0, verbose_name='Novas Assinaturas')),
+                ('payments', models.IntegerField(default=0, verbose_name='Pagamentos Completos')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Receita')),
+                ('total_users', models.IntegerField(default=0, verbose_name='Total de Usuários')),
+                ('total_analyses', models.IntegerField(default=0, verbose_name='Total de Análises')),
+                ('premium_users', models.IntegerField(default=0, verbose_name='Usuários Premium')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado Em')),
+            ],
+            options={
+                'verbose_name': 'Métricas Agregadas',
+                'verbose_name_plural': 'Métricas Agregadas',
+                'ordering': ['period', 'bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket_start'), name='unique_metrics_bucket')],
+            },
+        ),
+    ]
@@ -78,44 +78,62 @@ class User(AbstractUser):
         return timezone.now() <= self.premium_until
     
     def can_analyze(self):
-        """Verifica se o usuário pode fazer análises hoje"""
-        today = timezone.now().date()
-        
-        # Reset contador se é um novo dia
-        if self.last_analysis_date != today:
-            self.daily_analysis_count = 0
-            self.last_analysis_date = today
-            self.save()
-        
-        # Definir limite diário com base na assinatura ativa (plan_slug)
-        from apps.subscriptions.plan_config import get_plan_limit
-        limit = None
-        try:
-            active_sub = self.subscriptions.filter(status='active', end_date__gt=timezone.now()).first()
-            if active_sub and active_sub.plan_slug:
-                limit = get_plan_limit(active_sub.plan_slug)
-        except Exception:
-            limit = None
-
-        if limit is None:
-            # Fallback para configurações existentes
-            if self.is_premium_active():
-                from django.conf import settings
-                limit = settings.PREMIUM_ANALYSIS_LIMIT
-            else:
-                limit = get_plan_limit('freemium')
-
-        return self.daily_analysis_count < limit
+        """Verifica se o usuário pode fazer análises hoje (apps.users.services.quota)"""
+        from apps.users.services import quota
+        return quota.can_analyze(self)
+    
+    def get_remaining_analyses(self):
+        """Análises restantes hoje no limite do plano"""
+        from apps.users.services import quota
+        return quota.remaining(self)
     
     def increment_analysis_count(self):
-        """Incrementa contador de análises"""
-        self.daily_analysis_count += 1
-        self.total_analyses += 1
-        self.last_analysis_date = timezone.now().date()
-        self.save()
+        """Incrementa contador de análises (UPDATE atômico, sem verificar o limite)"""
+        from apps.users.services import quota
+        quota.consume(self, enforce=False)
     
     def get_success_rate(self):
         """Calcula taxa de acerto"""
         if self.total_analyses == 0:
             return 0
         return round((self.successful_predictions / self.total_analyses) * 100, 1)
+
+
+class MetricsRollup(models.Model):
+    """
+    Métricas agregadas por hora/dia para o painel admin (apps.users.services.metrics)
+    Contagens do período (novos usuários, análises, assinaturas, receita) e
+    totais ao fim do período (usuários, análises, premium)
+    """
+    PERIOD_CHOICES = [
+        ('hour', 'Hora'),
+        ('day', 'Dia'),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES, verbose_name="Período")
+    bucket_start = models.DateTimeField(verbose_name="Início do Período")
+
+    # Contagens no período
+    new_users = models.IntegerField(default=0, verbose_name="Novos Usuários")
+    new_analyses = models.IntegerField(default=0, verbose_name="Novas Análises")
+    new_subscriptions = models.IntegerField(default=0, verbose_name="Novas Assinaturas")
+    payments = models.IntegerField(default=0, verbose_name="Pagamentos Completos")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Receita")
+
+    # Totais ao fim do período
+    total_users = models.IntegerField(default=0, verbose_name="Total de Usuários")
+    total_analyses = models.IntegerField(default=0, verbose_name="Total de Análises")
+    premium_users = models.IntegerField(default=0, verbose_name="Usuários Premium")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado Em")
+
+    class Meta:
+        verbose_name = "Métricas Agregadas"
+        verbose_name_plural = "Métricas Agregadas"
+        ordering = ['period', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket_start'], name='unique_metrics_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket_start:%Y-%m-%d %H:%M}"
@@ -1,9 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from django.utils import timezone
 from datetime import date
 from dateutil.relativedelta import relativedelta
 from .models import User
+from .services import quota
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -93,22 +93,10 @@ class UserSerializer(serializers.ModelSerializer):
         return obj.get_success_rate()
     
     def get_can_analyze_today(self, obj):
-        return obj.can_analyze()
+        return quota.can_analyze(obj)
     
     def get_remaining_analyses(self, obj):
-        from apps.subscriptions.plan_config import get_plan_limit
-        today = timezone.now().date()
-        
-        if obj.last_analysis_date != today:
-            count = 0
-        else:
-            count = obj.daily_analysis_count
-        
-        if obj.is_premium_active():
-            from django.conf import settings
-            return settings.PREMIUM_ANALYSIS_LIMIT - count
-        free_limit = get_plan_limit('freemium')
-        return free_limit - count
+        return quota.remaining(obj)
 
 
 class UserProfileUpdateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,194 @@
+"""
+Métricas agregadas do painel admin (MetricsRollup)
+A tarefa periódica rollup_metrics (Celery beat, ou o comando de mesmo nome)
+recalcula os períodos recentes por hora e por dia a partir das tabelas de
+origem, com uma consulta agrupada (TruncHour/TruncDay) por fonte: usuários,
+análises, assinaturas e pagamentos. Recalcular é idempotente. O admin_stats só
+lê a série já gravada (uma consulta); só recalcula o período atual quando ele
+ainda não existe (job parado)
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from typing import Dict, List
+import logging
+
+from apps.analysis.models import Analysis
+from apps.subscriptions.models import Payment, Subscription
+from apps.users.models import MetricsRollup
+
+logger = logging.getLogger(__name__)
+
+HOUR = 'hour'
+DAY = 'day'
+TRUNCS = {HOUR: TruncHour, DAY: TruncDay}
+# Colunas por consulta no cálculo de premium por período
+PREMIUM_CHUNK = 100
+# Assinaturas que foram pagas: expiradas e canceladas valeram no seu período
+# (cancelled_at limita as canceladas); 'pending' é checkout sem pagamento
+PAID_STATUSES = ('active', 'expired', 'cancelled')
+UPDATE_FIELDS = [
+    'new_users', 'new_analyses', 'new_subscriptions', 'payments', 'revenue',
+    'total_users', 'total_analyses', 'premium_users', 'updated_at',
+]
+
+
+def floor(moment, period: str):
+    """Início (horário local) do período que contém `moment`"""
+    local = timezone.localtime(moment)
+    if period == DAY:
+        return timezone.make_aware(datetime.combine(local.date(), time.min))
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def _next(bucket, period: str):
+    if period == DAY:
+        return timezone.make_aware(datetime.combine(bucket.date() + timedelta(days=1), time.min))
+    return timezone.localtime(bucket + timedelta(hours=1))
+
+
+def start_of_window(period: str, count: int, now=None):
+    """Início do período mais antigo de uma janela com os `count` últimos períodos"""
+    current = floor(now or timezone.now(), period)
+    if period == DAY:
+        return timezone.make_aware(datetime.combine(current.date() - timedelta(days=count - 1), time.min))
+    return timezone.localtime(current - timedelta(hours=count - 1))
+
+
+def _grouped(queryset, field: str, period: str, start, end, **aggregates) -> Dict:
+    """Agregados por período em uma consulta ({início do período: valores})"""
+    rows = (
+        queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end})
+        .annotate(bucket=TRUNCS[period](field))
+        .order_by()
+        .values('bucket')
+        .annotate(**aggregates)
+    )
+    return {row.pop('bucket'): row for row in rows}
+
+
+def _premium_at(moments: List) -> List[int]:
+    """Usuários com assinatura vigente em cada instante (uma coluna por instante)"""
+    counts = []
+    for offset in range(0, len(moments), PREMIUM_CHUNK):
+        chunk = moments[offset:offset + PREMIUM_CHUNK]
+        overlapping = Subscription.objects.filter(
+            status__in=PAID_STATUSES, start_date__lte=chunk[-1], end_date__gt=chunk[0],
+        )
+        columns = {
+            f'at_{index}': Count('user_id', distinct=True, filter=(
+                Q(start_date__lte=moment, end_date__gt=moment)
+                & (Q(cancelled_at__isnull=True) | Q(cancelled_at__gt=moment))
+            ))
+            for index, moment in enumerate(chunk)
+        }
+        values = overlapping.aggregate(**columns)
+        counts.extend(values[f'at_{index}'] for index in range(len(chunk)))
+    return counts
+
+
+def refresh(period: str, since, until=None) -> int:
+    """
+    Recalcula os períodos de `since` até `until` (padrão: agora, inclusive o atual)
+
+    Returns:
+        int: Quantidade de períodos gravados
+    """
+    now = timezone.now()
+    buckets = [floor(since, period)]
+    last = floor(until or now, period)
+    while buckets[-1] < last:
+        buckets.append(_next(buckets[-1], period))
+    start, end = buckets[0], _next(buckets[-1], period)
+
+    User = get_user_model()
+    users = _grouped(User.objects.all(), 'created_at', period, start, end, count=Count('id'))
+    analyses = _grouped(Analysis.objects.all(), 'created_at', period, start, end, count=Count('id'))
+    subscriptions = _grouped(
+        Subscription.objects.filter(status__in=PAID_STATUSES), 'start_date', period, start, end, count=Count('id'),
+    )
+    payments = _grouped(
+        Payment.objects.filter(status='completed'), 'completed_at', period, start, end,
+        count=Count('id'), revenue=Sum('amount'),
+    )
+    # Totais ao fim de cada período: o que já existia antes da janela + acumulado
+    total_users = User.objects.filter(created_at__lt=start).count()
+    total_analyses = Analysis.objects.filter(created_at__lt=start).count()
+    # Período atual: premium de agora, não do fim (ainda no futuro)
+    premium = _premium_at([min(_next(bucket, period), now) for bucket in buckets])
+
+    rows = []
+    for bucket, premium_users in zip(buckets, premium):
+        empty = {'count': 0}
+        total_users += users.get(bucket, empty)['count']
+        total_analyses += analyses.get(bucket, empty)['count']
+        paid = payments.get(bucket, {'count': 0, 'revenue': None})
+        rows.append(MetricsRollup(
+            period=period,
+            bucket_start=bucket,
+            new_users=users.get(bucket, empty)['count'],
+            new_analyses=analyses.get(bucket, empty)['count'],
+            new_subscriptions=subscriptions.get(bucket, empty)['count'],
+            payments=paid['count'],
+            revenue=paid['revenue'] or Decimal('0'),
+            total_users=total_users,
+            total_analyses=total_analyses,
+            premium_users=premium_users,
+        ))
+    MetricsRollup.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['period', 'bucket_start'], update_fields=UPDATE_FIELDS,
+    )
+    logger.info(f"📊 Métricas ({period}): {len(rows)} períodos recalculados desde {start:%Y-%m-%d %H:%M}")
+    return len(rows)
+
+
+def refresh_recent(hours: int, days: int) -> Dict:
+    """Recalcula as últimas `hours` horas e os últimos `days` dias (inclusive os atuais)"""
+    return {
+        'hours': refresh(HOUR, start_of_window(HOUR, max(hours, 1))),
+        'days': refresh(DAY, start_of_window(DAY, max(days, 1))),
+    }
+
+
+def series(period: str, count: int) -> List[MetricsRollup]:
+    """
+    Os `count` últimos períodos (o mais antigo primeiro), com uma consulta
+
+    Se o período atual ainda não foi calculado, é recalculado na hora (só ele).
+    Os anteriores que o job não calculou voltam zerados (sem salvar), com os
+    totais do período anterior; updated_at None indica um deles.
+    """
+    now = timezone.now()
+    since = start_of_window(period, count, now)
+    stored = {
+        row.bucket_start: row
+        for row in MetricsRollup.objects.filter(period=period, bucket_start__gte=since)
+    }
+    # Sem o job (beat parado), recalcula só o período atual: custo limitado e
+    # os totais do painel não ficam zerados
+    current = floor(now, period)
+    if current not in stored:
+        refresh(period, current)
+        stored.update(
+            (row.bucket_start, row)
+            for row in MetricsRollup.objects.filter(period=period, bucket_start=current)
+        )
+    rows = []
+    bucket = since
+    for _ in range(count):
+        row = stored.get(bucket)
+        if row is None:
+            previous = rows[-1] if rows else None
+            row = MetricsRollup(
+                period=period,
+                bucket_start=bucket,
+                total_users=previous.total_users if previous else 0,
+                total_analyses=previous.total_analyses if previous else 0,
+                premium_users=previous.premium_users if previous else 0,
+            )
+        rows.append(row)
+        bucket = _next(bucket, period)
+    return rows
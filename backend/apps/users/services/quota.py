@@ -0,0 +1,76 @@
+"""
+Cota diária de análises por usuário
+O limite do plano vem dos direitos em cache do usuário (subscriptions.entitlements),
+então uma verificação custa no máximo uma leitura do cache sobre os campos já
+carregados do usuário. O consumo é um único UPDATE condicional (F/Case): troca
+de dia, limite e incremento acontecem no banco, sem perder incrementos nem
+ultrapassar o limite com pedidos simultâneos
+"""
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+import logging
+
+from apps.subscriptions import entitlements
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ['daily_analysis_count', 'total_analyses', 'last_analysis_date']
+
+
+def daily_limit(user) -> int:
+    """Limite diário do plano efetivo do usuário"""
+    return entitlements.resolve(user)['daily_limit']
+
+
+def used_today(user) -> int:
+    """Análises usadas hoje, pelos campos do usuário (sem consulta)"""
+    if user.last_analysis_date != timezone.now().date():
+        return 0
+    return user.daily_analysis_count
+
+
+def remaining(user) -> int:
+    return max(daily_limit(user) - used_today(user), 0)
+
+
+def can_analyze(user) -> bool:
+    return used_today(user) < daily_limit(user)
+
+
+def consume(user, enforce: bool = True) -> bool:
+    """
+    Registra uma análise do usuário de forma atômica
+
+    Args:
+        enforce: Só consome se ainda houver cota hoje (verificado no próprio UPDATE)
+
+    Returns:
+        bool: Se a análise foi registrada (False = limite diário atingido)
+    """
+    today = timezone.now().date()
+    queryset = user.__class__.objects.filter(pk=user.pk)
+    if enforce:
+        queryset = queryset.filter(
+            ~Q(last_analysis_date=today)
+            | Q(last_analysis_date__isnull=True)
+            | Q(daily_analysis_count__lt=daily_limit(user))
+        )
+    updated = queryset.update(
+        daily_analysis_count=Case(
+            When(last_analysis_date=today, then=F('daily_analysis_count') + 1),
+            default=Value(1),
+        ),
+        total_analyses=F('total_analyses') + 1,
+        last_analysis_date=today,
+    )
+    # Valores atuais (inclusive incrementos de outros pedidos) no objeto em memória
+    user.refresh_from_db(fields=COUNTER_FIELDS)
+    if not updated:
+        logger.info(f"🚫 Limite diário de análises atingido (usuário {user.pk})")
+    return bool(updated)
+
+
+def reset(user):
+    """Zera as análises de hoje do usuário"""
+    user.__class__.objects.filter(pk=user.pk).update(daily_analysis_count=0)
+    user.refresh_from_db(fields=COUNTER_FIELDS)
@@ -0,0 +1,12 @@
+"""
+Tasks Celery do app de usuários
+"""
+from celery import shared_task
+
+from apps.users.services import metrics
+
+
+@shared_task(ignore_result=True)
+def rollup_metrics(hours=3, days=2):
+    """Recalcula as métricas agregadas recentes do painel admin (idempotente)"""
+    metrics.refresh_recent(hours, days)
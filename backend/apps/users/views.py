@@ -5,11 +5,12 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.throttling import ScopedRateThrottle
-from django.utils import timezone
 from django.conf import settings
-from apps.subscriptions.plan_config import get_plan_limit
+from apps.analysis.services import user_stats
+from apps.subscriptions import entitlements
 from .models import User
 from .serializers import UserRegistrationSerializer, UserSerializer, UserProfileUpdateSerializer
+from .services import quota
 
 
 class RegisterView(generics.CreateAPIView):
@@ -81,21 +82,12 @@ class UserStatsView(generics.GenericAPIView):
 
     def get(self, request):
         user = request.user
-        today = timezone.now().date()
+        analyses_today = quota.used_today(user)
+        daily_limit = quota.daily_limit(user)
 
-        if user.last_analysis_date != today:
-            analyses_today = 0
-        else:
-            analyses_today = user.daily_analysis_count
-
-        # Determinar assinatura ativa e limite diário a partir dela
-        active_sub = user.subscriptions.filter(status='active', end_date__gt=timezone.now()).first()
-        if active_sub and active_sub.plan_slug:
-            daily_limit = get_plan_limit(active_sub.plan_slug)
-        else:
-            # Sem assinatura ativa: considerar freemium (ignorar flag premium legado)
-            daily_limit = get_plan_limit('freemium')
-        remaining = max(daily_limit - analyses_today, 0)
+        # Status premium exibido: só assinatura ativa (ignora a flag premium legado)
+        entitlement = entitlements.resolve(user)
+        has_subscription = entitlement['source'] == entitlements.SOURCE_SUBSCRIPTION
 
         return Response({
             'total_analyses': user.total_analyses,
@@ -104,8 +96,10 @@ class UserStatsView(generics.GenericAPIView):
             'daily_analysis_count': user.daily_analysis_count,
             'analyses_count_today': analyses_today,
             'daily_limit': daily_limit,
-            'remaining': remaining,
-            'can_analyze': user.can_analyze(),
-            'is_premium': bool(active_sub),
-            'premium_until': active_sub.end_date if active_sub else None,
+            'remaining': max(daily_limit - analyses_today, 0),
+            'can_analyze': analyses_today < daily_limit,
+            'is_premium': has_subscription,
+            'premium_until': entitlement['expires_at'] if has_subscription else None,
+            # Acerto por confiança/predição (uma linha de UserAnalysisStats)
+            'analysis_stats': user_stats.payload(user_stats.for_user(user)),
         })
@@ -0,0 +1,14 @@
+"""
+Aplicação Celery do projeto (broker/result backend em CELERY_* no settings)
+Worker: celery -A config worker -l info
+Agendador (CELERY_BEAT_SCHEDULE): celery -A config beat -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+app = Celery('config')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
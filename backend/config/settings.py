@@ -106,15 +106,28 @@ DATABASES = {
 
 # Cache Configuration
 # https://docs.djangoproject.com/en/5.0/topics/cache/
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'bet-insight-cache',
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000  # Máximo de 1000 entradas no cache
+# Com REDIS_URL definido o cache é compartilhado entre workers e processos
+# (necessário para o snapshot de partidas atualizado pelo refresh_fixtures)
+REDIS_CACHE_URL = os.getenv('REDIS_CACHE_URL', os.getenv('REDIS_URL', ''))
+
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'KEY_PREFIX': 'placarcerto',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bet-insight-cache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000  # Máximo de 1000 entradas no cache
+            }
         }
     }
-}
 
 # Cache timeout (em segundos)
 CACHE_TTL = {
@@ -124,6 +137,79 @@ CACHE_TTL = {
     'odds': 300,  # 5 minutos (odds mudam frequentemente)
     'fixtures': 3600,  # 1 hora
     'fixture_details': 1800,  # 30 minutos
+    'predictions': 3600,  # 1 hora
+    'h2h': 21600,  # 6 horas (só muda quando os times voltam a se enfrentar)
+    'football_data_match': 1800,  # 30 minutos
+    'football_data_matches': 1800,  # 30 minutos (listagem por intervalo de datas do ID Mapper)
+}
+
+# Cliente HTTP compartilhado das APIs de futebol (apps.matches.services.http_client)
+HTTP_CLIENT = {
+    'timeout': (5, 15),  # (conexão, leitura) em segundos
+    'retries': 3,
+    'backoff_factor': 0.5,
+    'pool_connections': 10,  # Hosts distintos mantidos em cache
+    'pool_maxsize': 10,  # Conexões keep-alive por host
+    'host_pool_maxsize': {
+        # API-Football recebe o fan-out da janela e o enriquecimento em paralelo
+        'v3.football.api-sports.io': 20,
+    },
+}
+
+# Token bucket por host, compartilhado entre workers via cache. Só consome
+# tokens em requisições reais (cache hits não passam pelo cliente HTTP).
+# O saldo é ajustado pelos headers de cota restante de cada resposta.
+RATE_LIMITS = {
+    'v3.football.api-sports.io': {
+        'per_minute': int(os.getenv('API_FOOTBALL_RATE_PER_MINUTE', '120')),
+        'burst': int(os.getenv('API_FOOTBALL_RATE_BURST', '10')),
+        # Cota diária mínima preservada: abaixo disso a taxa é reduzida
+        'daily_reserve': int(os.getenv('API_FOOTBALL_DAILY_RESERVE', '50')),
+    },
+    'api.football-data.org': {
+        'per_minute': int(os.getenv('FOOTBALL_DATA_RATE_PER_MINUTE', '10')),
+        'burst': 2,
+    },
+}
+# Espera máxima por um token antes de seguir mesmo assim (segundos)
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '10'))
+
+# Buscas independentes do enriquecimento de uma partida executadas em paralelo
+ENRICHMENT_CONCURRENCY = int(os.getenv('ENRICHMENT_CONCURRENCY', '10'))
+
+# Histórico recente por time (descanso, forma e tendências) mantido no cache
+TEAM_HISTORY_SIZE = int(os.getenv('TEAM_HISTORY_SIZE', '10'))
+TEAM_HISTORY_TTL = int(os.getenv('TEAM_HISTORY_TTL', str(24 * 3600)))
+# Histórico buscado na API há mais que isso é buscado de novo (partidas que a
+# extensão pelo refresh_fixtures não viu)
+TEAM_HISTORY_RECHECK_SECONDS = int(os.getenv('TEAM_HISTORY_RECHECK_SECONDS', str(6 * 3600)))
+
+# Janela de partidas exibida em /matches/from_api (hoje + 14 dias)
+FIXTURES_WINDOW_DAYS = int(os.getenv('FIXTURES_WINDOW_DAYS', '15'))
+# Máximo de requisições simultâneas à API-Football ao buscar a janela
+FIXTURES_FETCH_CONCURRENCY = int(os.getenv('FIXTURES_FETCH_CONCURRENCY', '5'))
+# Cada dia da janela é um shard no cache com validade própria (segundos):
+# hoje (jogos ao vivo/resultados) muda muito, dias distantes raramente
+FIXTURES_DAY_TTL = {
+    'today': int(os.getenv('FIXTURES_TODAY_TTL', '600')),
+    'near': int(os.getenv('FIXTURES_NEAR_TTL', '1800')),  # próximos FIXTURES_NEAR_DAYS dias
+    'far': int(os.getenv('FIXTURES_FAR_TTL', str(6 * 3600))),
+}
+FIXTURES_NEAR_DAYS = 2
+# Shards vencidos continuam sendo servidos (como desatualizados) até este limite
+FIXTURES_SHARD_TTL = 24 * 3600
+# Intervalo do refresh_fixtures --loop (só busca os shards vencidos)
+FIXTURES_REFRESH_LOOP_INTERVAL = int(os.getenv('FIXTURES_REFRESH_LOOP_INTERVAL', '60'))
+FIXTURES_SNAPSHOT_LOCK_TIMEOUT = 300
+# Dia que falhou sem dados anteriores: shard vazio por este tempo (segundos)
+FIXTURES_FAILED_DAY_TTL = int(os.getenv('FIXTURES_FAILED_DAY_TTL', '120'))
+
+# Coalescência de cache misses (single-flight): validade do lock entre
+# processos, espera máxima pelo resultado de outro chamador e polling
+SINGLE_FLIGHT = {
+    'lock_timeout': 30,
+    'wait_timeout': 20,
+    'poll_interval': 0.1,
 }
 
 
@@ -273,6 +359,23 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Africa/Maputo'
+# Tarefas periódicas (celery -A config beat)
+CELERY_BEAT_SCHEDULE = {
+    # Varredura das partidas encerradas cuja liquidação não foi enfileirada
+    'settle-analyses': {
+        'task': 'apps.analysis.tasks.settle_matches',
+        'schedule': 600.0,
+        'args': (None,),
+    },
+    # Métricas agregadas do painel admin (apps.users.services.metrics)
+    'rollup-metrics': {
+        'task': 'apps.users.tasks.rollup_metrics',
+        'schedule': 600.0,
+    },
+}
+
+# Jobs assíncronos de análise (estado no cache, consultado por polling)
+ANALYSIS_JOB_TTL = int(os.getenv('ANALYSIS_JOB_TTL', '3600'))
 
 # External APIs
 FOOTBALL_DATA_API_KEY = os.getenv('FOOTBALL_DATA_API_KEY', '')
@@ -283,6 +386,53 @@ API_FOOTBALL_HOST = os.getenv('API_FOOTBALL_HOST', 'v3.football.api-sports.io')
 API_FOOTBALL_URL = os.getenv('API_FOOTBALL_URL', 'https://v3.football.api-sports.io')
 
 GOOGLE_GEMINI_API_KEY = os.getenv('GOOGLE_GEMINI_API_KEY', '')
+# Descoberta de modelos (list_models) uma vez por processo, renovada em segundo plano
+GEMINI_MODEL_REFRESH_SECONDS = int(os.getenv('GEMINI_MODEL_REFRESH_SECONDS', str(6 * 3600)))
+GEMINI_MODEL_RETRY_SECONDS = int(os.getenv('GEMINI_MODEL_RETRY_SECONDS', '60'))
+# Níveis de modelo por plano (plan_config 'ai_tier'): 'fast' (flash/lite) e 'deep'
+GEMINI_DEFAULT_TIER = os.getenv('GEMINI_DEFAULT_TIER', 'deep')  # Sem usuário (ex.: pré-geração)
+GEMINI_TIER_MODELS = {  # Modelo fixo por nível (opcional; padrão: o melhor descoberto)
+    'fast': os.getenv('GEMINI_FAST_MODEL') or None,
+    'deep': os.getenv('GEMINI_DEEP_MODEL') or None,
+}
+GEMINI_MAX_FALLBACKS = int(os.getenv('GEMINI_MAX_FALLBACKS', '2'))  # Modelos extras tentados após ResourceExhausted
+GEMINI_QUOTA_COOLDOWN_SECONDS = int(os.getenv('GEMINI_QUOTA_COOLDOWN_SECONDS', '60'))
+# Disjuntor das chamadas ao Gemini (circuit_breaker): abre com muitas falhas na janela
+GEMINI_BREAKER_WINDOW_SECONDS = int(os.getenv('GEMINI_BREAKER_WINDOW_SECONDS', '60'))
+GEMINI_BREAKER_BUCKET_SECONDS = int(os.getenv('GEMINI_BREAKER_BUCKET_SECONDS', '10'))
+GEMINI_BREAKER_MIN_CALLS = int(os.getenv('GEMINI_BREAKER_MIN_CALLS', '5'))
+GEMINI_BREAKER_FAILURE_RATE = float(os.getenv('GEMINI_BREAKER_FAILURE_RATE', '0.5'))
+GEMINI_BREAKER_OPEN_SECONDS = int(os.getenv('GEMINI_BREAKER_OPEN_SECONDS', '30'))
+GEMINI_BREAKER_PROBE_TIMEOUT = int(os.getenv('GEMINI_BREAKER_PROBE_TIMEOUT', '90'))  # Chamada de teste (meio-aberto)
+# Cache de análises (hash de modelo + prompt): validade encurta perto do início
+AI_ANALYSIS_CACHE_TTL = {
+    'far': 6 * 3600,  # Mais de 24h para o início
+    'day': 2 * 3600,  # Nas próximas 24h
+    'near': 15 * 60,  # Nas próximas AI_ANALYSIS_NEAR_HOURS
+    'live': 2 * 60,  # Em andamento
+    'finished': 24 * 3600,  # Encerrada (os dados não mudam mais)
+}
+AI_ANALYSIS_NEAR_HOURS = int(os.getenv('AI_ANALYSIS_NEAR_HOURS', '3'))
+# Tempo máximo de uma geração; pedidos iguais aguardam até isso pela mesma
+AI_ANALYSIS_LOCK_TIMEOUT = int(os.getenv('AI_ANALYSIS_LOCK_TIMEOUT', '90'))
+# Tokens (estimados) por prompt de análise; acima disso as seções de dados menos
+# prioritárias são descartadas (apps.analysis.services.prompt_builder)
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv('AI_PROMPT_TOKEN_BUDGET', '2000'))
+
+# Pré-geração de análises (python manage.py pregenerate_analyses)
+PREGENERATE_MIN_PRIORITY = int(os.getenv('PREGENERATE_MIN_PRIORITY', '85'))  # League.priority mínima
+PREGENERATE_LOOKAHEAD_HOURS = int(os.getenv('PREGENERATE_LOOKAHEAD_HOURS', '36'))
+PREGENERATE_DAILY_BUDGET = int(os.getenv('PREGENERATE_DAILY_BUDGET', '50'))  # Gerações do Gemini por dia
+# Horário fora de pico (hora local, início inclusive, fim exclusivo)
+PREGENERATE_OFF_PEAK_HOURS = (
+    int(os.getenv('PREGENERATE_OFF_PEAK_START', '2')),
+    int(os.getenv('PREGENERATE_OFF_PEAK_END', '8')),
+)
+
+# Análise em lote (POST /api/matches/batch_analyze/)
+BATCH_ANALYSIS_MAX_MATCHES = int(os.getenv('BATCH_ANALYSIS_MAX_MATCHES', '15'))
+BATCH_ANALYSIS_MATCHES_PER_PROMPT = int(os.getenv('BATCH_ANALYSIS_MATCHES_PER_PROMPT', '4'))
+BATCH_ANALYSIS_CONCURRENCY = int(os.getenv('BATCH_ANALYSIS_CONCURRENCY', '4'))  # Enriquecimentos/prompts simultâneos
 
 # PaySuite Configuration (M-Pesa + E-Mola + Outros)
 PAYSUITE_API_TOKEN = os.getenv('PAYSUITE_API_TOKEN', '')
@@ -309,3 +459,9 @@ FCM_SERVER_KEY = os.getenv('FCM_SERVER_KEY', '')
 # Application Settings
 FREE_ANALYSIS_LIMIT = 3
 PREMIUM_ANALYSIS_LIMIT = 100
+# Direitos do usuário (plano, limite, nível de IA) em cache (apps.subscriptions.entitlements);
+# invalidados pelos signals de Subscription/Payment
+ENTITLEMENT_CACHE_SECONDS = int(os.getenv('ENTITLEMENT_CACHE_SECONDS', '600'))
+# Janela máxima (dias) da série do admin_stats (métricas agregadas, ver
+# apps.users.services.metrics e a tarefa rollup-metrics do beat)
+ADMIN_STATS_MAX_DAYS = int(os.getenv('ADMIN_STATS_MAX_DAYS', '365'))